@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+from concurrent.futures import Future
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ===========================================================
+#   BACKENDS DE EMBEDDINGS PARA CPU
+# ===========================================================
+#   torch       -> PyTorch fp32 (comportamiento original)
+#   torch-int8  -> PyTorch con cuantización dinámica int8 de las capas lineales
+#   onnx        -> ONNX Runtime (requiere optimum[onnxruntime])
+#   onnx-int8   -> ONNX Runtime con el modelo cuantizado int8 publicado en el Hub
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Modelo ONNX cuantizado que sentence-transformers publica junto al modelo original.
+# La variante AVX2 funciona en cualquier x86-64 actual; en CPUs con AVX-512 VNNI
+# se puede elegir "onnx/model_qint8_avx512_vnni.onnx"
+ARCHIVO_ONNX_INT8 = os.getenv("RAG_ONNX_INT8_ARCHIVO", "onnx/model_qint8_avx2.onnx")
+
+
+def crear_embeddings(nombre_modelo, backend="torch", hilos=None, tam_lote=32):
+    """
+    Crea el modelo de embeddings con el backend indicado.
+
+    Args:
+        nombre_modelo: Modelo de sentence-transformers
+        backend: Uno de BACKENDS
+        hilos: Hilos de CPU para la inferencia (None = valor por defecto)
+        tam_lote: Tamaño de lote al codificar documentos
+
+    Returns:
+        tuple: (HuggingFaceEmbeddings listo para usar, backend efectivo). Si
+               falta optimum[onnxruntime], los backends ONNX pasan a "torch"
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de embeddings no soportado: {backend} (opciones: {', '.join(BACKENDS)})")
+
+    model_kwargs = {'device': 'cpu'}
+    if backend.startswith("onnx"):
+        try:
+            import onnxruntime
+            import optimum.onnxruntime  # noqa: F401
+        except ImportError:
+            print(f"⚠️ Backend '{backend}' no disponible (instala optimum[onnxruntime]); se usa 'torch'")
+            return crear_embeddings(nombre_modelo, "torch", hilos, tam_lote)
+
+        opciones = onnxruntime.SessionOptions()
+        if hilos:
+            opciones.intra_op_num_threads = hilos
+            opciones.inter_op_num_threads = 1
+        model_kwargs["backend"] = "onnx"
+        model_kwargs["model_kwargs"] = {"provider": "CPUExecutionProvider", "session_options": opciones}
+        if backend == "onnx-int8":
+            model_kwargs["model_kwargs"]["file_name"] = ARCHIVO_ONNX_INT8
+    elif hilos:
+        import torch
+        torch.set_num_threads(hilos)
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name=nombre_modelo,
+        model_kwargs=model_kwargs,
+        encode_kwargs={'batch_size': tam_lote}
+    )
+
+    if backend == "torch-int8":
+        import torch
+        torch.quantization.quantize_dynamic(embeddings._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    return embeddings, backend
+
+
+class EmbeddingsLoteDinamico(Embeddings):
+    """
+    Agrupa en un solo lote las consultas que llegan a la vez.
+
+    Con varios usuarios concurrentes, cada embed_query espera como mucho
+    `espera_ms` a que lleguen otras consultas y todas se codifican juntas,
+    lo que aprovecha mejor la CPU que muchos lotes de tamaño 1. Los
+    documentos se pasan tal cual: sentence-transformers ya los ordena por
+    longitud y los codifica en lotes.
+    """
+
+    def __init__(self, base, max_lote=32, espera_ms=5):
+        """
+        Args:
+            base: Modelo de embeddings real
+            max_lote: Consultas máximas por lote
+            espera_ms: Milisegundos que se espera a que se llene el lote
+        """
+        self.base = base
+        self.max_lote = max_lote
+        self.espera = espera_ms / 1000
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True, name="embeddings-lotes")
+        self._hilo.start()
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        futuro = Future()
+        self._cola.put((text, futuro))
+        return futuro.result()
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                if len(lote) == 1:
+                    vectores = [self.base.embed_query(lote[0][0])]
+                else:
+                    vectores = self.base.embed_documents([texto for texto, _ in lote])
+                for (_, futuro), vector in zip(lote, vectores):
+                    futuro.set_result(vector)
+            except Exception as e:
+                for _, futuro in lote:
+                    futuro.set_exception(e)
+
+
+# ===========================================================
+#   BENCHMARK DE BACKENDS
+#   python backendsEmbeddings.py --backends torch torch-int8 onnx
+# ===========================================================
+_TEMAS = ["Notion", "bases de datos", "facturación", "el equipo de ventas", "la API", "el servidor MCP", "los informes"]
+_ACCIONES = ["revisar", "actualizar", "documentar", "migrar", "optimizar", "borrar", "compartir"]
+_FRASES = [
+    "Hay que {a} {t} antes del viernes.",
+    "We need to {a} {t} as soon as possible.",
+    "Il faut {a} {t} cette semaine.",
+    "¿Quién se encarga de {a} {t}?",
+    "La tarea de {a} {t} sigue pendiente desde el mes pasado.",
+]
+
+
+def _corpus_sintetico(n, semilla=0):
+    aleatorio = random.Random(semilla)
+    return [
+        " ".join(
+            aleatorio.choice(_FRASES).format(a=aleatorio.choice(_ACCIONES), t=aleatorio.choice(_TEMAS))
+            for _ in range(aleatorio.randint(2, 8))
+        )
+        for _ in range(n)
+    ]
+
+
+def _normalizar_filas(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.where(normas == 0, 1, normas)
+
+
+def benchmark(nombre_modelo, backends, n_textos=500, n_consultas=50, k=10, hilos=None, tam_lote=32):
+    """
+    Compara velocidad y concordancia de resultados entre backends.
+
+    El primer backend es la referencia: para los demás se mide la similitud
+    coseno media de sus vectores con los de referencia y el solapamiento del
+    top-k de búsqueda sobre el mismo corpus.
+
+    Returns:
+        list: Un dict de resultados por backend
+    """
+    textos = _corpus_sintetico(n_textos)
+    consultas = _corpus_sintetico(n_consultas, semilla=1)
+    resultados = []
+    referencia = None
+
+    for backend in backends:
+        modelo, backend_efectivo = crear_embeddings(nombre_modelo, backend, hilos=hilos, tam_lote=tam_lote)
+        modelo.embed_documents(textos[:8])  # calentamiento
+
+        inicio = time.perf_counter()
+        documentos = np.asarray(modelo.embed_documents(textos), dtype=np.float32)
+        segundos_docs = time.perf_counter() - inicio
+
+        latencias = []
+        vectores_consultas = []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            vectores_consultas.append(modelo.embed_query(consulta))
+            latencias.append(time.perf_counter() - inicio)
+        vectores_consultas = np.asarray(vectores_consultas, dtype=np.float32)
+
+        documentos_n = _normalizar_filas(documentos)
+        top_k = np.argsort(-(_normalizar_filas(vectores_consultas) @ documentos_n.T), axis=1)[:, :k]
+
+        fila = {
+            "backend": backend_efectivo,
+            "textos_por_segundo": n_textos / segundos_docs,
+            "latencia_consulta_ms_p50": float(np.percentile(latencias, 50) * 1000),
+            "latencia_consulta_ms_p95": float(np.percentile(latencias, 95) * 1000),
+        }
+        if referencia is None:
+            referencia = (documentos_n, top_k)
+        else:
+            fila["coseno_medio_vs_referencia"] = float(np.mean(np.sum(documentos_n * referencia[0], axis=1)))
+            fila[f"solapamiento_top{k}_vs_referencia"] = float(np.mean([
+                len(set(a) & set(b)) / k for a, b in zip(top_k, referencia[1])
+            ]))
+        resultados.append(fila)
+        print(json.dumps(fila, ensure_ascii=False), file=sys.stderr)
+
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de backends de embeddings en CPU")
+    parser.add_argument("--modelo", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8"], choices=BACKENDS)
+    parser.add_argument("--textos", type=int, default=500)
+    parser.add_argument("--consultas", type=int, default=50)
+    parser.add_argument("--hilos", type=int, default=None)
+    parser.add_argument("--tam-lote", type=int, default=32)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    filas = benchmark(args.modelo, args.backends, args.textos, args.consultas, hilos=args.hilos, tam_lote=args.tam_lote)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(filas, f, ensure_ascii=False, indent=2)
+    for fila in filas:
+        print(" | ".join(f"{clave}: {valor:.3f}" if isinstance(valor, float) else f"{clave}: {valor}" for clave, valor in fila.items()))
@@ -0,0 +1,364 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+# ===========================================================
+#   BENCHMARK Y REGRESIÓN DEL RAG
+#   python benchmarkRag.py --documentos 200 --salida bench.json
+#   python benchmarkRag.py --comparar bench_anterior.json
+# ===========================================================
+#   Genera un corpus sintético multilingüe, lo ingiere en un rag_db
+#   temporal y mide: ingesta, embeddings, latencias de buscar y
+#   obtener_contexto, pico de memoria y recall@k frente a fuerza bruta.
+
+_VOCABULARIO = {
+    "es": {
+        "temas": ["la facturación", "el inventario", "la base de datos de clientes", "el servidor MCP",
+                  "los informes trimestrales", "la integración con Notion", "el equipo de soporte"],
+        "acciones": ["revisar", "migrar", "documentar", "optimizar", "auditar", "automatizar"],
+        "frases": ["Hay que {a} {t} antes del cierre del mes.",
+                   "El responsable de {a} {t} es el equipo de operaciones.",
+                   "Se decidió {a} {t} para reducir los tiempos de respuesta.",
+                   "¿Alguien sabe cuándo se va a {a} {t}?"]
+    },
+    "en": {
+        "temas": ["the billing pipeline", "the warehouse stock", "the customer database", "the MCP server",
+                  "the quarterly reports", "the Notion integration", "the support team"],
+        "acciones": ["review", "migrate", "document", "optimize", "audit", "automate"],
+        "frases": ["We need to {a} {t} before the end of the month.",
+                   "The operations team is in charge to {a} {t}.",
+                   "It was decided to {a} {t} to cut response times.",
+                   "Does anyone know when we will {a} {t}?"]
+    },
+    "fr": {
+        "temas": ["la facturation", "le stock", "la base clients", "le serveur MCP",
+                  "les rapports trimestriels", "l'intégration Notion", "l'équipe support"],
+        "acciones": ["revoir", "migrer", "documenter", "optimiser", "auditer", "automatiser"],
+        "frases": ["Il faut {a} {t} avant la fin du mois.",
+                   "L'équipe des opérations doit {a} {t}.",
+                   "On a décidé de {a} {t} pour réduire les délais."]
+    },
+    "de": {
+        "temas": ["die Abrechnung", "den Lagerbestand", "die Kundendatenbank", "den MCP-Server",
+                  "die Quartalsberichte", "die Notion-Integration", "das Support-Team"],
+        "acciones": ["prüfen", "migrieren", "dokumentieren", "optimieren", "automatisieren"],
+        "frases": ["Wir müssen {t} vor Monatsende {a}.",
+                   "Das Betriebsteam soll {t} {a}.",
+                   "Es wurde beschlossen, {t} zu {a}."]
+    },
+    "pt": {
+        "temas": ["o faturamento", "o estoque", "a base de clientes", "o servidor MCP",
+                  "os relatórios trimestrais", "a integração com o Notion", "a equipe de suporte"],
+        "acciones": ["revisar", "migrar", "documentar", "otimizar", "auditar", "automatizar"],
+        "frases": ["Precisamos {a} {t} antes do fim do mês.",
+                   "A equipe de operações vai {a} {t}.",
+                   "Foi decidido {a} {t} para reduzir o tempo de resposta."]
+    }
+}
+
+
+def _frase(aleatorio, idioma):
+    vocabulario = _VOCABULARIO[idioma]
+    return aleatorio.choice(vocabulario["frases"]).format(
+        a=aleatorio.choice(vocabulario["acciones"]),
+        t=aleatorio.choice(vocabulario["temas"])
+    )
+
+
+def generar_corpus(carpeta, n_documentos=100, parrafos=(3, 12), semilla=0):
+    """
+    Escribe un corpus sintético multilingüe (.md, .txt y .csv) en la carpeta.
+
+    Cada documento lleva un código único (p. ej. DOC-00042) para que haya
+    también consultas de identificador exacto.
+
+    Returns:
+        list: Frases del corpus de las que se derivan las consultas
+    """
+    aleatorio = random.Random(semilla)
+    idiomas = list(_VOCABULARIO)
+    frases = []
+    os.makedirs(carpeta, exist_ok=True)
+    for i in range(n_documentos):
+        idioma = idiomas[i % len(idiomas)]
+        codigo = f"DOC-{i:05d}"
+        if i % 10 == 9:
+            filas = ["codigo,idioma,tarea,estado"]
+            for j in range(aleatorio.randint(20, 80)):
+                frase = _frase(aleatorio, idioma)
+                frases.append(frase)
+                filas.append(f"{codigo}-{j},{idioma},\"{frase}\",{aleatorio.choice(['abierta', 'cerrada'])}")
+            contenido, extension = "\n".join(filas), ".csv"
+        else:
+            bloques = [f"# {codigo} ({idioma})"]
+            for _ in range(aleatorio.randint(*parrafos)):
+                parrafo = " ".join(_frase(aleatorio, idioma) for _ in range(aleatorio.randint(3, 9)))
+                frases.append(parrafo.split(". ")[0])
+                bloques.append(parrafo)
+            contenido, extension = "\n\n".join(bloques), (".md" if i % 2 else ".txt")
+        with open(os.path.join(carpeta, f"{codigo}{extension}"), 'w', encoding='utf-8') as f:
+            f.write(contenido)
+    return frases
+
+
+def _percentiles(segundos):
+    if not segundos:
+        return {}
+    milis = np.asarray(segundos) * 1000
+    return {
+        "p50_ms": float(np.percentile(milis, 50)),
+        "p95_ms": float(np.percentile(milis, 95)),
+        "p99_ms": float(np.percentile(milis, 99)),
+        "media_ms": float(milis.mean())
+    }
+
+
+def _medir(funcion, argumentos):
+    tiempos = []
+    for argumento in argumentos:
+        inicio = time.perf_counter()
+        funcion(argumento)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def _memoria_pico_mb():
+    """Pico de memoria residente del proceso (None si no se puede medir)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def recall_contra_fuerza_bruta(rag, consultas, k=5):
+    """
+    Compara el top-k de buscar() con el exacto calculado por fuerza bruta
+    en NumPy sobre todos los vectores de la colección.
+
+    Returns:
+        float: Recall@k medio
+    """
+    datos = rag._cargar_matriz()
+    if not datos["ids"]:
+        return None
+    q = np.asarray(rag.embeddings.embed_consultas(list(consultas)), dtype=np.float32)
+    productos = q @ datos["matriz"].T
+    if datos["metrica"] == "cosine":
+        distancias = -productos / np.linalg.norm(q, axis=1, keepdims=True)
+    elif datos["metrica"] == "ip":
+        distancias = -productos
+    else:
+        distancias = datos["normas2"][None, :] - 2 * productos
+    k = min(k, len(datos["ids"]))
+    exactos = np.argsort(distancias, axis=1)[:, :k]
+
+    aciertos = []
+    for consulta, fila in zip(consultas, exactos):
+        esperados = {datos["ids"][i] for i in fila}
+        obtenidos = {doc.id for doc in rag.buscar(consulta, k=k)}
+        aciertos.append(len(esperados & obtenidos) / k)
+    return float(np.mean(aciertos))
+
+
+def ejecutar_benchmark(n_documentos=100, n_consultas=100, k=5, semilla=0, backend=None,
+                       particionado=None, carpeta=None, conservar=False):
+    """
+    Ejecuta el benchmark completo sobre un rag_db temporal.
+
+    Args:
+        n_documentos: Documentos del corpus sintético
+        n_consultas: Consultas para medir latencias y recall
+        k: Resultados por búsqueda
+        semilla: Semilla del corpus y de las consultas
+        backend: Backend de embeddings (por defecto, el de RAG_BACKEND_EMBEDDINGS)
+        particionado: Estrategia de particiones (por defecto, RAG_PARTICIONADO)
+        carpeta: Carpeta de trabajo (por defecto, una temporal)
+        conservar: Si True, no borra la carpeta de trabajo al terminar
+
+    Returns:
+        dict: Resultados (se pueden guardar como JSON)
+    """
+    from ragManager import RAGManager
+
+    carpeta = carpeta or tempfile.mkdtemp(prefix="benchmark_rag_")
+    carpeta_documentos = os.path.join(carpeta, "documentos")
+    try:
+        frases = generar_corpus(carpeta_documentos, n_documentos, semilla=semilla)
+        aleatorio = random.Random(semilla + 1)
+        # Dos tandas distintas: obtener_contexto no debe aprovechar los
+        # embeddings de consulta que ya calculó buscar
+        consultas = []
+        for i in range(n_consultas * 2):
+            if i % 10 == 0:
+                consultas.append(f"DOC-{aleatorio.randrange(n_documentos):05d}")
+            else:
+                palabras = aleatorio.choice(frases).split()
+                inicio = aleatorio.randrange(max(1, len(palabras) - 5))
+                consultas.append(" ".join(palabras[inicio:inicio + 6]))
+        consultas, consultas_contexto = consultas[:n_consultas], consultas[n_consultas:]
+
+        inicio = time.perf_counter()
+        rag = RAGManager(
+            carpeta_persistencia=os.path.join(carpeta, "rag_db"),
+            carpeta_documentos=carpeta_documentos,
+            backend_embeddings=backend,
+            particionado=particionado
+        )
+        segundos_arranque = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resumen = rag.agregar_carpeta_completa()
+        segundos_ingesta = time.perf_counter() - inicio
+        chunks = rag.almacen.contar()
+
+        # Embeddings sin cache: directamente contra el modelo
+        muestra = [doc.page_content for doc in rag._documentos_por_id(
+            [id_chunk for id_chunk in list(rag.indice_lexico.documentos())[:256]]
+        )]
+        inicio = time.perf_counter()
+        rag.embeddings.base.embed_documents(muestra)
+        segundos_embeddings = time.perf_counter() - inicio
+
+        # Latencias: primero sin cache de resultados (consultas nuevas), luego repetidas
+        buscar_frio = _medir(lambda c: rag.buscar(c, k=k), consultas)
+        buscar_caliente = _medir(lambda c: rag.buscar(c, k=k), consultas)
+        rag._cache_resultados.limpiar()
+        contexto_frio = _medir(lambda c: rag.obtener_contexto(c, k=k), consultas_contexto)
+        contexto_caliente = _medir(lambda c: rag.obtener_contexto(c, k=k), consultas_contexto)
+
+        inicio = time.perf_counter()
+        rag.buscar_lote(consultas, k=k)
+        segundos_lote = time.perf_counter() - inicio
+
+        return {
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "entorno": {
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "cpus": os.cpu_count()
+            },
+            "configuracion": {
+                "documentos": n_documentos,
+                "consultas": n_consultas,
+                "k": k,
+                "semilla": semilla,
+                "modelo": rag.nombre_modelo,
+                "backend": rag.backend_embeddings,
+                "particionado": rag.almacen.estrategia
+            },
+            "ingesta": {
+                "arranque_s": segundos_arranque,
+                "segundos": segundos_ingesta,
+                "chunks": chunks,
+                "errores": len(resumen["errores"]),
+                "documentos_por_s": n_documentos / segundos_ingesta,
+                "chunks_por_s": chunks / segundos_ingesta
+            },
+            "embeddings": {
+                "textos": len(muestra),
+                "textos_por_s": len(muestra) / segundos_embeddings if segundos_embeddings else None
+            },
+            "latencias": {
+                "buscar": _percentiles(buscar_frio),
+                "buscar_cacheado": _percentiles(buscar_caliente),
+                "obtener_contexto": _percentiles(contexto_frio),
+                "obtener_contexto_cacheado": _percentiles(contexto_caliente),
+                "buscar_lote_ms_por_consulta": segundos_lote * 1000 / len(consultas)
+            },
+            "recall": {
+                f"recall@{k}": recall_contra_fuerza_bruta(rag, consultas, k)
+            },
+            "memoria_pico_mb": _memoria_pico_mb()
+        }
+    finally:
+        if not conservar:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+
+# Métricas vigiladas al comparar: (ruta en el JSON, True si más alto es mejor)
+METRICAS_REGRESION = [
+    (("ingesta", "chunks_por_s"), True),
+    (("embeddings", "textos_por_s"), True),
+    (("latencias", "buscar", "p95_ms"), False),
+    (("latencias", "obtener_contexto", "p95_ms"), False),
+    (("memoria_pico_mb",), False),
+]
+
+
+def _valor(resultados, ruta):
+    for clave in ruta:
+        if not isinstance(resultados, dict):
+            return None
+        resultados = resultados.get(clave)
+    return resultados
+
+
+def comparar(actual, anterior, tolerancia=0.2):
+    """
+    Compara dos ejecuciones del benchmark.
+
+    Args:
+        actual, anterior: Resultados de ejecutar_benchmark
+        tolerancia: Empeoramiento relativo permitido en rendimiento (0.2 = 20 %)
+
+    Returns:
+        list: Textos con las regresiones encontradas (vacía si no hay)
+    """
+    regresiones = []
+    for ruta, mas_es_mejor in METRICAS_REGRESION:
+        nuevo, viejo = _valor(actual, ruta), _valor(anterior, ruta)
+        if not nuevo or not viejo:
+            continue
+        cambio = (nuevo - viejo) / viejo
+        if (mas_es_mejor and cambio < -tolerancia) or (not mas_es_mejor and cambio > tolerancia):
+            regresiones.append(f"{'.'.join(ruta)}: {viejo:.2f} -> {nuevo:.2f} ({cambio:+.0%})")
+
+    # El recall no depende de la máquina: cualquier caída notable es una regresión
+    for clave, viejo in (anterior.get("recall") or {}).items():
+        nuevo = (actual.get("recall") or {}).get(clave)
+        if nuevo is not None and viejo is not None and nuevo < viejo - 0.02:
+            regresiones.append(f"recall.{clave}: {viejo:.3f} -> {nuevo:.3f}")
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark y pruebas de regresión del RAG")
+    parser.add_argument("--documentos", type=int, default=100)
+    parser.add_argument("--consultas", type=int, default=100)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--backend", default=None, help="Backend de embeddings (torch, torch-int8, onnx, onnx-int8)")
+    parser.add_argument("--particionado", default=None, help="Estrategia de particiones (unico, tipo, carpeta, hash)")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--conservar", action="store_true", help="No borrar el corpus ni el rag_db temporales")
+    args = parser.parse_args()
+
+    resultados = ejecutar_benchmark(
+        args.documentos, args.consultas, args.k, args.semilla,
+        backend=args.backend, particionado=args.particionado, conservar=args.conservar
+    )
+    texto = json.dumps(resultados, ensure_ascii=False, indent=2)
+    print(texto)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+        if regresiones:
+            print("❌ Regresiones respecto a " + args.comparar + ":\n- " + "\n- ".join(regresiones), file=sys.stderr)
+            sys.exit(1)
+        print(f"✅ Sin regresiones respecto a {args.comparar}", file=sys.stderr)
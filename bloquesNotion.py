@@ -0,0 +1,284 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from cacheTTL import CacheTTL
+
+# ===========================================================
+#   ÁRBOL DE BLOQUES DE NOTION Y RENDERIZADO A MARKDOWN
+# ===========================================================
+#   Recorre en anchura los bloques de una página: en cada nivel pide en
+#   paralelo (con un límite de concurrencia) los hijos de todos los
+#   bloques que los tienen, paginando cada lista. El subárbol de cada
+#   bloque se cachea junto a su last_edited_time y se reutiliza mientras
+#   no cambie.
+
+# Bloques cuyos hijos son otra página: no se recorren
+NO_DESCENDER = {"child_page", "child_database"}
+
+ENCABEZADOS = {"heading_1": "#", "heading_2": "##", "heading_3": "###"}
+
+
+def texto_plano(rich_text):
+    """Texto de un rich_text de Notion; los enlaces en formato markdown"""
+    partes = []
+    for fragmento in rich_text or []:
+        texto = fragmento.get("plain_text", "")
+        enlace = fragmento.get("href")
+        partes.append(f"[{texto}]({enlace})" if enlace and texto else texto)
+    return "".join(partes)
+
+
+def contar_bloques(bloques):
+    """Número de bloques de un árbol, contando los anidados"""
+    return sum(1 + contar_bloques(b.get("children", [])) for b in bloques)
+
+
+class LectorBloques:
+    """
+    Descarga el árbol completo de bloques de una página.
+
+    Funciona con el cliente síncrono (hilos) y con el asíncrono
+    (asyncio.gather); ambos comparten el mismo recorrido y el mismo cache.
+    """
+
+    def __init__(self, concurrencia=4, max_bloques=2000, max_entradas_cache=256, ttl_cache=600):
+        """
+        Args:
+            concurrencia: Listas de hijos que se piden a la vez
+            max_bloques: Bloques como máximo por página (el resto no se descarga)
+            max_entradas_cache: Subárboles cacheados
+            ttl_cache: Segundos de vida de un subárbol cacheado aunque no cambie su
+                       last_edited_time (el de un bloque no siempre refleja cambios en sus nietos)
+        """
+        self.concurrencia = concurrencia
+        self.max_bloques = max_bloques
+        self.cache = CacheTTL(max_entradas=max_entradas_cache, ttl=ttl_cache)
+        self._pool = ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix="notion-bloques")
+
+    # -----------------------------------------------------------
+    #   Recorrido
+    # -----------------------------------------------------------
+    def _recorrido(self, id_raiz, editado_raiz):
+        """
+        Recorrido en anchura como generador: produce listas de IDs cuyos hijos
+        hay que descargar y recibe {id: [bloques]}. Devuelve (bloques, completo).
+        """
+        raiz = {"id": id_raiz, "last_edited_time": editado_raiz, "has_children": True}
+        nivel = [raiz]
+        total = 0
+        completo = True
+        while nivel:
+            pendientes = []
+            for bloque in nivel:
+                cacheado = self.cache.obtener((bloque["id"], bloque.get("last_edited_time")))
+                if cacheado is not None:
+                    bloque["children"] = cacheado
+                    total += contar_bloques(cacheado)
+                else:
+                    pendientes.append(bloque)
+
+            if total >= self.max_bloques:
+                completo = completo and not pendientes
+                break
+
+            descargados = (yield [bloque["id"] for bloque in pendientes]) if pendientes else {}
+            siguiente = []
+            for bloque in pendientes:
+                hijos = descargados[bloque["id"]]
+                bloque["children"] = hijos
+                total += len(hijos)
+                siguiente.extend(
+                    hijo for hijo in hijos if hijo.get("has_children") and hijo.get("type") not in NO_DESCENDER
+                )
+            if total >= self.max_bloques and siguiente:
+                completo = False
+                break
+            nivel = siguiente
+
+        if editado_raiz is not None:
+            self.recordar(id_raiz, editado_raiz, raiz.get("children", []))
+        return raiz.get("children", []), completo
+
+    def recordar(self, id_raiz, last_edited_time, bloques):
+        """
+        Cachea el árbol de una página bajo su last_edited_time y lo anota como
+        la última versión leída (ver ultima_edicion).
+        """
+        self._guardar_en_cache({"id": id_raiz, "last_edited_time": last_edited_time, "children": bloques})
+        self.cache.guardar(("edicion", id_raiz), last_edited_time)
+
+    def ultima_edicion(self, id_raiz):
+        """last_edited_time de la última lectura de una página (None si no se ha leído o ha caducado)"""
+        return self.cache.obtener(("edicion", id_raiz))
+
+    def _guardar_en_cache(self, bloque):
+        """Cachea los subárboles completos, de las hojas hacia arriba"""
+        completo = True
+        for hijo in bloque.get("children", []):
+            if hijo.get("has_children") and hijo.get("type") not in NO_DESCENDER:
+                completo = self._guardar_en_cache(hijo) and completo
+        if "children" not in bloque:
+            return False
+        if completo:
+            self.cache.guardar((bloque["id"], bloque.get("last_edited_time")), bloque["children"])
+        return completo
+
+    @staticmethod
+    def _hijos(cliente, id_bloque):
+        """Todos los hijos de un bloque, paginando"""
+        hijos, cursor = [], None
+        while True:
+            kwargs = {"block_id": id_bloque, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            respuesta = cliente.blocks.children.list(**kwargs)
+            hijos.extend(respuesta.get("results", []))
+            cursor = respuesta.get("next_cursor")
+            if not respuesta.get("has_more") or not cursor:
+                return hijos
+
+    @staticmethod
+    async def _ahijos(cliente, id_bloque):
+        hijos, cursor = [], None
+        while True:
+            kwargs = {"block_id": id_bloque, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            respuesta = await cliente.blocks.children.list(**kwargs)
+            hijos.extend(respuesta.get("results", []))
+            cursor = respuesta.get("next_cursor")
+            if not respuesta.get("has_more") or not cursor:
+                return hijos
+
+    def leer(self, cliente, id_pagina, last_edited_time=None):
+        """
+        Árbol de bloques de una página con el cliente síncrono.
+
+        Args:
+            cliente: notion_client.Client (o ClienteNotion)
+            id_pagina: Página o bloque raíz
+            last_edited_time: El de la página; si coincide con el cacheado no se pide nada
+
+        Returns:
+            (bloques, completo): Bloques de primer nivel con sus "children", y
+            False si se ha cortado por max_bloques
+        """
+        recorrido = self._recorrido(id_pagina, last_edited_time)
+        try:
+            ids = next(recorrido)
+            while True:
+                hijos = list(self._pool.map(lambda id_bloque: self._hijos(cliente, id_bloque), ids))
+                ids = recorrido.send(dict(zip(ids, hijos)))
+        except StopIteration as fin:
+            return fin.value
+
+    async def aleer(self, cliente, id_pagina, last_edited_time=None):
+        """Como leer, con el AsyncClient y un semáforo de `concurrencia` peticiones"""
+        semaforo = asyncio.Semaphore(self.concurrencia)
+
+        async def hijos(id_bloque):
+            async with semaforo:
+                return await self._ahijos(cliente, id_bloque)
+
+        recorrido = self._recorrido(id_pagina, last_edited_time)
+        try:
+            ids = next(recorrido)
+            while True:
+                resultados = await asyncio.gather(*(hijos(id_bloque) for id_bloque in ids))
+                ids = recorrido.send(dict(zip(ids, resultados)))
+        except StopIteration as fin:
+            return fin.value
+
+
+# ===========================================================
+#   MARKDOWN
+# ===========================================================
+
+def _linea(bloque, numero):
+    """Markdown de un bloque sin sus hijos"""
+    tipo = bloque.get("type")
+    datos = bloque.get(tipo) or {}
+    texto = texto_plano(datos.get("rich_text"))
+
+    if tipo == "paragraph":
+        return texto
+    if tipo in ENCABEZADOS:
+        return f"{ENCABEZADOS[tipo]} {texto}"
+    if tipo == "bulleted_list_item":
+        return f"- {texto}"
+    if tipo == "numbered_list_item":
+        return f"{numero}. {texto}"
+    if tipo == "to_do":
+        return f"- [{'x' if datos.get('checked') else ' '}] {texto}"
+    if tipo == "toggle":
+        return f"▸ {texto}"
+    if tipo == "quote":
+        return f"> {texto}"
+    if tipo == "callout":
+        icono = (datos.get("icon") or {}).get("emoji", "💡")
+        return f"> {icono} {texto}"
+    if tipo == "code":
+        return f"```{datos.get('language', '')}\n{texto}\n```"
+    if tipo == "equation":
+        return f"$$ {datos.get('expression', '')} $$"
+    if tipo == "divider":
+        return "---"
+    if tipo == "child_page":
+        return f"📄 Subpágina: {datos.get('title') or 'Sin título'} (ID: {bloque['id']})"
+    if tipo == "child_database":
+        return f"📚 Base de datos: {datos.get('title') or 'Sin título'} (ID: {bloque['id']})"
+    if tipo == "table_row":
+        return "| " + " | ".join(texto_plano(celda) for celda in datos.get("cells", [])) + " |"
+    if tipo in ("table", "column_list", "column", "synced_block"):
+        return None
+    if tipo in ("image", "video", "file", "pdf", "audio"):
+        url = (datos.get(datos.get("type")) or {}).get("url", "")
+        pie = texto_plano(datos.get("caption"))
+        return f"[{tipo}: {pie or url}]({url})"
+    if tipo in ("bookmark", "embed", "link_preview"):
+        return f"<{datos.get('url', '')}>"
+    return f"[{tipo}]"
+
+
+def a_markdown(bloques, max_caracteres=8000):
+    """
+    Convierte un árbol de bloques en markdown compacto.
+
+    Los hijos se sangran dos espacios por nivel. Si el texto supera
+    `max_caracteres` se corta por un bloque completo y se indica cuántos
+    quedan sin mostrar.
+
+    Returns:
+        (texto, bloques_omitidos)
+    """
+    lineas = []
+    longitud = 0
+    omitidos = 0
+
+    def recorrer(nivel, profundidad):
+        nonlocal longitud, omitidos
+        numero = 0
+        for bloque in nivel:
+            numero = numero + 1 if bloque.get("type") == "numbered_list_item" else 0
+            if longitud >= max_caracteres:
+                omitidos += 1 + contar_bloques(bloque.get("children", []))
+                continue
+            linea = _linea(bloque, numero)
+            if linea is not None:
+                sangria = "  " * profundidad
+                linea = "\n".join(sangria + parte for parte in linea.split("\n"))
+                if longitud + len(linea) > max_caracteres and lineas:
+                    longitud = max_caracteres
+                    omitidos += 1 + contar_bloques(bloque.get("children", []))
+                    continue
+                lineas.append(linea)
+                longitud += len(linea) + 1
+            hijos = bloque.get("children", [])
+            # Las celdas de tablas y columnas no añaden sangría
+            recorrer(hijos, profundidad if linea is None else profundidad + 1)
+
+    recorrer(bloques, 0)
+    texto = "\n".join(lineas)
+    if omitidos:
+        texto += f"\n… ({omitidos} bloques más sin mostrar)"
+    return texto, omitidos
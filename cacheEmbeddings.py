@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ===========================================================
+#   CACHE PERSISTENTE DE EMBEDDINGS
+#   (modelo, hash del texto) -> vector float32 en un memmap
+# ===========================================================
+
+
+class EmbeddingsCacheados(Embeddings):
+    """
+    Envoltorio de un modelo de embeddings que evita recalcular chunks ya vistos.
+
+    Los vectores se guardan en un archivo float32 mapeado en memoria con
+    capacidad fija; un índice JSON asocia cada clave a su fila. Cuando se
+    llena, se desaloja la entrada usada hace más tiempo (LRU). Las consultas
+    tienen su propio LRU pequeño en memoria.
+
+    El índice JSON se escribe cada `intervalo_guardado` segundos, así que
+    tras una caída puede estar desfasado. Por eso cada fila guarda además
+    la clave de su vector en un segundo memmap: al cargar se descartan las
+    entradas cuya fila ya contiene otra clave y se recuperan las filas
+    escritas después del último guardado.
+    """
+
+    def __init__(self, base, nombre_modelo, carpeta, max_entradas=100_000, max_consultas=256, intervalo_guardado=5.0):
+        """
+        Args:
+            base: Modelo de embeddings real (p. ej. HuggingFaceEmbeddings)
+            nombre_modelo: Identificador del modelo, forma parte de la clave
+            carpeta: Carpeta donde se guardan los vectores y el índice
+            max_entradas: Capacidad máxima del cache en disco
+            max_consultas: Capacidad del LRU de consultas en memoria
+            intervalo_guardado: Segundos mínimos entre escrituras del índice
+        """
+        self.base = base
+        self.nombre_modelo = nombre_modelo
+        self.capacidad = max_entradas
+        self.max_consultas = max_consultas
+        self.intervalo_guardado = intervalo_guardado
+
+        os.makedirs(carpeta, exist_ok=True)
+        slug = re.sub(r"[^\w.-]+", "_", nombre_modelo)
+        self.ruta_vectores = os.path.join(carpeta, f"{slug}.f32")
+        self.ruta_indice = os.path.join(carpeta, f"{slug}.json")
+        self.ruta_claves = os.path.join(carpeta, f"{slug}.keys")
+
+        self._lock = threading.Lock()
+        self._indice = OrderedDict()  # clave -> fila, en orden de uso
+        self._libres = []
+        self._vectores = None
+        self._claves = None  # fila -> sha1 (20 bytes) del vector que contiene
+        self._dim = None
+        self._consultas = OrderedDict()
+        self._sucio = False
+        self._ultimo_guardado = 0.0
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.aciertos_consultas = 0
+        self.fallos_consultas = 0
+
+        self._cargar()
+        atexit.register(self.guardar)
+
+    # -----------------------------------------------------------
+    #   Persistencia
+    # -----------------------------------------------------------
+    def _cargar(self):
+        try:
+            with open(self.ruta_indice, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if datos.get("modelo") != self.nombre_modelo or not os.path.exists(self.ruta_vectores):
+            return
+        # Sin las claves por fila no se puede comprobar el índice: se empieza de cero
+        if not os.path.exists(self.ruta_claves):
+            return
+
+        # El archivo de vectores conserva la capacidad con la que se creó
+        self._dim = datos["dim"]
+        self.capacidad = datos["capacidad"]
+        self._vectores = np.memmap(self.ruta_vectores, dtype=np.float32, mode="r+", shape=(self.capacidad, self._dim))
+        self._claves = np.memmap(self.ruta_claves, dtype=np.uint8, mode="r+", shape=(self.capacidad, 20))
+
+        # Solo valen las entradas cuya fila sigue conteniendo su clave
+        filas = {}
+        for fila in range(self.capacidad):
+            clave = self._claves[fila].tobytes()
+            if any(clave):
+                filas[clave.hex()] = fila
+        self._indice = OrderedDict(
+            (clave, fila) for clave, fila in datos["entradas"] if filas.get(clave) == fila
+        )
+        # Filas escritas después del último guardado: se recuperan como las menos recientes
+        recuperadas = [(clave, fila) for clave, fila in filas.items() if clave not in self._indice]
+        for clave, fila in recuperadas:
+            self._indice[clave] = fila
+            self._indice.move_to_end(clave, last=False)
+        ocupadas = set(self._indice.values())
+        self._libres = [fila for fila in range(self.capacidad - 1, -1, -1) if fila not in ocupadas]
+        if len(self._indice) != len(datos["entradas"]) or recuperadas:
+            self._sucio = True
+
+    def _crear_almacen(self, dim):
+        self._dim = dim
+        self._vectores = np.memmap(self.ruta_vectores, dtype=np.float32, mode="w+", shape=(self.capacidad, dim))
+        self._claves = np.memmap(self.ruta_claves, dtype=np.uint8, mode="w+", shape=(self.capacidad, 20))
+        self._indice.clear()
+        self._libres = list(range(self.capacidad - 1, -1, -1))
+
+    def guardar(self):
+        """Vuelca los vectores y escribe el índice de forma atómica"""
+        with self._lock:
+            if not self._sucio or self._vectores is None:
+                return
+            self._vectores.flush()
+            self._claves.flush()
+            datos = {
+                "modelo": self.nombre_modelo,
+                "dim": self._dim,
+                "capacidad": self._vectores.shape[0],
+                "entradas": list(self._indice.items())
+            }
+            temporal = self.ruta_indice + ".tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f)
+            os.replace(temporal, self.ruta_indice)
+            self._sucio = False
+            self._ultimo_guardado = time.monotonic()
+
+    # -----------------------------------------------------------
+    #   Cache
+    # -----------------------------------------------------------
+    def _clave(self, texto):
+        return hashlib.sha1(f"{self.nombre_modelo}\0{texto}".encode('utf-8')).hexdigest()
+
+    def _guardar_vector(self, clave, vector):
+        """Guarda un vector en el almacén (con el lock tomado)"""
+        if self._vectores is None:
+            self._crear_almacen(len(vector))
+        if clave in self._indice:
+            self._indice.move_to_end(clave)
+            return
+        if self._libres:
+            fila = self._libres.pop()
+        else:
+            _, fila = self._indice.popitem(last=False)
+            self.desalojos += 1
+        # La fila se marca vacía mientras se reescribe: si el proceso muere a
+        # medias, al cargar no se confunde el vector nuevo con la clave antigua
+        self._claves[fila] = 0
+        self._vectores[fila] = vector
+        self._claves[fila] = np.frombuffer(bytes.fromhex(clave), dtype=np.uint8)
+        self._indice[clave] = fila
+        self._sucio = True
+
+    def embed_documents(self, texts):
+        claves = [self._clave(t) for t in texts]
+        resultado = [None] * len(texts)
+        pendientes = OrderedDict()  # clave -> (texto, posiciones)
+
+        with self._lock:
+            for i, clave in enumerate(claves):
+                fila = self._indice.get(clave)
+                if fila is not None:
+                    self._indice.move_to_end(clave)
+                    resultado[i] = self._vectores[fila].tolist()
+                    self.aciertos += 1
+                else:
+                    pendientes.setdefault(clave, (texts[i], []))[1].append(i)
+                    self.fallos += 1
+
+        if pendientes:
+            nuevos = self.base.embed_documents([texto for texto, _ in pendientes.values()])
+            with self._lock:
+                for (clave, (_, posiciones)), vector in zip(pendientes.items(), nuevos):
+                    vector = [float(x) for x in vector]
+                    self._guardar_vector(clave, vector)
+                    for i in posiciones:
+                        resultado[i] = vector
+            if time.monotonic() - self._ultimo_guardado >= self.intervalo_guardado:
+                self.guardar()
+
+        return resultado
+
+    def embed_query(self, text):
+        with self._lock:
+            vector = self._consultas.get(text)
+            if vector is not None:
+                self._consultas.move_to_end(text)
+                self.aciertos_consultas += 1
+                return vector
+            self.fallos_consultas += 1
+
+        vector = self.base.embed_query(text)
+        with self._lock:
+            self._consultas[text] = vector
+            if len(self._consultas) > self.max_consultas:
+                self._consultas.popitem(last=False)
+        return vector
+
+    def embed_consultas(self, textos):
+        """
+        Embeddings de varias consultas a la vez: las que no están en el LRU
+        de consultas se calculan en un único lote.
+        """
+        resultado = [None] * len(textos)
+        pendientes = OrderedDict()  # texto -> posiciones
+        with self._lock:
+            for i, texto in enumerate(textos):
+                vector = self._consultas.get(texto)
+                if vector is not None:
+                    self._consultas.move_to_end(texto)
+                    self.aciertos_consultas += 1
+                    resultado[i] = vector
+                else:
+                    pendientes.setdefault(texto, []).append(i)
+                    self.fallos_consultas += 1
+
+        if pendientes:
+            nuevos = self.base.embed_documents(list(pendientes))
+            with self._lock:
+                for (texto, posiciones), vector in zip(pendientes.items(), nuevos):
+                    for i in posiciones:
+                        resultado[i] = vector
+                    self._consultas[texto] = vector
+                    self._consultas.move_to_end(texto)
+                while len(self._consultas) > self.max_consultas:
+                    self._consultas.popitem(last=False)
+        return resultado
+
+    def estadisticas(self):
+        """
+        Devuelve contadores de aciertos y fallos del cache.
+
+        Returns:
+            dict: Estadísticas del cache de documentos y de consultas
+        """
+        with self._lock:
+            total = self.aciertos + self.fallos
+            total_consultas = self.aciertos_consultas + self.fallos_consultas
+            return {
+                "entradas": len(self._indice),
+                "capacidad": self.capacidad,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+                "consultas_en_memoria": len(self._consultas),
+                "aciertos_consultas": self.aciertos_consultas,
+                "fallos_consultas": self.fallos_consultas,
+                "tasa_aciertos_consultas": self.aciertos_consultas / total_consultas if total_consultas else 0.0
+            }
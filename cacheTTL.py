@@ -0,0 +1,102 @@
+import time
+import threading
+from collections import OrderedDict
+
+# ===========================================================
+#   CACHE LRU CON CADUCIDAD (TTL)
+# ===========================================================
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    """
+    Cache en memoria acotado por número de entradas (LRU) y por tiempo (TTL).
+
+    Es seguro entre hilos. Cada entrada puede tener su propio TTL; si no se
+    indica, se usa el TTL por defecto.
+    """
+
+    def __init__(self, max_entradas=512, ttl=300.0):
+        """
+        Args:
+            max_entradas: Número máximo de entradas antes de desalojar la menos usada
+            ttl: Segundos de vida por defecto de cada entrada (None = sin caducidad)
+        """
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (valor, expira)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.caducados = 0
+        self.desalojos = 0
+
+    def obtener(self, clave, defecto=None):
+        """Devuelve el valor si existe y no ha caducado; si no, `defecto`"""
+        with self._lock:
+            entrada = self._datos.get(clave, _AUSENTE)
+            if entrada is not _AUSENTE:
+                valor, expira = entrada
+                if expira is None or expira > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return valor
+                del self._datos[clave]
+                self.caducados += 1
+            self.fallos += 1
+            return defecto
+
+    def guardar(self, clave, valor, ttl=_AUSENTE):
+        """Guarda un valor; `ttl` sustituye al TTL por defecto para esta entrada"""
+        ttl = self.ttl if ttl is _AUSENTE else ttl
+        expira = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, clave):
+        """Elimina una entrada concreta"""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def invalidar_si(self, condicion):
+        """
+        Elimina todas las entradas cuya clave cumpla la condición.
+
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        with self._lock:
+            claves = [clave for clave in self._datos if condicion(clave)]
+            for clave in claves:
+                del self._datos[clave]
+            return len(claves)
+
+    def limpiar(self):
+        """Vacía el cache (mantiene las estadísticas)"""
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Entradas, aciertos, fallos y tasa de aciertos
+        """
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "caducados": self.caducados,
+                "desalojos": self.desalojos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0
+            }
@@ -1,3 +1,5 @@
+import os
+import csv
 import pandas as pd
 import json
 import PyPDF2
@@ -5,6 +7,8 @@ from PIL import Image
 import numpy as np
 import io
 import base64
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 
 # def leerTexto(uploaded_file):
@@ -105,12 +109,187 @@ def leerExcel(ruta):
     return df   
 
 def leerPdf(ruta):
-    texto = ""
+    return "".join(texto for _, texto in leerPdfPorPaginas(ruta))
+
+def _extraerPaginasPdf(ruta, inicio, fin):
+    """Extrae el texto de las páginas [inicio, fin) de un PDF (para procesos trabajadores)"""
+    with open(ruta, 'rb') as f:
+        lector = PyPDF2.PdfReader(f)
+        return [lector.pages[i].extract_text() or "" for i in range(inicio, fin)]
+
+def leerPdfPorPaginas(ruta, procesos=None, umbral_paginas=50, paginas_por_tarea=10):
+    """
+    Lee un PDF página a página sin cargar todo el texto en memoria.
+    
+    Args:
+        ruta: Ruta del PDF
+        procesos: Si se indica y el PDF tiene al menos `umbral_paginas`
+                  páginas, la extracción se reparte entre procesos
+        umbral_paginas: Páginas mínimas para extraer en paralelo
+        paginas_por_tarea: Páginas que extrae cada tarea en paralelo
+    
+    Yields:
+        (número de página empezando en 1, texto de la página)
+    """
     with open(ruta, 'rb') as f:
         lector = PyPDF2.PdfReader(f)
-        for pagina in lector.pages:
-            texto += pagina.extract_text()
-    return texto
+        total = len(lector.pages)
+        if not procesos or procesos < 2 or total < umbral_paginas:
+            for i, pagina in enumerate(lector.pages, 1):
+                yield i, pagina.extract_text() or ""
+            return
+    
+    # En paralelo: como mucho 2 tareas por proceso en vuelo para acotar memoria
+    rangos = [(i, min(i + paginas_por_tarea, total)) for i in range(0, total, paginas_por_tarea)]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        siguiente = 0
+        while siguiente < len(rangos) or pendientes:
+            while siguiente < len(rangos) and len(pendientes) < procesos * 2:
+                inicio, fin = rangos[siguiente]
+                pendientes.append((inicio, pool.submit(_extraerPaginasPdf, ruta, inicio, fin)))
+                siguiente += 1
+            inicio, futuro = pendientes.popleft()
+            for i, texto in enumerate(futuro.result(), inicio + 1):
+                yield i, texto
+
+def _filaCSV(valores):
+    """Convierte una fila en una línea CSV (con comillas si hace falta)"""
+    salida = io.StringIO()
+    csv.writer(salida, lineterminator="").writerow(["" if v is None else v for v in valores])
+    return salida.getvalue()
+
+def _agruparFilas(filas, columnas, max_caracteres, extra=None):
+    """
+    Agrupa filas en bloques de texto de como mucho `max_caracteres`, cada uno
+    con la cabecera delante.
+    
+    Args:
+        filas: Iterable de (número de fila, valores)
+        columnas: Nombres de las columnas
+        max_caracteres: Tamaño máximo de cada bloque (una fila más larga va sola)
+        extra: Metadatos comunes a todos los bloques (p. ej. la hoja)
+    
+    Yields:
+        (texto, metadatos con columnas y rango de filas)
+    """
+    cabecera = _filaCSV(columnas)
+    metadatos_base = {"columnas": ", ".join(str(c) for c in columnas), **(extra or {})}
+    lineas, inicio, fin = [], None, None
+    longitud = len(cabecera)
+    for numero, valores in filas:
+        linea = _filaCSV(valores)
+        if lineas and longitud + len(linea) + 1 > max_caracteres:
+            yield "\n".join([cabecera] + lineas), {**metadatos_base, "fila_inicio": inicio, "fila_fin": fin}
+            lineas, longitud = [], len(cabecera)
+        if not lineas:
+            inicio = numero
+        lineas.append(linea)
+        longitud += len(linea) + 1
+        fin = numero
+    if lineas:
+        yield "\n".join([cabecera] + lineas), {**metadatos_base, "fila_inicio": inicio, "fila_fin": fin}
+
+def leerCSVPorLotes(ruta, max_caracteres=1000, filas_por_lectura=5000):
+    """
+    Lee un CSV en bloques de filas sin cargarlo entero en memoria.
+    
+    Yields:
+        (texto con cabecera + filas, {"columnas", "fila_inicio", "fila_fin"})
+    """
+    def filas():
+        numero = 0
+        for df in pd.read_csv(ruta, chunksize=filas_por_lectura, dtype=str, keep_default_na=False):
+            for valores in df.itertuples(index=False, name=None):
+                numero += 1
+                yield numero, valores
+    
+    columnas = pd.read_csv(ruta, nrows=0).columns.tolist()
+    yield from _agruparFilas(filas(), columnas, max_caracteres)
+
+def _iterarHojaExcel(ruta, hoja, max_caracteres):
+    """Lee y agrupa una hoja de Excel bloque a bloque"""
+    if ruta.lower().endswith(".xls"):
+        df = pd.read_excel(ruta, sheet_name=hoja, dtype=str).fillna("")
+        columnas = df.columns.tolist()
+        filas = enumerate(df.itertuples(index=False, name=None), 1)
+        yield from _agruparFilas(filas, columnas, max_caracteres, {"hoja": hoja})
+        return
+    
+    import openpyxl
+    # En modo solo lectura el archivo queda abierto hasta cerrar el libro
+    libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        iterador = libro[hoja].iter_rows(values_only=True)
+        columnas = list(next(iterador, ()))
+        yield from _agruparFilas(enumerate(iterador, 1), columnas, max_caracteres, {"hoja": hoja})
+    finally:
+        libro.close()
+
+def _leerHojaExcel(ruta, hoja, max_caracteres):
+    """Lee y agrupa una hoja de Excel entera (para procesos trabajadores)"""
+    return list(_iterarHojaExcel(ruta, hoja, max_caracteres))
+
+def leerExcelPorLotes(ruta, max_caracteres=1000, procesos=None):
+    """
+    Lee un Excel en bloques de filas, hoja a hoja.
+    
+    Args:
+        procesos: Si se indica y hay varias hojas, se procesan en paralelo
+    
+    Yields:
+        (texto con cabecera + filas, {"columnas", "fila_inicio", "fila_fin", "hoja"})
+    """
+    with pd.ExcelFile(ruta) as libro:
+        hojas = libro.sheet_names
+    if not procesos or procesos < 2 or len(hojas) < 2:
+        # Sin procesos trabajadores los bloques se van entregando según se leen
+        for hoja in hojas:
+            yield from _iterarHojaExcel(ruta, hoja, max_caracteres)
+        return
+    
+    with ProcessPoolExecutor(max_workers=min(procesos, len(hojas))) as pool:
+        for bloques in pool.map(_leerHojaExcel, [ruta] * len(hojas), hojas, [max_caracteres] * len(hojas)):
+            yield from bloques
+
+def leerTablaVistaPrevia(ruta, filas=20):
+    """Devuelve la cabecera y las primeras filas de un CSV o Excel sin leerlo entero"""
+    if ruta.lower().endswith(".csv"):
+        df = pd.read_csv(ruta, nrows=filas)
+    else:
+        df = pd.read_excel(ruta, nrows=filas)
+    return df.to_string(index=False)
+
+# Extensiones que se pueden indexar en el RAG
+EXTENSIONES_RAG = {".txt", ".md", ".py", ".log", ".pdf", ".json", ".csv", ".xlsx", ".xls"}
+
+def leerDocumentoPorPartes(ruta, procesos=None, max_caracteres=1000):
+    """
+    Lee un archivo para el RAG como una secuencia de partes.
+    
+    Los PDF se entregan página a página; los CSV y Excel, en bloques de filas
+    con la cabecera; el resto de tipos, en una sola parte.
+    
+    Args:
+        ruta: Ruta del archivo
+        procesos: Procesos para extraer en paralelo páginas de PDFs grandes u hojas de Excel
+        max_caracteres: Tamaño máximo de cada bloque de filas (el de los chunks)
+    
+    Returns:
+        Generador de (texto, metadatos extra), o None si el tipo no está soportado
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".pdf":
+        return ((texto, {"pagina": n}) for n, texto in leerPdfPorPaginas(ruta, procesos=procesos))
+    if extension in [".txt", ".md", ".py", ".log"]:
+        return iter([(leerTexto(ruta), {})])
+    if extension == ".json":
+        return iter([(str(leerJSON(ruta)), {})])
+    if extension == ".csv":
+        return leerCSVPorLotes(ruta, max_caracteres=max_caracteres)
+    if extension in [".xlsx", ".xls"]:
+        return leerExcelPorLotes(ruta, max_caracteres=max_caracteres, procesos=procesos)
+    return None
 
 def leerImagen(ruta):
     try:
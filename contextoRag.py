@@ -0,0 +1,171 @@
+import re
+import hashlib
+
+# ===========================================================
+#   ENSAMBLADO DE CONTEXTO CON PRESUPUESTO DE TOKENS
+# ===========================================================
+
+SIN_RESULTADOS = "No se encontró información relevante en el RAG."
+CABECERA = "### Información relevante del RAG:\n\n"
+
+
+def contar_tokens(texto):
+    """Estimación rápida de tokens (~4 caracteres por token en español e inglés)"""
+    return (len(texto) + 3) // 4
+
+
+def _solapamiento(anterior, siguiente, maximo=400, minimo=20):
+    """Longitud del mayor sufijo de `anterior` que es prefijo de `siguiente`"""
+    for longitud in range(min(len(anterior), len(siguiente), maximo), minimo - 1, -1):
+        if anterior.endswith(siguiente[:longitud]):
+            return longitud
+    return 0
+
+
+def fusionar_adyacentes(documentos):
+    """
+    Une los chunks consecutivos del mismo archivo (y página) eliminando el
+    texto que repiten por el solapamiento del splitter.
+
+    Args:
+        documentos: Documents en orden de relevancia
+
+    Returns:
+        list: Bloques {"texto", "metadata", "rango", "chunks"} en orden de relevancia
+        del mejor chunk de cada bloque
+    """
+    grupos = {}
+    for rango, doc in enumerate(documentos):
+        metadata = doc.metadata or {}
+        clave = (metadata.get("ruta"), metadata.get("pagina"), metadata.get("hoja"))
+        grupos.setdefault(clave, []).append((rango, doc))
+
+    bloques = []
+    for miembros in grupos.values():
+        con_posicion = [m for m in miembros if isinstance(m[1].metadata.get("chunk"), int)]
+        sin_posicion = [m for m in miembros if not isinstance(m[1].metadata.get("chunk"), int)]
+        con_posicion.sort(key=lambda m: m[1].metadata["chunk"])
+
+        actual = None
+        for rango, doc in con_posicion:
+            posicion = doc.metadata["chunk"]
+            if actual is not None and posicion == actual["ultimo"] + 1:
+                solape = _solapamiento(actual["texto"], doc.page_content)
+                separador = "" if solape else "\n"
+                actual["texto"] += separador + doc.page_content[solape:]
+                actual["ultimo"] = posicion
+                actual["rango"] = min(actual["rango"], rango)
+                actual["chunks"] += 1
+                continue
+            if actual is not None:
+                bloques.append(actual)
+            actual = {"texto": doc.page_content, "metadata": doc.metadata, "rango": rango, "ultimo": posicion, "chunks": 1}
+        if actual is not None:
+            bloques.append(actual)
+
+        for rango, doc in sin_posicion:
+            bloques.append({"texto": doc.page_content, "metadata": doc.metadata, "rango": rango, "chunks": 1})
+
+    bloques.sort(key=lambda b: b["rango"])
+    return bloques
+
+
+def _huellas(texto, n=5):
+    """Shingles de n palabras (hasheados) para comparar textos"""
+    palabras = re.findall(r"\w+", texto.casefold())
+    if len(palabras) < n:
+        return {hash(" ".join(palabras))}
+    return {hash(" ".join(palabras[i:i + n])) for i in range(len(palabras) - n + 1)}
+
+
+def suprimir_casi_duplicados(bloques, umbral=0.8):
+    """
+    Elimina los bloques casi idénticos a otro más relevante.
+
+    Se compara el hash del texto normalizado (duplicados exactos) y la
+    similitud de Jaccard de shingles de 5 palabras (casi duplicados).
+
+    Returns:
+        (bloques conservados, número de bloques descartados)
+    """
+    conservados = []
+    vistos = set()
+    huellas_conservadas = []
+    descartados = 0
+    for bloque in bloques:
+        normalizado = " ".join(bloque["texto"].split()).casefold()
+        resumen = hashlib.sha1(normalizado.encode("utf-8")).digest()
+        if resumen in vistos:
+            descartados += 1
+            continue
+        huellas = _huellas(bloque["texto"])
+        if any(len(huellas & otras) / len(huellas | otras) >= umbral for otras in huellas_conservadas):
+            descartados += 1
+            continue
+        vistos.add(resumen)
+        huellas_conservadas.append(huellas)
+        conservados.append(bloque)
+    return conservados, descartados
+
+
+def ensamblar_contexto(documentos, presupuesto_tokens=None, umbral_duplicados=0.8):
+    """
+    Construye el contexto para el LLM sin repeticiones y dentro de un presupuesto.
+
+    Args:
+        documentos: Documents en orden de relevancia
+        presupuesto_tokens: Tokens máximos del contexto (None = sin límite)
+        umbral_duplicados: Similitud de Jaccard a partir de la cual un bloque es duplicado
+
+    Returns:
+        (texto del contexto, estadísticas con los tokens ahorrados)
+    """
+    if not documentos:
+        return SIN_RESULTADOS, {"tokens_originales": 0, "tokens_finales": 0, "tokens_ahorrados": 0}
+
+    # Lo que ocuparía concatenar los chunks tal cual
+    tokens_originales = contar_tokens(CABECERA) + sum(
+        contar_tokens(f"**[{i}] Fuente: {doc.metadata.get('fuente', 'desconocida')}**\n{doc.page_content}\n\n")
+        for i, doc in enumerate(documentos, 1)
+    )
+
+    bloques = fusionar_adyacentes(documentos)
+    fusionados = len(documentos) - len(bloques)
+    bloques, duplicados = suprimir_casi_duplicados(bloques, umbral_duplicados)
+
+    contexto = CABECERA
+    usados = contar_tokens(contexto)
+    recortados = 0
+    fuera_de_presupuesto = 0
+    incluidos = 0
+    for bloque in bloques:
+        metadata = bloque["metadata"]
+        fuente = metadata.get("fuente", "desconocida")
+        if metadata.get("pagina"):
+            fuente += f" (pág. {metadata['pagina']})"
+        encabezado = f"**[{incluidos + 1}] Fuente: {fuente}**\n"
+        texto = bloque["texto"]
+        coste = contar_tokens(encabezado + texto + "\n\n")
+        if presupuesto_tokens is not None and usados + coste > presupuesto_tokens:
+            disponible = (presupuesto_tokens - usados - contar_tokens(encabezado) - 1) * 4
+            if disponible < 200:
+                fuera_de_presupuesto += 1
+                continue
+            texto = texto[:disponible].rsplit(" ", 1)[0] + " …"
+            recortados += 1
+        contexto += f"{encabezado}{texto}\n\n"
+        usados += contar_tokens(f"{encabezado}{texto}\n\n")
+        incluidos += 1
+
+    tokens_finales = contar_tokens(contexto)
+    return contexto, {
+        "chunks": len(documentos),
+        "bloques": incluidos,
+        "fusionados": fusionados,
+        "duplicados": duplicados,
+        "recortados": recortados,
+        "fuera_de_presupuesto": fuera_de_presupuesto,
+        "tokens_originales": tokens_originales,
+        "tokens_finales": tokens_finales,
+        "tokens_ahorrados": max(0, tokens_originales - tokens_finales)
+    }
@@ -0,0 +1,289 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+
+# ===========================================================
+#   ESPEJO LOCAL DE NOTION EN SQLITE
+# ===========================================================
+#   Guarda páginas y bases de datos (data sources) con su título, padre,
+#   URL y last_edited_time, más un índice de texto completo (FTS5) sobre
+#   los títulos. La sincronización incremental solo descarga lo editado
+#   desde el último checkpoint.
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS objetos (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    titulo TEXT NOT NULL,
+    titulo_normalizado TEXT NOT NULL,
+    url TEXT,
+    padre_tipo TEXT,
+    padre_id TEXT,
+    last_edited_time TEXT,
+    datos TEXT NOT NULL,
+    visto_en REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objetos_tipo_titulo ON objetos (tipo, titulo_normalizado);
+CREATE INDEX IF NOT EXISTS objetos_padre ON objetos (padre_id);
+CREATE TABLE IF NOT EXISTS estado (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+_ESQUEMA_FTS = "CREATE VIRTUAL TABLE IF NOT EXISTS objetos_fts USING fts5(id UNINDEXED, titulo, tokenize='unicode61 remove_diacritics 2')"
+
+
+def normalizar_titulo(titulo):
+    """Minúsculas, sin tildes y con los espacios colapsados"""
+    titulo = unicodedata.normalize("NFKD", titulo.casefold())
+    titulo = "".join(c for c in titulo if not unicodedata.combining(c))
+    return " ".join(titulo.split())
+
+
+def titulo_de(objeto):
+    """Título en texto plano de una página o base de datos de Notion"""
+    if objeto.get("object") == "page":
+        for propiedad in objeto.get("properties", {}).values():
+            if propiedad.get("type") == "title":
+                return "".join(t.get("plain_text", "") for t in propiedad.get("title", []))
+        return ""
+    return "".join(t.get("plain_text", "") for t in objeto.get("title") or [])
+
+
+class EspejoNotion:
+    """
+    Copia local (SQLite) de las páginas y bases de datos del workspace.
+
+    Las búsquedas por título se responden en local en milisegundos. La
+    copia se considera obsoleta si pasan más de `max_antiguedad` segundos
+    sin sincronizar; quien la usa decide entonces si consultar la API.
+    """
+
+    def __init__(self, ruta="./notion_mirror.db", max_antiguedad=300, intervalo_completa=6 * 3600):
+        """
+        Args:
+            ruta: Archivo SQLite
+            max_antiguedad: Segundos tras la última sincronización en los que el espejo se da por fresco
+            intervalo_completa: Segundos entre sincronizaciones completas (detectan borrados)
+        """
+        self.ruta = ruta
+        self.max_antiguedad = max_antiguedad
+        self.intervalo_completa = intervalo_completa
+        self._lock = threading.RLock()
+        self._lock_sync = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.executescript(_ESQUEMA)
+            try:
+                self._conexion.execute(_ESQUEMA_FTS)
+                self.fts = True
+            except sqlite3.OperationalError:
+                # SQLite sin FTS5: se busca con LIKE
+                self.fts = False
+
+    # -----------------------------------------------------------
+    #   Estado y checkpoints
+    # -----------------------------------------------------------
+    def _leer_estado(self, clave, defecto=None):
+        with self._lock:
+            fila = self._conexion.execute("SELECT valor FROM estado WHERE clave = ?", (clave,)).fetchone()
+        return fila["valor"] if fila else defecto
+
+    def _escribir_estado(self, clave, valor):
+        self._conexion.execute(
+            "INSERT INTO estado (clave, valor) VALUES (?, ?) ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor",
+            (clave, str(valor))
+        )
+
+    def antiguedad(self):
+        """Segundos desde la última sincronización (None si nunca se ha sincronizado)"""
+        ultima = self._leer_estado("ultima_sync")
+        return None if ultima is None else time.time() - float(ultima)
+
+    def obsoleto(self):
+        antiguedad = self.antiguedad()
+        return antiguedad is None or antiguedad > self.max_antiguedad
+
+    def necesita_completa(self):
+        ultima = self._leer_estado("ultima_sync_completa")
+        return ultima is None or time.time() - float(ultima) > self.intervalo_completa
+
+    # -----------------------------------------------------------
+    #   Escritura
+    # -----------------------------------------------------------
+    def guardar(self, objetos, visto_en=None):
+        """Inserta o actualiza objetos de Notion (páginas o data sources)"""
+        visto_en = visto_en or time.time()
+        with self._lock, self._conexion:
+            for objeto in objetos:
+                if objeto.get("in_trash") or objeto.get("archived"):
+                    self._borrar(objeto["id"])
+                    continue
+                titulo = titulo_de(objeto)
+                padre = objeto.get("parent") or {}
+                padre_tipo = padre.get("type")
+                self._conexion.execute(
+                    """INSERT INTO objetos (id, tipo, titulo, titulo_normalizado, url, padre_tipo, padre_id,
+                                            last_edited_time, datos, visto_en)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(id) DO UPDATE SET
+                           tipo = excluded.tipo, titulo = excluded.titulo,
+                           titulo_normalizado = excluded.titulo_normalizado, url = excluded.url,
+                           padre_tipo = excluded.padre_tipo, padre_id = excluded.padre_id,
+                           last_edited_time = excluded.last_edited_time, datos = excluded.datos,
+                           visto_en = excluded.visto_en""",
+                    (objeto["id"], objeto.get("object"), titulo, normalizar_titulo(titulo), objeto.get("url"),
+                     padre_tipo, padre.get(padre_tipo) if padre_tipo else None,
+                     objeto.get("last_edited_time"), json.dumps(objeto, ensure_ascii=False), visto_en)
+                )
+                if self.fts:
+                    self._conexion.execute("DELETE FROM objetos_fts WHERE id = ?", (objeto["id"],))
+                    self._conexion.execute("INSERT INTO objetos_fts (id, titulo) VALUES (?, ?)", (objeto["id"], titulo))
+
+    def _borrar(self, id_objeto):
+        self._conexion.execute("DELETE FROM objetos WHERE id = ?", (id_objeto,))
+        if self.fts:
+            self._conexion.execute("DELETE FROM objetos_fts WHERE id = ?", (id_objeto,))
+
+    def borrar(self, id_objeto):
+        with self._lock, self._conexion:
+            self._borrar(id_objeto)
+
+    def sincronizar(self, iterar_cambios, completa=None, tam_lote=100):
+        """
+        Sincroniza el espejo con Notion.
+
+        Args:
+            iterar_cambios: Función sin argumentos que devuelve los objetos
+                            ordenados por last_edited_time descendente (la
+                            búsqueda de Notion con sort)
+            completa: True = recorrerlo todo y borrar lo que ya no existe;
+                      None = completa solo si toca por intervalo_completa
+
+        Returns:
+            dict: Objetos guardados, borrados y si la sincronización fue completa
+        """
+        if completa is None:
+            completa = self.necesita_completa()
+        with self._lock_sync:
+            inicio = time.time()
+            checkpoint = None if completa else self._leer_estado("checkpoint")
+            nuevo_checkpoint = checkpoint
+            lote, guardados = [], 0
+
+            for objeto in iterar_cambios():
+                editado = objeto.get("last_edited_time") or ""
+                # Orden descendente: a partir de aquí todo es anterior al checkpoint
+                if checkpoint and editado < checkpoint:
+                    break
+                if nuevo_checkpoint is None or editado > nuevo_checkpoint:
+                    nuevo_checkpoint = editado
+                lote.append(objeto)
+                if len(lote) >= tam_lote:
+                    self.guardar(lote, inicio)
+                    guardados += len(lote)
+                    lote = []
+            if lote:
+                self.guardar(lote, inicio)
+                guardados += len(lote)
+
+            borrados = 0
+            with self._lock, self._conexion:
+                if completa:
+                    # Lo que no ha aparecido en un recorrido completo ya no existe
+                    ids = [f["id"] for f in self._conexion.execute("SELECT id FROM objetos WHERE visto_en < ?", (inicio,))]
+                    for id_objeto in ids:
+                        self._borrar(id_objeto)
+                    borrados = len(ids)
+                    self._escribir_estado("ultima_sync_completa", inicio)
+                if nuevo_checkpoint:
+                    self._escribir_estado("checkpoint", nuevo_checkpoint)
+                self._escribir_estado("ultima_sync", inicio)
+            return {"guardados": guardados, "borrados": borrados, "completa": completa}
+
+    # -----------------------------------------------------------
+    #   Consultas
+    # -----------------------------------------------------------
+    @staticmethod
+    def _a_objetos(filas):
+        return [json.loads(fila["datos"]) for fila in filas]
+
+    def contar(self, tipo=None):
+        with self._lock:
+            if tipo:
+                return self._conexion.execute("SELECT COUNT(*) FROM objetos WHERE tipo = ?", (tipo,)).fetchone()[0]
+            return self._conexion.execute("SELECT COUNT(*) FROM objetos").fetchone()[0]
+
+    def listar(self, tipo, limite=None):
+        """Todos los objetos de un tipo, los editados más recientemente primero"""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT datos FROM objetos WHERE tipo = ? ORDER BY last_edited_time DESC LIMIT ?",
+                (tipo, -1 if limite is None else limite)
+            ).fetchall()
+        return self._a_objetos(filas)
+
+    def obtener(self, id_objeto):
+        """Objeto por ID (con o sin guiones), o None"""
+        id_objeto = id_objeto.replace("-", "")
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT datos FROM objetos WHERE replace(id, '-', '') = ?", (id_objeto,)
+            ).fetchone()
+        return json.loads(fila["datos"]) if fila else None
+
+    def por_titulo(self, titulo, tipo="page"):
+        """Objetos cuyo título coincide (sin distinguir mayúsculas ni tildes)"""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT datos FROM objetos WHERE tipo = ? AND titulo_normalizado = ? ORDER BY last_edited_time DESC",
+                (tipo, normalizar_titulo(titulo))
+            ).fetchall()
+        return self._a_objetos(filas)
+
+    def buscar(self, texto, tipo="page", limite=100):
+        """
+        Búsqueda de texto completo en los títulos.
+
+        Cada palabra se busca como prefijo y todas deben aparecer; los
+        resultados se ordenan por relevancia (BM25).
+        """
+        palabras = re.findall(r"\w+", texto)
+        if not palabras:
+            return self.listar(tipo, limite)
+        with self._lock:
+            if self.fts:
+                consulta = " ".join(f'"{palabra}"*' for palabra in palabras)
+                filas = self._conexion.execute(
+                    """SELECT o.datos FROM objetos_fts f JOIN objetos o ON o.id = f.id
+                       WHERE objetos_fts MATCH ? AND o.tipo = ?
+                       ORDER BY bm25(objetos_fts), o.last_edited_time DESC LIMIT ?""",
+                    (f"titulo : ({consulta})", tipo, limite)
+                ).fetchall()
+            else:
+                condiciones = " AND ".join("titulo_normalizado LIKE ?" for _ in palabras)
+                filas = self._conexion.execute(
+                    f"SELECT datos FROM objetos WHERE tipo = ? AND {condiciones} ORDER BY last_edited_time DESC LIMIT ?",
+                    (tipo, *[f"%{normalizar_titulo(p)}%" for p in palabras], limite)
+                ).fetchall()
+        return self._a_objetos(filas)
+
+    def estadisticas(self):
+        """
+        Returns:
+            dict: Páginas, bases de datos, antigüedad y checkpoint del espejo
+        """
+        return {
+            "paginas": self.contar("page"),
+            "bases_de_datos": self.contar("data_source"),
+            "antiguedad_s": self.antiguedad(),
+            "obsoleto": self.obsoleto(),
+            "checkpoint": self._leer_estado("checkpoint"),
+            "fts5": self.fts
+        }
@@ -0,0 +1,290 @@
+import os
+import re
+import json
+import math
+import threading
+import unicodedata
+from collections import Counter
+
+# ===========================================================
+#   ÍNDICE INVERTIDO BM25
+# ===========================================================
+
+_PALABRA = re.compile(r"\w+")
+# Identificadores compuestos: IDs con guiones, rutas con puntos, atributos...
+_COMPUESTO = re.compile(r"\w[\w\-.]*\w")
+
+
+def _normalizar(texto):
+    """Minúsculas y sin tildes"""
+    texto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    """
+    Divide un texto en tokens normalizados (minúsculas y sin tildes).
+
+    Además de las palabras sueltas, conserva los identificadores compuestos
+    (p. ej. `mcpTools.py` o un ID de Notion con guiones, también sin ellos)
+    para poder encontrarlos de forma exacta.
+    """
+    texto = _normalizar(texto)
+    tokens = _PALABRA.findall(texto)
+    for compuesto in _COMPUESTO.findall(texto):
+        if "-" in compuesto or "." in compuesto:
+            tokens.append(compuesto)
+            if "-" in compuesto:
+                tokens.append(compuesto.replace("-", ""))
+    return tokens
+
+
+def es_consulta_exacta(consulta, max_tokens=4):
+    """
+    Indica si la consulta parece un identificador exacto (ID, símbolo de
+    código, nombre de propiedad...) en lugar de una pregunta en lenguaje natural.
+    """
+    palabras = consulta.split()
+    if not palabras or len(palabras) > max_tokens:
+        return False
+    for palabra in palabras:
+        if not (
+            re.search(r"\d", palabra)
+            or re.search(r"[_.\-]", palabra.strip(".-"))
+            or re.search(r"[a-z][A-Z]", palabra)
+        ):
+            return False
+    return True
+
+
+class IndiceBM25:
+    """
+    Índice invertido con puntuación BM25, sincronizado con la colección de Chroma.
+
+    Solo guarda términos y longitudes; el texto de los chunks se recupera de
+    Chroma por ID. Se persiste como JSON junto a la base de datos vectorial.
+    Cada guardado solo añade los cambios a un diario (una línea por chunk);
+    el JSON completo se reescribe cuando el diario crece demasiado.
+    """
+
+    def __init__(self, ruta, k1=1.2, b=0.75, min_compactar=1000):
+        """
+        Args:
+            ruta: Archivo JSON donde se persiste el índice
+            k1, b: Parámetros de BM25
+            min_compactar: Cambios mínimos en el diario antes de reescribir el JSON
+                           (o la mitad del índice, si es mayor)
+        """
+        self.ruta = ruta
+        self.ruta_diario = ruta + ".diario"
+        self.k1 = k1
+        self.b = b
+        self.min_compactar = min_compactar
+        self._lock = threading.RLock()
+        self._terminos = {}    # id -> {token: frecuencia}
+        self._rutas = {}       # id -> ruta del archivo de origen
+        self._longitudes = {}  # id -> número de tokens
+        self._postings = {}    # token -> {id: frecuencia}
+        self._longitud_total = 0
+        self._pendientes = []  # cambios sin escribir: ["+", id, ruta, terminos] o ["-", id]
+        self._reescribir = False
+        self._en_diario = 0    # cambios en el diario desde la última reescritura
+        self._cargar()
+
+    # -----------------------------------------------------------
+    #   Persistencia
+    # -----------------------------------------------------------
+    def _cargar(self):
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            datos = {}
+        for id_chunk, (ruta, terminos) in datos.get("documentos", {}).items():
+            self._insertar(id_chunk, terminos, ruta)
+
+        # Cambios posteriores a la última reescritura
+        try:
+            with open(self.ruta_diario, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        cambio = json.loads(linea)
+                    except json.JSONDecodeError:
+                        # Última línea a medias por una caída: el próximo guardado reescribe todo
+                        self._reescribir = True
+                        break
+                    self._quitar(cambio[1])
+                    if cambio[0] == "+":
+                        self._insertar(cambio[1], cambio[3], cambio[2])
+                    self._en_diario += 1
+        except FileNotFoundError:
+            pass
+
+    def guardar(self):
+        """Escribe en disco los cambios pendientes (en el diario o reescribiendo el índice)"""
+        with self._lock:
+            if not self._pendientes and not self._reescribir:
+                return
+            limite = max(self.min_compactar, len(self._terminos) // 2)
+            if self._reescribir or self._en_diario + len(self._pendientes) > limite:
+                self._reescribir_completo()
+            else:
+                with open(self.ruta_diario, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(cambio, ensure_ascii=False) + "\n" for cambio in self._pendientes)
+                self._en_diario += len(self._pendientes)
+            self._pendientes.clear()
+            self._reescribir = False
+
+    def _reescribir_completo(self):
+        datos = {
+            "version": 1,
+            "documentos": {
+                id_chunk: [self._rutas.get(id_chunk), terminos]
+                for id_chunk, terminos in self._terminos.items()
+            }
+        }
+        temporal = self.ruta + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
+        # Si se cae antes de borrarlo, repetir el diario sobre el JSON nuevo da el mismo estado
+        try:
+            os.remove(self.ruta_diario)
+        except FileNotFoundError:
+            pass
+        self._en_diario = 0
+
+    # -----------------------------------------------------------
+    #   Altas y bajas
+    # -----------------------------------------------------------
+    def _insertar(self, id_chunk, terminos, ruta):
+        self._terminos[id_chunk] = terminos
+        self._rutas[id_chunk] = ruta
+        self._longitudes[id_chunk] = sum(terminos.values())
+        self._longitud_total += self._longitudes[id_chunk]
+        for token, frecuencia in terminos.items():
+            self._postings.setdefault(token, {})[id_chunk] = frecuencia
+
+    def _quitar(self, id_chunk):
+        terminos = self._terminos.pop(id_chunk, None)
+        self._rutas.pop(id_chunk, None)
+        if terminos is None:
+            return
+        self._longitud_total -= self._longitudes.pop(id_chunk)
+        for token in terminos:
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(id_chunk, None)
+                if not posting:
+                    del self._postings[token]
+
+    def agregar(self, ids, textos, metadatas=None):
+        """Indexa (o reindexa) chunks"""
+        metadatas = metadatas or [{}] * len(ids)
+        with self._lock:
+            for id_chunk, texto, metadata in zip(ids, textos, metadatas):
+                self._quitar(id_chunk)
+                terminos = dict(Counter(tokenizar(texto)))
+                ruta = (metadata or {}).get("ruta")
+                self._insertar(id_chunk, terminos, ruta)
+                self._anotar(["+", id_chunk, ruta, terminos])
+
+    def eliminar(self, ids=None, rutas=()):
+        """Elimina chunks por ID y/o todos los chunks de las rutas indicadas"""
+        with self._lock:
+            rutas = set(rutas)
+            objetivo = set(ids or [])
+            if rutas:
+                objetivo.update(i for i, ruta in self._rutas.items() if ruta in rutas)
+            for id_chunk in objetivo:
+                if id_chunk in self._terminos:
+                    self._quitar(id_chunk)
+                    self._anotar(["-", id_chunk])
+
+    def limpiar(self):
+        """Vacía el índice"""
+        with self._lock:
+            self._terminos.clear()
+            self._rutas.clear()
+            self._longitudes.clear()
+            self._postings.clear()
+            self._longitud_total = 0
+            self._pendientes.clear()
+            self._reescribir = True
+
+    def _anotar(self, cambio):
+        # Si se va a reescribir todo (tras limpiar o muchos cambios) no hace falta acumularlos
+        if self._reescribir:
+            return
+        self._pendientes.append(cambio)
+        if len(self._pendientes) > max(self.min_compactar, len(self._terminos) // 2):
+            self._pendientes.clear()
+            self._reescribir = True
+
+    def ids(self):
+        """IDs de los chunks indexados"""
+        with self._lock:
+            return set(self._terminos)
+
+    def documentos(self):
+        """Copia del contenido indexado: {id: (ruta, {token: frecuencia})}"""
+        with self._lock:
+            return {id_chunk: (self._rutas.get(id_chunk), dict(terminos)) for id_chunk, terminos in self._terminos.items()}
+
+    def reemplazar(self, documentos):
+        """Sustituye todo el índice por el contenido dado (formato de documentos())"""
+        with self._lock:
+            self.limpiar()
+            for id_chunk, (ruta, terminos) in documentos.items():
+                self._insertar(id_chunk, terminos, ruta)
+
+    def __len__(self):
+        return len(self._terminos)
+
+    # -----------------------------------------------------------
+    #   Búsqueda
+    # -----------------------------------------------------------
+    def buscar(self, consulta, k=5):
+        """
+        Busca los chunks con mayor puntuación BM25.
+
+        Returns:
+            list: [(id, puntuación), ...] de mayor a menor puntuación
+        """
+        tokens = list(dict.fromkeys(tokenizar(consulta)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = len(self._terminos)
+            if not n_docs:
+                return []
+            longitud_media = self._longitud_total / n_docs
+            puntuaciones = {}
+            for token in tokens:
+                posting = self._postings.get(token)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for id_chunk, frecuencia in posting.items():
+                    norma = self.k1 * (1 - self.b + self.b * self._longitudes[id_chunk] / longitud_media)
+                    puntuaciones[id_chunk] = puntuaciones.get(id_chunk, 0.0) + idf * frecuencia * (self.k1 + 1) / (frecuencia + norma)
+
+        return sorted(puntuaciones.items(), key=lambda par: par[1], reverse=True)[:k]
+
+    def cubre_consulta(self, id_chunk, consulta):
+        """
+        Indica si el chunk contiene todas las palabras de la consulta, ya sea
+        como identificador compuesto completo o con todas sus partes.
+        """
+        with self._lock:
+            terminos = self._terminos.get(id_chunk)
+            if terminos is None:
+                return False
+            for palabra in consulta.split():
+                partes = _PALABRA.findall(_normalizar(palabra))
+                compuestos = tokenizar(palabra)[len(partes):]
+                if any(t in terminos for t in compuestos) or all(t in terminos for t in partes):
+                    continue
+                return False
+            return True
@@ -0,0 +1,239 @@
+import re
+import math
+import bisect
+import threading
+
+from espejoNotion import normalizar_titulo, titulo_de
+
+# ===========================================================
+#   ÍNDICE DE TÍTULOS DE NOTION EN MEMORIA
+# ===========================================================
+#   Se alimenta con lo que devuelven las búsquedas y la sincronización
+#   del espejo. Resuelve un título por coincidencia exacta, sin
+#   mayúsculas ni tildes, por prefijo o aproximada (trigramas), y
+#   devuelve los candidatos ordenados por puntuación.
+#
+#   Las páginas creadas por las herramientas llevan su ID al final del
+#   título ("<título> <id>"); se indexan por el título sin ese sufijo.
+
+PUNTUACION_EXACTA = 1.0
+PUNTUACION_NORMALIZADA = 0.95
+
+# ID de Notion al final de un título: 32 hexadecimales, con o sin guiones
+_SUFIJO_ID = re.compile(
+    r"\s+([0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12})\s*$", re.IGNORECASE
+)
+
+
+def separar_sufijo_id(titulo):
+    """
+    Separa el ID de Notion con el que termina un título, si lo hay.
+
+    Returns:
+        (título sin el sufijo, ID en 32 hexadecimales en minúsculas) o (título, None)
+    """
+    coincidencia = _SUFIJO_ID.search(titulo)
+    if coincidencia is None:
+        return titulo, None
+    return titulo[:coincidencia.start()], coincidencia.group(1).replace("-", "").lower()
+
+
+def _id_compacto(id_objeto):
+    return id_objeto.replace("-", "").lower()
+
+
+def _id_con_guiones(compacto):
+    return f"{compacto[:8]}-{compacto[8:12]}-{compacto[12:16]}-{compacto[16:20]}-{compacto[20:]}"
+
+
+def trigramas(texto):
+    """Trigramas de un título normalizado (con relleno para los bordes)"""
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceTitulos:
+    """
+    Índice de títulos de páginas y bases de datos de Notion.
+
+    Es seguro entre hilos. Cada objeto se indexa por su título exacto, por
+    el normalizado, en una lista ordenada para los prefijos y por
+    trigramas para la búsqueda aproximada.
+    """
+
+    def __init__(self):
+        self._objetos = {}      # id -> (objeto, titulo, normalizado, trigramas); titulo sin el sufijo de ID
+        self._exactos = {}      # titulo -> {ids}
+        self._normalizados = {} # normalizado -> {ids}
+        self._ordenados = []    # [(normalizado, id)] para los prefijos
+        self._trigramas = {}    # trigrama -> {ids}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._objetos)
+
+    # -----------------------------------------------------------
+    #   Mantenimiento
+    # -----------------------------------------------------------
+    def agregar(self, objetos):
+        """
+        Indexa o actualiza objetos de Notion; los que están en la papelera se quitan.
+
+        Returns:
+            list: Los mismos objetos, para poder encadenarlo con una búsqueda
+        """
+        objetos = list(objetos)
+        with self._lock:
+            for objeto in objetos:
+                if objeto.get("object") not in ("page", "data_source") or "id" not in objeto:
+                    continue
+                self._quitar(objeto["id"])
+                if objeto.get("in_trash") or objeto.get("archived"):
+                    continue
+                titulo = titulo_de(objeto)
+                base, id_sufijo = separar_sufijo_id(titulo)
+                if id_sufijo == _id_compacto(objeto["id"]):
+                    titulo = base
+                normalizado = normalizar_titulo(titulo)
+                grams = trigramas(normalizado)
+                self._objetos[objeto["id"]] = (objeto, titulo, normalizado, grams)
+                self._exactos.setdefault(titulo, set()).add(objeto["id"])
+                self._normalizados.setdefault(normalizado, set()).add(objeto["id"])
+                bisect.insort(self._ordenados, (normalizado, objeto["id"]))
+                for gram in grams:
+                    self._trigramas.setdefault(gram, set()).add(objeto["id"])
+        return objetos
+
+    def eliminar(self, id_objeto):
+        with self._lock:
+            self._quitar(id_objeto)
+
+    def reemplazar(self, objetos):
+        """
+        Sustituye todo el contenido del índice (tras una sincronización completa).
+
+        El índice nuevo se construye aparte y se cambia de golpe: las
+        búsquedas concurrentes ven el anterior o el nuevo, nunca uno a medias.
+        """
+        nuevo = IndiceTitulos()
+        nuevo.agregar(objetos)
+        with self._lock:
+            self._objetos = nuevo._objetos
+            self._exactos = nuevo._exactos
+            self._normalizados = nuevo._normalizados
+            self._ordenados = nuevo._ordenados
+            self._trigramas = nuevo._trigramas
+
+    def _quitar(self, id_objeto):
+        entrada = self._objetos.pop(id_objeto, None)
+        if entrada is None:
+            return
+        _, titulo, normalizado, grams = entrada
+        self._descartar(self._exactos, titulo, id_objeto)
+        self._descartar(self._normalizados, normalizado, id_objeto)
+        posicion = bisect.bisect_left(self._ordenados, (normalizado, id_objeto))
+        if posicion < len(self._ordenados) and self._ordenados[posicion] == (normalizado, id_objeto):
+            del self._ordenados[posicion]
+        for gram in grams:
+            self._descartar(self._trigramas, gram, id_objeto)
+
+    @staticmethod
+    def _descartar(indice, clave, id_objeto):
+        ids = indice.get(clave)
+        if ids is not None:
+            ids.discard(id_objeto)
+            if not ids:
+                del indice[clave]
+
+    # -----------------------------------------------------------
+    #   Búsqueda
+    # -----------------------------------------------------------
+    def _candidatos_aproximados(self, grams, dice_minimo):
+        """
+        IDs que pueden alcanzar `dice_minimo` con esos trigramas.
+
+        Para llegar al mínimo hay que compartir al menos m trigramas, así que
+        basta con mirar los len(grams) - m + 1 más raros: los trigramas
+        frecuentes ("de ", "ión"...) no se recorren.
+        """
+        minimo = max(1, math.ceil(dice_minimo * (len(grams) + 1) / 2))
+        listas = sorted((self._trigramas.get(gram, ()) for gram in grams), key=len)
+        candidatos = set()
+        for ids in listas[:max(1, len(grams) - minimo + 1)]:
+            candidatos.update(ids)
+        return candidatos
+
+    def buscar(self, titulo, tipo="page", limite=5, umbral=0.3):
+        """
+        Candidatos para un título, del más al menos probable.
+
+        Puntuaciones: 1.0 título idéntico; 0.95 igual sin mayúsculas ni
+        tildes; entre 0.6 y 0.9 si el título buscado es prefijo (más cuanto
+        más cubre); hasta 0.85 por similitud de trigramas (Dice), que solo
+        se calcula si no hay coincidencia exacta o normalizada.
+
+        El sufijo de ID de los títulos no cuenta. Si el título buscado
+        termina con el ID de un objeto indexado, se busca sin él y ese
+        objeto va el primero.
+
+        Args:
+            titulo: Título buscado
+            tipo: "page", "data_source" o None para ambos
+            limite: Número máximo de candidatos
+            umbral: Puntuación mínima de un candidato
+
+        Returns:
+            list: [{"objeto", "id", "titulo", "puntuacion", "coincidencia"}, ...]
+        """
+        puntuaciones = {}
+
+        def anotar(id_objeto, puntuacion, coincidencia):
+            if puntuacion > puntuaciones.get(id_objeto, (0, None))[0]:
+                puntuaciones[id_objeto] = (puntuacion, coincidencia)
+
+        with self._lock:
+            base, id_buscado = separar_sufijo_id(titulo)
+            if id_buscado and (id_buscado in self._objetos or _id_con_guiones(id_buscado) in self._objetos):
+                titulo = base
+            else:
+                id_buscado = None
+            normalizado = normalizar_titulo(titulo)
+
+            for id_objeto in self._exactos.get(titulo.strip(), ()):
+                anotar(id_objeto, PUNTUACION_EXACTA, "exacta")
+            for id_objeto in self._normalizados.get(normalizado, ()):
+                anotar(id_objeto, PUNTUACION_NORMALIZADA, "normalizada")
+
+            if normalizado:
+                posicion = bisect.bisect_left(self._ordenados, (normalizado, ""))
+                while posicion < len(self._ordenados) and self._ordenados[posicion][0].startswith(normalizado):
+                    candidato, id_objeto = self._ordenados[posicion]
+                    anotar(id_objeto, 0.6 + 0.3 * len(normalizado) / len(candidato), "prefijo")
+                    posicion += 1
+
+            # La búsqueda aproximada solo hace falta si no hay coincidencia directa
+            if not any(p >= PUNTUACION_NORMALIZADA for p, _ in puntuaciones.values()):
+                grams = trigramas(normalizado)
+                for id_objeto in self._candidatos_aproximados(grams, umbral / 0.85):
+                    otros = self._objetos[id_objeto][3]
+                    dice = 2 * len(grams & otros) / (len(grams) + len(otros))
+                    anotar(id_objeto, 0.85 * dice, "aproximada")
+
+            candidatos = [
+                {
+                    "objeto": self._objetos[id_objeto][0],
+                    "id": id_objeto,
+                    "titulo": self._objetos[id_objeto][1],
+                    "puntuacion": round(puntuacion, 3),
+                    "coincidencia": coincidencia
+                }
+                for id_objeto, (puntuacion, coincidencia) in puntuaciones.items()
+                if puntuacion >= umbral and (tipo is None or self._objetos[id_objeto][0].get("object") == tipo)
+            ]
+
+        # A igualdad de puntuación, el editado más recientemente primero
+        candidatos.sort(key=lambda c: c["objeto"].get("last_edited_time") or "", reverse=True)
+        candidatos.sort(key=lambda c: c["puntuacion"], reverse=True)
+        if id_buscado:
+            candidatos.sort(key=lambda c: _id_compacto(c["id"]) != id_buscado)
+        return candidatos[:limite]
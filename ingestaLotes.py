@@ -0,0 +1,342 @@
+import os
+import queue
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+import cargaArchivos as ca
+
+# ===========================================================
+#   INGESTA MASIVA EN PARALELO
+#   parseo (procesos) -> embeddings (lotes grandes) -> escritura (Chroma)
+# ===========================================================
+
+_FIN = object()
+
+
+class _ErrorLectura(Exception):
+    """Fallo leyendo un archivo grande en la etapa de embeddings (afecta solo a ese archivo)"""
+
+# Splitter por proceso trabajador (se crea una vez por configuración)
+_splitters = {}
+
+
+def hash_archivo(ruta_archivo):
+    """Calcula el hash SHA-256 del contenido del archivo"""
+    h = hashlib.sha256()
+    with open(ruta_archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _obtener_splitter(chunk_size, chunk_overlap, separadores):
+    clave = (chunk_size, chunk_overlap, tuple(separadores))
+    if clave not in _splitters:
+        _splitters[clave] = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=list(separadores)
+        )
+    return _splitters[clave]
+
+
+def procesar_archivo(ruta, hash_anterior, chunk_size, chunk_overlap, separadores, max_bytes=None):
+    """
+    Lee y divide un archivo. Se ejecuta en un proceso trabajador.
+
+    Args:
+        ruta: Ruta del archivo
+        hash_anterior: Hash registrado en el manifiesto (None si es nuevo)
+        chunk_size, chunk_overlap, separadores: Configuración del splitter
+        max_bytes: Tamaño máximo para dividirlo aquí; los mayores solo se
+                   hashean y se leen por partes en la etapa de embeddings
+
+    Returns:
+        dict con la ruta, el estado ("procesado", "grande", "sin_cambios",
+        "no_soportado" o "error"), la firma (tamaño, mtime, hash), los textos
+        de los chunks y sus metadatos extra (p. ej. la página)
+    """
+    try:
+        stat = os.stat(ruta)
+        hash_contenido = hash_archivo(ruta)
+        firma = (stat.st_size, stat.st_mtime, hash_contenido)
+        if hash_anterior == hash_contenido:
+            return {"ruta": ruta, "estado": "sin_cambios", "firma": firma}
+        if max_bytes is not None and stat.st_size > max_bytes:
+            # No se devuelven sus chunks de una vez al proceso principal
+            return {"ruta": ruta, "estado": "grande", "firma": firma}
+
+        partes = ca.leerDocumentoPorPartes(ruta, max_caracteres=chunk_size)
+        if partes is None:
+            return {"ruta": ruta, "estado": "no_soportado", "firma": firma}
+
+        splitter = _obtener_splitter(chunk_size, chunk_overlap, separadores)
+        textos, extras = [], []
+        for texto_parte, extra in partes:
+            for texto in splitter.split_text(texto_parte):
+                textos.append(texto)
+                extras.append(extra)
+        return {"ruta": ruta, "estado": "procesado", "firma": firma, "textos": textos, "extras": extras}
+    except Exception as e:
+        return {"ruta": ruta, "estado": "error", "error": str(e)}
+
+
+class PipelineIngesta:
+    """
+    Pipeline de ingesta masiva con tres etapas conectadas por colas acotadas:
+
+    1. Parseo y división de archivos en un pool de procesos
+    2. Cálculo de embeddings en lotes grandes que mezclan chunks de varios archivos
+    3. Escritura agrupada en Chroma y registro en el manifiesto
+
+    Cada etapa se bloquea cuando la cola siguiente está llena (backpressure),
+    así la memoria queda acotada aunque se ingesten miles de archivos. Los
+    archivos de más de `max_bytes_proceso` no se dividen en los procesos:
+    la etapa 2 los lee por partes y va embebiendo sus chunks por lotes.
+
+    Si una etapa falla, las anteriores dejan de trabajar y las posteriores
+    siguen vaciando su cola hasta el final, así ninguna se queda bloqueada.
+    """
+
+    def __init__(self, rag, procesos=None, tam_lote_embeddings=256, tam_lote_escritura=1000, max_cola=8,
+                 max_bytes_proceso=8 * 1024 * 1024):
+        """
+        Args:
+            rag: Instancia de RAGManager destino
+            procesos: Número de procesos de parseo (por defecto, núcleos disponibles)
+            tam_lote_embeddings: Chunks por llamada al modelo de embeddings
+            tam_lote_escritura: Chunks máximos por escritura en Chroma
+            max_cola: Capacidad de cada cola entre etapas
+            max_bytes_proceso: Tamaño a partir del cual un archivo se lee por partes
+                               en vez de devolver todos sus chunks desde el proceso
+        """
+        self.rag = rag
+        self.procesos = procesos or os.cpu_count() or 1
+        self.tam_lote_embeddings = tam_lote_embeddings
+        self.tam_lote_escritura = tam_lote_escritura
+        self.max_cola = max_cola
+        self.max_bytes_proceso = max_bytes_proceso
+
+    def ejecutar(self, rutas, progreso=None):
+        """
+        Ingiere una lista de archivos.
+
+        Args:
+            rutas: Lista de rutas de archivos
+            progreso: Callback opcional progreso(ruta, estado) al terminar cada archivo
+
+        Returns:
+            dict: Listas de archivos agregados, actualizados, omitidos y con error
+        """
+        self._resumen = {"agregados": [], "actualizados": [], "omitidos": [], "errores": []}
+        self._progreso = progreso
+        self._error = None
+        cola_archivos = queue.Queue(maxsize=self.max_cola)
+        cola_escritura = queue.Queue(maxsize=self.max_cola)
+
+        hilos = [
+            threading.Thread(target=self._etapa_parseo, args=(rutas, cola_archivos), daemon=True),
+            threading.Thread(target=self._etapa_embeddings, args=(cola_archivos, cola_escritura), daemon=True),
+            threading.Thread(target=self._etapa_escritura, args=(cola_escritura,), daemon=True),
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.rag._guardar_manifiesto()
+        if self._error is not None:
+            raise self._error
+        return self._resumen
+
+    # -----------------------------------------------------------
+    #   Etapa 1: parseo en procesos
+    # -----------------------------------------------------------
+    def _etapa_parseo(self, rutas, cola_salida):
+        config = (self.rag.chunk_size, self.rag.chunk_overlap, tuple(self.rag.separadores), self.max_bytes_proceso)
+        max_en_vuelo = self.procesos * 2
+        try:
+            with ProcessPoolExecutor(max_workers=self.procesos) as pool:
+                pendientes = set()
+                for ruta in rutas:
+                    # Si otra etapa ha fallado no se lanzan más trabajos
+                    if self._error is not None:
+                        break
+                    # Limitar trabajos en vuelo: no leer más rápido de lo que se consume
+                    while len(pendientes) >= max_en_vuelo:
+                        hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                        for futuro in hechos:
+                            cola_salida.put(futuro.result())
+                    anterior = self.rag.manifiesto.get(self.rag._clave_ruta(ruta), {})
+                    pendientes.add(pool.submit(procesar_archivo, ruta, anterior.get("hash"), *config))
+
+                while pendientes and self._error is None:
+                    hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                    for futuro in hechos:
+                        cola_salida.put(futuro.result())
+                for futuro in pendientes:
+                    futuro.cancel()
+        except Exception as e:
+            self._error = e
+        finally:
+            cola_salida.put(_FIN)
+
+    # -----------------------------------------------------------
+    #   Etapa 2: embeddings en lotes grandes
+    # -----------------------------------------------------------
+    def _etapa_embeddings(self, cola_entrada, cola_salida):
+        ids, textos, metadatas = [], [], []
+        # Archivos cuyos chunks ya están en el buffer: se finalizan tras escribirlos
+        por_finalizar = []
+
+        def vaciar(hasta):
+            lote = (ids[:hasta], textos[:hasta], metadatas[:hasta])
+            del ids[:hasta], textos[:hasta], metadatas[:hasta]
+            if lote[0]:
+                vectores = self.rag.embeddings.embed_documents(lote[1])
+                cola_salida.put(("escribir",) + lote + (vectores,))
+            # Solo se finalizan los archivos que ya no tienen chunks en el buffer
+            restantes = []
+            for mensaje, n_restantes in por_finalizar:
+                n_restantes -= hasta
+                if n_restantes <= 0:
+                    cola_salida.put(mensaje)
+                else:
+                    restantes.append((mensaje, n_restantes))
+            por_finalizar[:] = restantes
+
+        def agregar_archivo(resultado, chunks):
+            ruta = resultado["ruta"]
+            clave = self.rag._clave_ruta(ruta)
+            # Los chunks nuevos se escriben encima de los anteriores (IDs estables);
+            # los que sobran se borran al finalizar. Sin IDs registrados, limpiar por ruta
+            anterior = self.rag.manifiesto.get(clave, {})
+            if anterior.get("chunk_ids") is None:
+                cola_salida.put(("eliminar", None, [clave, ruta]))
+
+            nombre = os.path.basename(ruta)
+            extension = os.path.splitext(nombre)[1].lower()
+            ids_archivo = []
+            # Posición del primer chunk de este archivo en el buffer (negativa si ya se ha enviado parte)
+            inicio = len(ids)
+            try:
+                for texto, extra in chunks:
+                    ids_archivo.append(self.rag._id_chunk(clave, len(ids_archivo)))
+                    ids.append(ids_archivo[-1])
+                    textos.append(texto)
+                    metadatas.append({"fuente": nombre, "ruta": clave, "tipo": extension, **extra,
+                                      "chunk": len(ids_archivo) - 1})
+                    if len(ids) >= self.tam_lote_embeddings:
+                        vaciar(self.tam_lote_embeddings)
+                        inicio -= self.tam_lote_embeddings
+            except _ErrorLectura:
+                # Descartar lo que quede del archivo en el buffer y, si ya se escribió
+                # una parte, borrarla: sin entrada en el manifiesto no debe quedar nada
+                del ids[max(inicio, 0):], textos[max(inicio, 0):], metadatas[max(inicio, 0):]
+                if inicio < 0:
+                    cola_salida.put(("eliminar", None, [clave, ruta]))
+                raise
+
+            mensaje = ("finalizar", ruta, resultado["firma"], ids_archivo, anterior.get("chunk_ids"), bool(anterior))
+            por_finalizar.append((mensaje, len(ids)))
+
+        def chunks_por_partes(partes):
+            # Archivos grandes: se dividen aquí parte a parte, sin tenerlos enteros en memoria
+            try:
+                for texto_parte, extra in partes:
+                    for texto in self.rag.text_splitter.split_text(texto_parte):
+                        yield texto, extra
+            except Exception as e:
+                raise _ErrorLectura(str(e)) from e
+
+        try:
+            while True:
+                resultado = cola_entrada.get()
+                if resultado is _FIN:
+                    break
+                if self._error is not None:
+                    # Seguir vaciando la cola para no bloquear a la etapa de parseo
+                    continue
+                try:
+                    ruta = resultado["ruta"]
+                    estado = resultado["estado"]
+                    if estado == "grande":
+                        try:
+                            partes = ca.leerDocumentoPorPartes(
+                                ruta, procesos=self.rag.procesos_lectura, max_caracteres=self.rag.chunk_size
+                            )
+                        except Exception as e:
+                            raise _ErrorLectura(str(e)) from e
+                        if partes is None:
+                            estado = "no_soportado"
+                    if estado == "error":
+                        cola_salida.put(("error", ruta, resultado["error"]))
+                    elif estado == "grande":
+                        agregar_archivo(resultado, chunks_por_partes(partes))
+                    elif estado != "procesado":
+                        cola_salida.put(("omitir", ruta, resultado["firma"]))
+                    else:
+                        agregar_archivo(resultado, zip(resultado["textos"], resultado["extras"]))
+                except _ErrorLectura as e:
+                    cola_salida.put(("error", ruta, str(e)))
+                except Exception as e:
+                    self._error = e
+
+            if self._error is None:
+                vaciar(len(ids))
+        except Exception as e:
+            self._error = e
+        finally:
+            cola_salida.put(_FIN)
+
+    # -----------------------------------------------------------
+    #   Etapa 3: escritura agrupada en Chroma
+    # -----------------------------------------------------------
+    def _etapa_escritura(self, cola_entrada):
+        while True:
+            mensaje = cola_entrada.get()
+            if mensaje is _FIN:
+                break
+            if self._error is not None:
+                # Seguir vaciando la cola para no bloquear a las etapas anteriores
+                continue
+            try:
+                self._aplicar(mensaje)
+            except Exception as e:
+                self._error = e
+
+    def _aplicar(self, mensaje):
+        tipo = mensaje[0]
+        if tipo == "escribir":
+            _, ids, textos, metadatas, vectores = mensaje
+            for i in range(0, len(ids), self.tam_lote_escritura):
+                fin = i + self.tam_lote_escritura
+                self.rag._escribir_vectores(ids[i:fin], textos[i:fin], metadatas[i:fin], vectores[i:fin])
+        elif tipo == "eliminar":
+            _, ids_anteriores, rutas = mensaje
+            self.rag._eliminar_chunks(ids_anteriores, rutas)
+        elif tipo == "finalizar":
+            _, ruta, firma, ids_archivo, ids_anteriores, existia = mensaje
+            sobrantes = set(ids_anteriores or []) - set(ids_archivo)
+            if sobrantes:
+                self.rag._eliminar_chunks(sorted(sobrantes))
+            self.rag._registrar_en_manifiesto(self.rag._clave_ruta(ruta), firma, ids_archivo, guardar=False)
+            self._terminar(ruta, "actualizados" if existia else "agregados")
+        elif tipo == "omitir":
+            _, ruta, firma = mensaje
+            entrada = self.rag.manifiesto.get(self.rag._clave_ruta(ruta))
+            if entrada is not None:
+                # Mismo contenido con otro mtime: refrescar la firma
+                entrada["tamano"], entrada["mtime"] = firma[0], firma[1]
+            self._terminar(ruta, "omitidos")
+        elif tipo == "error":
+            _, ruta, error = mensaje
+            self._resumen["errores"].append(f"{os.path.basename(ruta)}: {error}")
+            if self._progreso:
+                self._progreso(ruta, "error")
+
+    def _terminar(self, ruta, categoria):
+        self._resumen[categoria].append(os.path.basename(ruta))
+        if self._progreso:
+            self._progreso(ruta, categoria)
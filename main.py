@@ -1,3 +1,5 @@
+import time
+_inicio_imports = time.perf_counter()
 import gradio as gr 
 import os
 from dotenv import load_dotenv
@@ -7,13 +9,30 @@ from langchain.agents import create_agent
 from langchain_core.messages import HumanMessage
 import mimetypes as mt
 from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 import cargaArchivos as ca
 import ragManager
 from ragManager import rag
-from mcpTools import search_notion, get_page_notion, create_page_notion, list_databases_notion, update_page_notion, get_subpages_notion
+from trabajosIngesta import GestorTrabajos
+from planificadorNotion import planificador as planificador_notion
+from mcpTools import search_notion, get_page_notion, create_page_notion, create_pages_notion, list_databases_notion, update_page_notion, get_subpages_notion, cache_stats
+
+ragManager.registrar_fase("imports de main.py", time.perf_counter() - _inicio_imports)
 
 load_dotenv()
-rag.agregar_carpeta_completa()
+# El RAG (modelo, Chroma y sincronización de documentos_rag) se prepara en
+# segundo plano: la interfaz arranca sin esperar. Después, un vigilante
+# mantiene el índice al día con los cambios de la carpeta
+rag.iniciar_en_segundo_plano(
+    sincronizar_carpeta=True,
+    vigilar_carpeta=os.getenv("RAG_VIGILAR_CARPETA", "1") != "0"
+)
+
+# Segundos que una herramienta espera a que el RAG esté listo
+TIMEOUT_RAG = 30
+
+# Los archivos subidos al RAG se ingieren en segundo plano
+trabajos_ingesta = GestorTrabajos(rag)
 
 # Variables
 temp = 0.7
@@ -26,17 +45,69 @@ fileTypes = [
     ".json", ".csv", ".xls", ".xlsx", ".pdf"
 ]
 
-def agregar_archivo_a_rag(ruta_archivo):
-    """Agrega archivos al RAG"""
-    if isinstance(ruta_archivo, str):
-        rutas = [ruta_archivo]
-    else:
-        rutas = ruta_archivo
+def estado_rag(id_trabajo=""):
+    """Devuelve el estado de preparación del RAG y de los trabajos de ingesta para la interfaz"""
+    id_trabajo = (id_trabajo or "").strip()
+    if id_trabajo:
+        trabajo = trabajos_ingesta.estado(id_trabajo)
+        if trabajo is None:
+            return f"No existe el trabajo de ingesta {id_trabajo}"
+        texto = (
+            f"Trabajo {trabajo['id']}: {trabajo['estado']}\n"
+            f"- Archivos: {trabajo['completados']}/{trabajo['total']} ({', '.join(trabajo['archivos'])})\n"
+            f"- Chunks indexados: {trabajo['chunks']}"
+        )
+        if trabajo["archivo_actual"]:
+            texto += f"\n- Procesando: {trabajo['archivo_actual']}"
+        for resultado in trabajo["resultados"]:
+            texto += f"\n{resultado}"
+        return texto
     
-    for ruta in rutas:
-        resultado = ragManager.rag.agregar_archivo(ruta)
-        print(f"RAG: {resultado}")
-    return resultado
+    texto = f"Estado del RAG: {rag.estado()}"
+    resumen = rag.resumen_ingesta
+    if resumen:
+        texto += (
+            f"\n\nÚltima sincronización de documentos_rag:\n"
+            f"- {len(resumen['agregados'])} agregados\n"
+            f"- {len(resumen['actualizados'])} actualizados\n"
+            f"- {len(resumen['omitidos'])} sin cambios\n"
+            f"- {len(resumen['eliminados'])} eliminados\n"
+            f"- {len(resumen['errores'])} errores"
+        )
+    if rag.vigilante is not None:
+        metricas = rag.vigilante.metricas()
+        texto += (
+            f"\n\nVigilancia de documentos_rag ({metricas['modo']}):\n"
+            f"- {metricas['profundidad_cola']} archivos en cola ({metricas['en_rebote']} esperando a que terminen de escribirse)\n"
+            f"- Retraso actual: {metricas['retraso_s']:.1f} s\n"
+            f"- {metricas['procesados']} cambios procesados, {len(metricas['errores'])} errores"
+        )
+        if metricas["ultimo_resultado"]:
+            texto += f"\n- Último: {metricas['ultimo_resultado']}"
+    trabajos = trabajos_ingesta.listar()
+    if trabajos:
+        texto += "\n\nTrabajos de ingesta recientes:\n" + "\n".join(f"- {t.resumen()}" for t in trabajos)
+    cache_notion = cache_stats()
+    texto += (
+        f"\n\nCache de Notion: {cache_notion['entradas']} entradas, "
+        f"{cache_notion['aciertos']} aciertos / {cache_notion['fallos']} fallos "
+        f"({cache_notion['tasa_aciertos']:.0%})"
+    )
+    api_notion = planificador_notion.metricas()
+    texto += f"\nAPI de Notion ({api_notion['peticiones_por_segundo']:g} peticiones/s):"
+    for nombre, datos in api_notion["prioridades"].items():
+        texto += (
+            f"\n- {nombre}: {datos['peticiones']} peticiones, {datos['en_cola']} en cola, "
+            f"espera media {datos['espera_media_s'] * 1000:.0f} ms (máx. {datos['espera_max_s'] * 1000:.0f} ms)"
+        )
+    texto += f"\n- {api_notion['limitadas_429']} respuestas 429, {api_notion['reintentos']} reintentos, {api_notion['fallidas']} fallidas"
+    return texto
+
+def agregar_archivo_a_rag(ruta_archivo):
+    """Envía archivos al RAG como trabajo en segundo plano y devuelve su ID"""
+    id_trabajo = trabajos_ingesta.enviar(ruta_archivo)
+    print(f"RAG: trabajo de ingesta {id_trabajo} en cola")
+    return id_trabajo
 
 # INPUTS
 inputs = [
@@ -90,10 +161,9 @@ def cargar_archivo(archivos: str) -> str:
                 contenido = ca.leerPdf(ruta)
             elif extension == ".json":
                 contenido = ca.leerJSON(ruta)
-            elif extension == ".csv":
-                contenido = ca.leerCSV(ruta)
-            elif extension == ".xlsx" or extension == ".xls":
-                contenido = ca.leerExcel(ruta)
+            elif extension in [".csv", ".xlsx", ".xls"]:
+                # Solo la cabecera y las primeras filas: el texto se recorta igualmente
+                contenido = ca.leerTablaVistaPrevia(ruta)
             elif extension in [".png", ".jpg", ".jpeg"]:
                 contenido = ca.leerImagen(ruta)
             else:
@@ -106,8 +176,7 @@ def cargar_archivo(archivos: str) -> str:
     
     return "\n\n".join(resultados)
 
-@tool
-def buscar_en_rag(consulta: str) -> str:
+def _buscar_en_rag(consulta: str) -> str:
     """
     Busca información en la base de datos de conocimiento local (RAG).
     
@@ -118,19 +187,42 @@ def buscar_en_rag(consulta: str) -> str:
         Contexto relevante encontrado
     """
     try:
-        contexto = rag.obtener_contexto(consulta, k=3)
+        contexto = rag.obtener(timeout=TIMEOUT_RAG).obtener_contexto(consulta, k=3)
         return contexto
+    except TimeoutError:
+        return f"⏳ El RAG todavía se está cargando ({rag.estado()}). Inténtalo de nuevo en unos segundos."
+    except Exception as e:
+        return f"Error buscando en RAG: {str(e)}"
+
+async def _abuscar_en_rag(consulta: str) -> str:
+    """Versión asíncrona: espera al RAG y busca sin bloquear el event loop"""
+    try:
+        manager = await rag.aobtener(timeout=TIMEOUT_RAG)
+        return await manager.aobtener_contexto(consulta, k=3, timeout=TIMEOUT_RAG)
+    except TimeoutError:
+        return f"⏳ El RAG todavía se está cargando o está saturado ({rag.estado()}). Inténtalo de nuevo en unos segundos."
     except Exception as e:
         return f"Error buscando en RAG: {str(e)}"
 
-def chatbot(entrada, boton, modelo, archivo, agregar_rag):
+buscar_en_rag = StructuredTool.from_function(
+    func=_buscar_en_rag,
+    coroutine=_abuscar_en_rag,
+    name="buscar_en_rag",
+    description=_buscar_en_rag.__doc__
+)
+
+async def chatbot(entrada, boton, modelo, archivo, agregar_rag):
     """Función principal del chatbot"""
     global historial
     
-    # Agregar archivos a RAG si se solicita
+    # Agregar archivos a RAG si se solicita (en segundo plano: la respuesta no espera)
+    aviso_rag = ""
     if archivo and agregar_rag:
-        for f in archivo:
-            agregar_archivo_a_rag(f)
+        id_trabajo = agregar_archivo_a_rag(archivo)
+        aviso_rag = (
+            f"📥 Archivos enviados al RAG en segundo plano (trabajo {id_trabajo}). "
+            "Consulta su progreso en la pestaña Estado.\n\n"
+        )
     
     # Instrucción de thinking
     think = "Muestra tu razonamiento entre [THINKING] y [/THINKING]." if boton else ""
@@ -162,6 +254,7 @@ def chatbot(entrada, boton, modelo, archivo, agregar_rag):
             get_page_notion,
             get_subpages_notion,
             create_page_notion,
+            create_pages_notion,
             list_databases_notion,
             update_page_notion,
             cargar_archivo,
@@ -183,16 +276,16 @@ def chatbot(entrada, boton, modelo, archivo, agregar_rag):
     )
     
     try:
-        response = agente.invoke({"messages": mensajes})
+        response = await agente.ainvoke({"messages": mensajes})
         respuesta = response["messages"][-1].content
     except Exception as e:
-        return f"Error: {str(e)}", str(historial)
+        return f"{aviso_rag}Error: {str(e)}", str(historial)
     
     # Actualizar historial
     historial.append({"role": "user", "content": entrada})
     historial.append({"role": "assistant", "content": respuesta})
     
-    return respuesta, str(historial)
+    return aviso_rag + respuesta, str(historial)
 
 # INTERFAZ GRADIO
 interfaz = gr.Interface(
@@ -203,7 +296,15 @@ interfaz = gr.Interface(
     description="Chatbot con herramientas MCP de Notion"
 )
 
+interfaz_estado = gr.Interface(
+    fn=estado_rag,
+    inputs=[gr.Textbox(label="ID de trabajo de ingesta (opcional)")],
+    outputs=gr.TextArea(label="Estado"),
+    title="Estado del sistema",
+    description="Consulta si el RAG ya está listo para responder y el progreso de los archivos subidos"
+)
+
 print("=" * 50)
 print("🚀 Iniciando interfaz Gradio...")
 print("=" * 50)
-interfaz.launch()
\ No newline at end of file
+gr.TabbedInterface([interfaz, interfaz_estado], ["Chat", "Estado"]).launch()
\ No newline at end of file
@@ -2,44 +2,287 @@ import os
 import json
 import subprocess
 import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from langchain.tools import tool
-from notion_client import Client
+from langchain_core.tools import StructuredTool
+from planificadorNotion import obtener_cliente, obtener_cliente_async, prioridad
+from espejoNotion import EspejoNotion
+from cacheTTL import CacheTTL
+from indiceTitulos import IndiceTitulos
+from bloquesNotion import LectorBloques, a_markdown, contar_bloques
 
 load_dotenv()
 
 # Token de Notion
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 
-# Cliente directo de Notion (para búsquedas rápidas)
+# Cliente de Notion (compartido y con control de ritmo, ver planificadorNotion.py)
 notion_client = None
 if NOTION_TOKEN:
     try:
-        notion_client = Client(auth=NOTION_TOKEN)
+        notion_client = obtener_cliente(NOTION_TOKEN)
         print("✅ Cliente de Notion inicializado")
     except Exception as e:
         print(f"⚠️ Error: {e}")
 
-# Cache para bases de datos y páginas
-_databases_cache = None
-_pages_cache = None
+# Cache de las consultas a la API (LRU, con un TTL en segundos por tipo de entrada)
+notion_cache = CacheTTL(max_entradas=int(os.getenv("NOTION_CACHE_SIZE", "512")))
+CACHE_TTL = {
+    "search": 60,       # resultados de search_notion
+    "title": 120,       # página resuelta por título
+    "page": 120,        # pages.retrieve
+    "children": 120,    # bloques hijos de una página
+    "databases": 300,   # lista de bases de datos
+}
+_MISS = object()
+
+# Tamaño de página de la API de Notion (máximo 100)
+PAGE_SIZE = 100
+
+# Espejo local en SQLite (NOTION_MIRROR=0 lo desactiva)
+NOTION_MIRROR = os.getenv("NOTION_MIRROR", "./notion_mirror.db")
+# Si el espejo está obsoleto, consultar la API en directo mientras se actualiza
+MIRROR_FALLBACK = os.getenv("NOTION_MIRROR_FALLBACK", "1") != "0"
+
+mirror = None
+if notion_client and NOTION_MIRROR != "0":
+    try:
+        mirror = EspejoNotion(NOTION_MIRROR, max_antiguedad=int(os.getenv("NOTION_MIRROR_MAX_AGE", "300")))
+    except Exception as e:
+        print(f"⚠️ Espejo de Notion no disponible: {e}")
+
+# Índice de títulos en memoria (se alimenta de búsquedas, sincronizaciones y escrituras)
+title_index = IndiceTitulos()
+if mirror is not None:
+    title_index.agregar(mirror.listar("page") + mirror.listar("data_source"))
+
+# Lectura del contenido completo de las páginas (árbol de bloques)
+block_reader = LectorBloques(
+    concurrencia=int(os.getenv("NOTION_FETCH_CONCURRENCY", "4")),
+    max_bloques=int(os.getenv("NOTION_MAX_BLOCKS", "2000"))
+)
+# Caracteres máximos del markdown que devuelve get_page_notion
+PAGE_MAX_CHARS = int(os.getenv("NOTION_PAGE_MAX_CHARS", "8000"))
+
+# Añadir el ID de la página a su título al crearla (cuesta una petición más)
+TITLE_WITH_ID = os.getenv("NOTION_TITLE_WITH_ID", "1") != "0"
+# Creaciones en curso a la vez en create_pages_notion (el ritmo lo marca el planificador)
+BULK_CONCURRENCY = 4
+# Límites de la API: caracteres por texto y bloques por petición
+MAX_TEXT_CHARS = 2000
+MAX_BLOCKS_PER_REQUEST = 100
+
+# Puntuación mínima para resolver un título sin preguntar (0.95 = igual salvo mayúsculas/tildes)
+TITLE_MIN_SCORE = float(os.getenv("NOTION_TITLE_MIN_SCORE", "0.95"))
+
+# ============================================
+# PAGINACIÓN
+# ============================================
+
+def paginate(function, page_size: int = PAGE_SIZE, max_items: int = None, **kwargs):
+    """
+    Recorre todas las páginas de resultados de un endpoint paginado de Notion.
+    
+    Es un generador perezoso: solo pide la siguiente página cuando se han
+    consumido los resultados de la anterior, así que quien lo usa puede
+    parar en cualquier momento (p. ej. al encontrar una coincidencia).
+    
+    Args:
+        function: Método del cliente (notion_client.search, notion_client.blocks.children.list...)
+        page_size: Resultados por petición (máximo 100)
+        max_items: Número máximo de resultados a devolver (None = todos)
+        **kwargs: Argumentos del endpoint
+    
+    Yields:
+        Cada resultado (dict)
+    """
+    cursor = kwargs.pop("start_cursor", None)
+    page_size = max(1, min(page_size, PAGE_SIZE))
+    returned = 0
+    
+    while True:
+        if max_items is not None:
+            # No pedir más de lo que se va a devolver
+            page_size = min(page_size, max_items - returned)
+            if page_size <= 0:
+                return
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        response = function(**kwargs, page_size=page_size)
+        
+        for result in response.get("results", []):
+            yield result
+            returned += 1
+            if max_items is not None and returned >= max_items:
+                return
+        
+        cursor = response.get("next_cursor")
+        if not response.get("has_more") or not cursor:
+            return
+
+def iter_search(query: str = None, object_type: str = None, page_size: int = PAGE_SIZE, max_items: int = None):
+    """
+    Recorre los resultados de la búsqueda de Notion.
+    
+    Args:
+        query: Texto a buscar (None = todo lo compartido con la integración)
+        object_type: "page" o "data_source" (None = ambos)
+        page_size: Resultados por petición
+        max_items: Número máximo de resultados
+    """
+    kwargs = {}
+    if query:
+        kwargs["query"] = query
+    if object_type:
+        kwargs["filter"] = {"property": "object", "value": object_type}
+    return _indexed(paginate(notion_client.search, page_size=page_size, max_items=max_items, **kwargs))
+
+def _indexed(items):
+    """Indexa los títulos de lo que va devolviendo una búsqueda"""
+    for item in items:
+        title_index.agregar([item])
+        yield item
+
+def iter_block_children(block_id: str, page_size: int = PAGE_SIZE, max_items: int = None):
+    """Recorre todos los bloques hijos de una página o bloque"""
+    return paginate(notion_client.blocks.children.list, page_size=page_size, max_items=max_items, block_id=block_id)
+
+def get_page_title(page: dict) -> str:
+    """Título de una página (texto plano de su propiedad de tipo title)"""
+    for prop_value in page.get("properties", {}).values():
+        if prop_value.get("type") == "title":
+            rich_text = prop_value.get("title", [])
+            if rich_text:
+                return "".join(t.get("plain_text", "") for t in rich_text) or "Sin título"
+            break
+    return "Sin título"
+
+# ============================================
+# CACHE
+# ============================================
+
+def cached(kind: str, key: tuple, compute):
+    """
+    Devuelve la entrada del cache o la calcula y la guarda con el TTL de su tipo.
+    
+    Los resultados vacíos (None) no se guardan: una página que aún no existe
+    puede crearse en cualquier momento.
+    """
+    value = notion_cache.obtener((kind,) + key, _MISS)
+    if value is _MISS:
+        value = compute()
+        if value is not None:
+            notion_cache.guardar((kind,) + key, value, ttl=CACHE_TTL[kind])
+    return value
+
+def invalidate_page(page_id: str, parent_id: str = None):
+    """
+    Invalida lo que una escritura en una página deja desactualizado.
+    
+    Args:
+        page_id: Página creada o modificada
+        parent_id: Su padre, si cambian sus hijos (página nueva)
+    """
+    ids = {page_id.replace("-", "")}
+    if parent_id:
+        ids.add(parent_id.replace("-", ""))
+    notion_cache.invalidar_si(
+        lambda key: key[0] in ("search", "title") or (key[0] in ("page", "children") and key[1] in ids)
+    )
+
+def cache_stats():
+    """
+    Returns:
+        dict: Entradas, aciertos, fallos y tasa de aciertos del cache de Notion
+    """
+    return notion_cache.estadisticas()
+
+# ============================================
+# ESPEJO LOCAL
+# ============================================
+
+_mirror_sync_thread = None
+
+def _iter_changes():
+    """Todo lo compartido con la integración, lo editado más recientemente primero"""
+    return _indexed(paginate(notion_client.search, sort={"direction": "descending", "timestamp": "last_edited_time"}))
+
+def sync_mirror(full: bool = None):
+    """
+    Sincroniza el espejo local con Notion.
+    
+    Args:
+        full: True = sincronización completa (detecta borrados); None = incremental
+              salvo que toque la completa periódica
+    
+    Returns:
+        dict con lo sincronizado, o None si no hay espejo
+    """
+    if mirror is None:
+        return None
+    result = mirror.sincronizar(_iter_changes, completa=full)
+    if result["completa"]:
+        # Tras un recorrido completo el espejo sabe qué se ha borrado
+        title_index.reemplazar(mirror.listar("page") + mirror.listar("data_source"))
+    return result
+
+def _sync_mirror_in_background():
+    """Lanza una sincronización del espejo si no hay otra en marcha"""
+    global _mirror_sync_thread
+    if mirror is None or (_mirror_sync_thread is not None and _mirror_sync_thread.is_alive()):
+        return
+    
+    def run():
+        try:
+            # La sincronización cede el paso a las consultas del agente
+            with prioridad("masiva"):
+                sync_mirror()
+        except Exception as e:
+            print(f"⚠️ Error sincronizando el espejo de Notion: {e}")
+    
+    _mirror_sync_thread = threading.Thread(target=run, daemon=True, name="notion-espejo")
+    _mirror_sync_thread.start()
+
+def _mirror_usable():
+    """
+    Indica si la consulta se puede responder desde el espejo.
+    
+    Si está obsoleto se actualiza en segundo plano y, con MIRROR_FALLBACK,
+    esta consulta va a la API en directo.
+    """
+    if mirror is None:
+        return False
+    if mirror.obsoleto():
+        _sync_mirror_in_background()
+        return not MIRROR_FALLBACK and mirror.antiguedad() is not None
+    return True
+
+def _record_page(page):
+    """Refleja en el índice de títulos y en el espejo una página recién creada o modificada"""
+    if page:
+        title_index.agregar([page])
+    if mirror is not None and page:
+        try:
+            mirror.guardar([page])
+        except Exception as e:
+            print(f"⚠️ Error actualizando el espejo de Notion: {e}")
+
+# Primera sincronización al arrancar
+_sync_mirror_in_background()
 
 def get_databases():
     """Obtiene y cachea las bases de datos disponibles"""
-    global _databases_cache
-    
-    if _databases_cache is not None:
-        return _databases_cache
+    if _mirror_usable():
+        return mirror.listar("data_source")
     
     if not notion_client:
         return []
     
     try:
-        response = notion_client.search(
-            filter={"property": "object", "value": "data_source"}
-        )
-        _databases_cache = response.get("results", [])
-        return _databases_cache
+        return cached("databases", (), lambda: list(iter_search(object_type="data_source")))
     except Exception as e:
         print(f"Error obteniendo bases de datos: {e}")
         return []
@@ -56,9 +299,7 @@ def get_first_parent_id():
         return None
     
     try:
-        response = notion_client.search()
-        results = response.get("results", [])
-        for item in results:
+        for item in iter_search(page_size=10):
             if item.get("id"):
                 return item["id"]
     except Exception as e:
@@ -78,52 +319,243 @@ def find_database_by_name(name: str):
             return db
     return None
 
-def find_page_by_title(title: str):
-    """Busca una página por título"""
-    if not notion_client:
-        return None
+def find_page_candidates(title: str, limit: int = 5, max_items: int = 500):
+    """
+    Páginas que pueden corresponder a un título, ordenadas por puntuación.
     
-    try:
-        response = notion_client.search(
-            query=title,
-            filter={"property": "object", "value": "page"}
-        )
+    Se resuelve con el índice de títulos; si no hay coincidencia exacta y el
+    espejo no está al día, se pregunta a la API (que alimenta el índice) y
+    se vuelve a mirar.
+    
+    Returns:
+        list: [{"objeto", "id", "titulo", "puntuacion", "coincidencia"}, ...]
+    """
+    candidates = title_index.buscar(title, tipo="page", limite=limit)
+    if candidates and candidates[0]["puntuacion"] >= TITLE_MIN_SCORE:
+        return candidates
+    
+    if notion_client and not _mirror_usable():
+        try:
+            cached("title", (title.lower(), max_items),
+                   lambda: list(iter_search(query=title, object_type="page", max_items=max_items)))
+        except Exception as e:
+            print(f"Error buscando página: {e}")
+        candidates = title_index.buscar(title, tipo="page", limite=limit)
+    
+    return candidates
+
+def find_page_by_title(title: str, min_score: float = None):
+    """
+    Busca una página por título.
+    
+    Solo devuelve la página si la mejor coincidencia llega a `min_score`
+    (TITLE_MIN_SCORE por defecto); si no, None. Las alternativas se
+    obtienen con find_page_candidates.
+    """
+    min_score = TITLE_MIN_SCORE if min_score is None else min_score
+    candidates = find_page_candidates(title)
+    if candidates and candidates[0]["puntuacion"] >= min_score:
+        return candidates[0]["objeto"]
+    return None
+
+def format_candidates(title: str) -> str:
+    """Sugerencias para un título que no se ha podido resolver"""
+    candidates = find_page_candidates(title)
+    if not candidates:
+        return ""
+    output = "\n¿Quizá quisiste decir?\n"
+    for candidate in candidates:
+        output += f"• {candidate['titulo']} (ID: {candidate['id']}, coincidencia {candidate['coincidencia']} {candidate['puntuacion']:.2f})\n"
+    return output
+
+# ============================================
+# FORMATO DE RESPUESTAS
+# ============================================
+
+def _paragraph(content: str) -> dict:
+    """Bloque de párrafo con texto plano"""
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [{"type": "text", "text": {"content": content}}]
+        }
+    }
+
+def _content_blocks(content: str) -> list:
+    """Párrafos con el contenido, partido en trozos que admite la API"""
+    return [_paragraph(content[i:i + MAX_TEXT_CHARS]) for i in range(0, len(content or ""), MAX_TEXT_CHARS)]
+
+def _title_property(title: str) -> dict:
+    return {"title": {"title": [{"text": {"content": title}}]}}
+
+def _format_search(query: str, results: list, max_results: int) -> str:
+    if not results:
+        return f"❌ No se encontraron páginas para: '{query}'"
+    
+    hay_mas = len(results) > max_results
+    results = results[:max_results]
+    output = f"📋 Resultados de búsqueda para '{query}' ({len(results)}):\n\n"
+    
+    for page in results:
+        title = get_page_title(page)
+        page_id = page["id"]
+        url = page.get("url", "")
         
-        results = response.get("results", [])
-        for page in results:
-            props = page.get("properties", {})
-            page_title = "Sin título"
-            
-            for prop_name, prop_value in props.items():
-                if prop_value.get("type") == "title":
-                    rich_text = prop_value.get("title", [])
-                    if rich_text:
-                        page_title = rich_text[0].get("plain_text", "Sin título")
-                    break
-            
-            if title.lower() == page_title.lower():
-                return page
+        output += f"• {title}\n"
+        output += f"  ID: {page_id}\n"
+        output += f"  URL: {url}\n\n"
+    
+    if hay_mas:
+        output += f"… hay más resultados; aumenta max_results o concreta la búsqueda\n"
+    
+    return output
+
+def _format_page(page: dict, page_id_clean: str, blocks: list, complete: bool = True) -> str:
+    title = get_page_title(page)
+    markdown, _ = a_markdown(blocks, PAGE_MAX_CHARS)
+    
+    content = f"📄 {title}\n"
+    content += f"ID: {page_id_clean}\n"
+    content += f"URL: {page.get('url', '')}\n"
+    content += f"Bloques: {contar_bloques(blocks)}\n"
+    if not complete:
+        content += f"⚠️ Página muy larga: solo se han leído los primeros {block_reader.max_bloques} bloques\n"
+    content += f"\n{markdown}\n"
+    
+    return content
+
+def _format_databases(databases: list) -> str:
+    if not databases:
+        return "❌ No hay bases de datos compartidas"
+    
+    output = f"📚 Bases de datos ({len(databases)}):\n\n"
+    
+    for db in databases:
+        title = "Sin título"
+        if db.get("title"):
+            title = db["title"][0].get("plain_text", "Sin título")
+        
+        db_id = db["id"]
+        url = db.get("url", "")
         
-        # Si no hay coincidencia exacta, retornar el primero
-        if results:
-            return results[0]
+        output += f"• {title}\n"
+        output += f"  ID: {db_id}\n"
+        output += f"  URL: {url}\n\n"
     
-    except Exception as e:
-        print(f"Error buscando página: {e}")
+    return output
+
+def _format_subpages(page_title: str, blocks: list) -> str:
+    subpages = [
+        (block["child_page"].get("title") or "Sin título", block["id"])
+        for block in blocks if block.get("type") == "child_page"
+    ]
+    
+    output = f"📄 Página: {page_title}\n"
+    output += f"Bloques encontrados: {len(blocks)}\n"
+    output += f"Subpáginas ({len(subpages)}):\n"
+    for subpage_title, subpage_id in subpages:
+        output += f"• {subpage_title}\n"
+        output += f"  ID: {subpage_id}\n"
+    
+    return output
+
+def _format_created(page: dict, title: str) -> str:
+    output = f"✅ Página creada\n"
+    output += f"Título: {title}\n"
+    output += f"URL: {page.get('url', '')}\n"
+    return output
+
+def _format_bulk(results: list) -> str:
+    created = sum(1 for result in results if result.startswith("✅"))
+    output = f"📦 Páginas creadas: {created}/{len(results)}\n\n"
+    for i, result in enumerate(results, 1):
+        output += f"{i}. " + result.strip().replace("\n", " | ") + "\n"
+    return output
+
+# ============================================
+# CREACIÓN DE PÁGINAS
+# ============================================
+
+def _page_spec(spec: dict) -> dict:
+    """
+    Argumentos de create_page_notion a partir de un elemento de create_pages_notion.
     
-    return None
+    Returns:
+        dict con los argumentos, o None si el elemento no tiene título
+    """
+    if not spec.get("title"):
+        return None
+    keys = ("title", "content", "parent_id", "database_name", "parent_page_title")
+    return {key: spec[key] for key in keys if spec.get(key) is not None}
+
+def _create_page(title: str, content: str, parent_id_clean: str):
+    """
+    Crea una página con su contenido en la misma petición.
+    
+    Returns:
+        (página, título final)
+    """
+    blocks = _content_blocks(content)
+    page = notion_client.pages.create(
+        parent={"page_id": parent_id_clean},
+        properties=_title_property(title),
+        children=blocks[:MAX_BLOCKS_PER_REQUEST]
+    )
+    page_id = page["id"]
+    
+    # Solo contenidos muy largos necesitan más peticiones
+    for i in range(MAX_BLOCKS_PER_REQUEST, len(blocks), MAX_BLOCKS_PER_REQUEST):
+        notion_client.blocks.children.append(block_id=page_id, children=blocks[i:i + MAX_BLOCKS_PER_REQUEST])
+    
+    # El ID no se conoce hasta crear la página: va en una segunda petición
+    if TITLE_WITH_ID:
+        title = f"{title} {page_id}"
+        page = notion_client.pages.update(page_id, properties=_title_property(title))
+    
+    _record_page(page)
+    invalidate_page(page_id, parent_id_clean)
+    return page, title
+
+def _resolve_parent(parent_id: str = None, database_name: str = None, parent_page_title: str = None):
+    """
+    Determina el padre de una página nueva.
+    
+    Returns:
+        (parent_id sin guiones, None) o (None, mensaje de error)
+    """
+    if not parent_id:
+        if parent_page_title:
+            page = find_page_by_title(parent_page_title)
+            if page:
+                parent_id = page["id"]
+            else:
+                return None, f"❌ Página padre '{parent_page_title}' no encontrada" + format_candidates(parent_page_title)
+        elif database_name:
+            db = find_database_by_name(database_name)
+            if db:
+                parent_id = db["id"]
+            else:
+                return None, f"❌ Base de datos '{database_name}' no encontrada"
+        else:
+            parent_id = get_first_parent_id()
+            if not parent_id:
+                return None, "❌ No hay bases de datos ni páginas disponibles"
+    
+    return parent_id.replace("-", ""), None
 
 # ============================================
 # HERRAMIENTAS LANGCHAIN
 # ============================================
 
 @tool
-def search_notion(query: str) -> str:
+def search_notion(query: str, max_results: int = 100) -> str:
     """
     Busca páginas en Notion por palabra clave.
     
     Args:
         query: Término de búsqueda
+        max_results: Número máximo de páginas a devolver (por defecto 100)
     
     Returns:
         Resultados formateados
@@ -132,36 +564,15 @@ def search_notion(query: str) -> str:
         return "❌ Notion no está configurado"
     
     try:
-        response = notion_client.search(
-            query=query,
-            filter={"property": "object", "value": "page"}
-        )
-        
-        results = response.get("results", [])
-        if not results:
-            return f"❌ No se encontraron páginas para: '{query}'"
-        
-        output = f"📋 Resultados de búsqueda para '{query}':\n\n"
-        
-        for page in results:
-            props = page.get("properties", {})
-            title = "Sin título"
-            
-            for prop_name, prop_value in props.items():
-                if prop_value.get("type") == "title":
-                    rich_text = prop_value.get("title", [])
-                    if rich_text:
-                        title = rich_text[0].get("plain_text", "Sin título")
-                    break
-            
-            page_id = page["id"]
-            url = page.get("url", "")
-            
-            output += f"• {title}\n"
-            output += f"  ID: {page_id}\n"
-            output += f"  URL: {url}\n\n"
-        
-        return output
+        # Se pide uno más para saber si quedan resultados sin mostrar
+        if _mirror_usable():
+            results = mirror.buscar(query, "page", limite=max_results + 1)
+        else:
+            results = cached(
+                "search", (query, max_results + 1),
+                lambda: list(iter_search(query=query, object_type="page", max_items=max_results + 1))
+            )
+        return _format_search(query, results, max_results)
     
     except Exception as e:
         return f"❌ Error: {str(e)}"
@@ -183,25 +594,11 @@ def get_page_notion(page_id: str) -> str:
     try:
         page_id_clean = page_id.replace("-", "")
         
-        page = notion_client.pages.retrieve(page_id_clean)
-        blocks = notion_client.blocks.children.list(page_id_clean)
+        page = cached("page", (page_id_clean,), lambda: notion_client.pages.retrieve(page_id_clean))
+        # El árbol se reutiliza mientras no cambie el last_edited_time de la página
+        blocks, complete = block_reader.leer(notion_client, page_id_clean, page.get("last_edited_time"))
         
-        props = page.get("properties", {})
-        title = "Sin título"
-        
-        for prop_name, prop_value in props.items():
-            if prop_value.get("type") == "title":
-                rich_text = prop_value.get("title", [])
-                if rich_text:
-                    title = rich_text[0].get("plain_text", "Sin título")
-                break
-        
-        content = f"📄 {title}\n"
-        content += f"ID: {page_id_clean}\n"
-        content += f"URL: {page.get('url', '')}\n"
-        content += f"Bloques: {len(blocks.get('results', []))}\n"
-        
-        return content
+        return _format_page(page, page_id_clean, blocks, complete)
     
     except Exception as e:
         return f"❌ Error: {str(e)}"
@@ -226,71 +623,45 @@ def create_page_notion(title: str, content: str = "", parent_id: str = None, dat
     
     try:
         # Determinar el parent_id
-        if not parent_id:
-            if parent_page_title:
-                page = find_page_by_title(parent_page_title)
-                if page:
-                    parent_id = page["id"]
-                else:
-                    return f"❌ Página padre '{parent_page_title}' no encontrada"
-            elif database_name:
-                db = find_database_by_name(database_name)
-                if db:
-                    parent_id = db["id"]
-                else:
-                    return f"❌ Base de datos '{database_name}' no encontrada"
-            else:
-                parent_id = get_first_parent_id()
-                if not parent_id:
-                    return "❌ No hay bases de datos ni páginas disponibles"
+        parent_id_clean, error = _resolve_parent(parent_id, database_name, parent_page_title)
+        if error:
+            return error
         
-        parent_id_clean = parent_id.replace("-", "")
-        
-        # Crear página
-        page = notion_client.pages.create(
-            parent={"page_id": parent_id_clean},
-            properties={
-                "title": {
-                    "title": [{"text": {"content": title}}]
-                }
-            }
-        )
-        
-        page_id = page["id"]
-        
-        # Actualizar título con ID
-        title_with_id = f"{title} {page_id}"
-        notion_client.pages.update(
-            page_id,
-            properties={
-                "title": {
-                    "title": [{"text": {"content": title_with_id}}]
-                }
-            }
-        )
-        
-        # Agregar contenido si existe
-        if content:
-            notion_client.blocks.children.append(
-                block_id=page_id,
-                children=[{
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": content}}]
-                    }
-                }]
-            )
-        
-        output = f"✅ Página creada\n"
-        output += f"Título: {title_with_id}\n"
-        output += f"URL: {page.get('url', '')}\n"
-        
-        return output
+        page, final_title = _create_page(title, content, parent_id_clean)
+        return _format_created(page, final_title)
     
     except Exception as e:
         return f"❌ Error: {str(e)}"
 
+@tool
+def create_pages_notion(pages: list[dict]) -> str:
+    """
+    Crea varias páginas en Notion de una vez.
+    
+    Args:
+        pages: Lista de páginas; cada una es un diccionario con "title" (REQUERIDO)
+               y opcionalmente "content", "parent_id", "database_name" y "parent_page_title"
+               (mismo significado que en create_page_notion)
+    
+    Returns:
+        Resultado de cada página, en el mismo orden
+    """
+    if not notion_client:
+        return "❌ Notion no está configurado"
+    if not pages:
+        return "❌ No hay páginas que crear"
+    
+    def create(spec):
+        kwargs = _page_spec(spec)
+        if kwargs is None:
+            return "❌ Falta el título de la página"
+        # Las creaciones en lote ceden el paso a las consultas interactivas
+        with prioridad("masiva"):
+            return create_page_notion.func(**kwargs)
+    
+    with ThreadPoolExecutor(max_workers=BULK_CONCURRENCY, thread_name_prefix="notion-lote") as pool:
+        return _format_bulk(list(pool.map(create, pages)))
+
 @tool
 def list_databases_notion() -> str:
     """
@@ -303,26 +674,7 @@ def list_databases_notion() -> str:
         return "❌ Notion no está configurado"
     
     try:
-        databases = get_databases()
-        
-        if not databases:
-            return "❌ No hay bases de datos compartidas"
-        
-        output = f"📚 Bases de datos ({len(databases)}):\n\n"
-        
-        for db in databases:
-            title = "Sin título"
-            if db.get("title"):
-                title = db["title"][0].get("plain_text", "Sin título")
-            
-            db_id = db["id"]
-            url = db.get("url", "")
-            
-            output += f"• {title}\n"
-            output += f"  ID: {db_id}\n"
-            output += f"  URL: {url}\n\n"
-        
-        return output
+        return _format_databases(get_databases())
     
     except Exception as e:
         return f"❌ Error: {str(e)}"
@@ -352,35 +704,15 @@ def update_page_notion(page_id: str, title: str = None, content: str = None) ->
         
         # Actualizar título si se proporciona
         if title:
-            notion_client.pages.update(
-                page_id_clean,
-                properties={
-                    "title": {
-                        "title": [{"text": {"content": title}}]
-                    }
-                }
-            )
+            page = notion_client.pages.update(page_id_clean, properties=_title_property(title))
+            _record_page(page)
+            invalidate_page(page_id_clean)
             resultado.append(f"✅ Título actualizado: {title}")
         
         # Agregar contenido si se proporciona
         if content:
-            notion_client.blocks.children.append(
-                block_id=page_id_clean,
-                children=[
-                    {
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [
-                                {
-                                    "type": "text",
-                                    "text": {"content": content}
-                                }
-                            ]
-                        }
-                    }
-                ]
-            )
+            notion_client.blocks.children.append(block_id=page_id_clean, children=[_paragraph(content)])
+            invalidate_page(page_id_clean)
             resultado.append(f"✅ Contenido agregado exitosamente")
         
         return "\n".join(resultado)
@@ -407,15 +739,280 @@ def get_subpages_notion(page_title: str) -> str:
         page = find_page_by_title(page_title)
         
         if not page:
-            return f"❌ Página '{page_title}' no encontrada"
+            return f"❌ Página '{page_title}' no encontrada" + format_candidates(page_title)
         
-        page_id = page["id"]
-        blocks = notion_client.blocks.children.list(page_id)
+        page_id = page["id"].replace("-", "")
+        blocks = cached("children", (page_id,), lambda: list(iter_block_children(page_id)))
+        
+        return _format_subpages(page_title, blocks)
+    
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+# ============================================
+# VERSIONES ASÍNCRONAS
+# ============================================
+#   Mismas herramientas sobre el AsyncClient de notion-client (un pool de
+#   conexiones compartido por event loop). Las peticiones independientes
+#   se lanzan a la vez con asyncio.gather; las búsquedas locales (índice
+#   de títulos, espejo) se hacen en un hilo para no bloquear el loop.
+
+def async_notion_client():
+    """Cliente asíncrono compartido del event loop actual"""
+    return obtener_cliente_async(NOTION_TOKEN)
+
+async def acached(kind: str, key: tuple, compute):
+    """Como cached, pero `compute` es una función que devuelve una corrutina"""
+    value = notion_cache.obtener((kind,) + key, _MISS)
+    if value is _MISS:
+        value = await compute()
+        if value is not None:
+            notion_cache.guardar((kind,) + key, value, ttl=CACHE_TTL[kind])
+    return value
+
+async def apaginate(function, page_size: int = PAGE_SIZE, max_items: int = None, **kwargs):
+    """Versión asíncrona de paginate (function es un método del AsyncClient)"""
+    cursor = kwargs.pop("start_cursor", None)
+    page_size = max(1, min(page_size, PAGE_SIZE))
+    returned = 0
+    
+    while True:
+        if max_items is not None:
+            page_size = min(page_size, max_items - returned)
+            if page_size <= 0:
+                return
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        response = await function(**kwargs, page_size=page_size)
+        
+        for result in response.get("results", []):
+            yield result
+            returned += 1
+            if max_items is not None and returned >= max_items:
+                return
+        
+        cursor = response.get("next_cursor")
+        if not response.get("has_more") or not cursor:
+            return
+
+async def alist_search(query: str = None, object_type: str = None, max_items: int = None) -> list:
+    """Resultados de la búsqueda de Notion (indexando sus títulos)"""
+    kwargs = {}
+    if query:
+        kwargs["query"] = query
+    if object_type:
+        kwargs["filter"] = {"property": "object", "value": object_type}
+    results = [item async for item in apaginate(async_notion_client().search, max_items=max_items, **kwargs)]
+    title_index.agregar(results)
+    return results
+
+async def alist_block_children(block_id: str) -> list:
+    """Todos los bloques hijos de una página o bloque"""
+    return [block async for block in apaginate(async_notion_client().blocks.children.list, block_id=block_id)]
+
+async def _asearch_notion(query: str, max_results: int = 100) -> str:
+    if not notion_client:
+        return "❌ Notion no está configurado"
+    
+    try:
+        if await asyncio.to_thread(_mirror_usable):
+            results = await asyncio.to_thread(mirror.buscar, query, "page", max_results + 1)
+        else:
+            results = await acached(
+                "search", (query, max_results + 1),
+                lambda: alist_search(query=query, object_type="page", max_items=max_results + 1)
+            )
+        return _format_search(query, results, max_results)
+    
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+async def _aget_page_notion(page_id: str) -> str:
+    if not notion_client:
+        return "❌ Notion no está configurado"
+    
+    try:
+        page_id_clean = page_id.replace("-", "")
+        client = async_notion_client()
         
-        output = f"📄 Página: {page_title}\n"
-        output += f"Bloques encontrados: {len(blocks.get('results', []))}\n\n"
+        # Metadatos y árbol a la vez. El árbol se pide con el last_edited_time de
+        # la última lectura (si no cambió, sale del cache sin peticiones) y solo
+        # se conserva si coincide con el de los metadatos; si no, se vuelve a
+        # leer reutilizando los subárboles que no han cambiado.
+        # En la primera lectura se acepta el árbol leído a la par que los
+        # metadatos: una edición justo entre ambas peticiones puede quedar
+        # cacheada hasta que caduque (ttl_cache del lector).
+        previous = block_reader.ultima_edicion(page_id_clean)
+        tree = asyncio.ensure_future(block_reader.aleer(client, page_id_clean, previous))
+        try:
+            page = await acached("page", (page_id_clean,), lambda: client.pages.retrieve(page_id_clean))
+        except BaseException:
+            tree.cancel()
+            raise
+        edited = page.get("last_edited_time")
+        blocks, complete = await tree
+        if previous is None and edited is not None:
+            block_reader.recordar(page_id_clean, edited, blocks)
+        elif previous != edited:
+            blocks, complete = await block_reader.aleer(client, page_id_clean, edited)
         
-        return output
+        return _format_page(page, page_id_clean, blocks, complete)
     
     except Exception as e:
-        return f"❌ Error: {str(e)}"
\ No newline at end of file
+        return f"❌ Error: {str(e)}"
+
+async def _acreate_page(title: str, content: str, parent_id_clean: str):
+    """Versión asíncrona de _create_page"""
+    client = async_notion_client()
+    blocks = _content_blocks(content)
+    page = await client.pages.create(
+        parent={"page_id": parent_id_clean},
+        properties=_title_property(title),
+        children=blocks[:MAX_BLOCKS_PER_REQUEST]
+    )
+    page_id = page["id"]
+    
+    async def append_rest():
+        # Los bloques se añaden al final: una petición detrás de otra para mantener el orden
+        for i in range(MAX_BLOCKS_PER_REQUEST, len(blocks), MAX_BLOCKS_PER_REQUEST):
+            await client.blocks.children.append(block_id=page_id, children=blocks[i:i + MAX_BLOCKS_PER_REQUEST])
+    
+    # El título con ID y el resto del contenido no dependen entre sí
+    if TITLE_WITH_ID:
+        title = f"{title} {page_id}"
+        page, _ = await asyncio.gather(
+            client.pages.update(page_id, properties=_title_property(title)),
+            append_rest()
+        )
+    else:
+        await append_rest()
+    
+    _record_page(page)
+    invalidate_page(page_id, parent_id_clean)
+    return page, title
+
+async def _acreate_page_notion(title: str, content: str = "", parent_id: str = None, database_name: str = None, parent_page_title: str = None) -> str:
+    if not notion_client:
+        return "❌ Notion no está configurado"
+    
+    try:
+        parent_id_clean, error = await asyncio.to_thread(_resolve_parent, parent_id, database_name, parent_page_title)
+        if error:
+            return error
+        
+        page, final_title = await _acreate_page(title, content, parent_id_clean)
+        return _format_created(page, final_title)
+    
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+async def _acreate_pages_notion(pages: list[dict]) -> str:
+    if not notion_client:
+        return "❌ Notion no está configurado"
+    if not pages:
+        return "❌ No hay páginas que crear"
+    
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+    
+    async def create(spec):
+        kwargs = _page_spec(spec)
+        if kwargs is None:
+            return "❌ Falta el título de la página"
+        async with semaphore:
+            return await _acreate_page_notion(**kwargs)
+    
+    with prioridad("masiva"):
+        results = await asyncio.gather(*(create(spec) for spec in pages))
+    return _format_bulk(results)
+
+async def _alist_databases_notion() -> str:
+    if not notion_client:
+        return "❌ Notion no está configurado"
+    
+    try:
+        if await asyncio.to_thread(_mirror_usable):
+            databases = await asyncio.to_thread(mirror.listar, "data_source")
+        else:
+            databases = await acached("databases", (), lambda: alist_search(object_type="data_source"))
+        return _format_databases(databases)
+    
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+async def _aupdate_page_notion(page_id: str, title: str = None, content: str = None) -> str:
+    if not notion_client:
+        return "❌ Notion no está configurado"
+    
+    try:
+        if not title and not content:
+            return "❌ Debes proporcionar al menos un título o contenido"
+        
+        page_id_clean = page_id.replace("-", "")
+        client = async_notion_client()
+        
+        # Título y contenido son independientes: se envían a la vez y el fallo
+        # de uno no impide informar del otro
+        updates = {}
+        if title:
+            updates["title"] = client.pages.update(page_id_clean, properties=_title_property(title))
+        if content:
+            updates["content"] = client.blocks.children.append(block_id=page_id_clean, children=[_paragraph(content)])
+        try:
+            responses = dict(zip(updates, await asyncio.gather(*updates.values(), return_exceptions=True)))
+        finally:
+            # Aunque falle una parte, la otra puede haberse aplicado
+            invalidate_page(page_id_clean)
+        
+        resultado = []
+        if title:
+            if isinstance(responses["title"], BaseException):
+                resultado.append(f"❌ Error al actualizar el título: {responses['title']}")
+            else:
+                _record_page(responses["title"])
+                resultado.append(f"✅ Título actualizado: {title}")
+        if content:
+            if isinstance(responses["content"], BaseException):
+                resultado.append(f"❌ Error al agregar el contenido: {responses['content']}")
+            else:
+                resultado.append(f"✅ Contenido agregado exitosamente")
+        
+        return "\n".join(resultado)
+    
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+async def _aget_subpages_notion(page_title: str) -> str:
+    if not notion_client:
+        return "❌ Notion no está configurado"
+    
+    try:
+        page = await asyncio.to_thread(find_page_by_title, page_title)
+        
+        if not page:
+            return f"❌ Página '{page_title}' no encontrada" + await asyncio.to_thread(format_candidates, page_title)
+        
+        page_id = page["id"].replace("-", "")
+        blocks = await acached("children", (page_id,), lambda: alist_block_children(page_id))
+        
+        return _format_subpages(page_title, blocks)
+    
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+def _with_coroutine(sync_tool, coroutine):
+    """La misma herramienta, con versión asíncrona para agente.ainvoke"""
+    return StructuredTool.from_function(
+        func=sync_tool.func,
+        coroutine=coroutine,
+        name=sync_tool.name,
+        description=sync_tool.description,
+        args_schema=sync_tool.args_schema
+    )
+
+search_notion = _with_coroutine(search_notion, _asearch_notion)
+get_page_notion = _with_coroutine(get_page_notion, _aget_page_notion)
+create_page_notion = _with_coroutine(create_page_notion, _acreate_page_notion)
+create_pages_notion = _with_coroutine(create_pages_notion, _acreate_pages_notion)
+list_databases_notion = _with_coroutine(list_databases_notion, _alist_databases_notion)
+update_page_notion = _with_coroutine(update_page_notion, _aupdate_page_notion)
+get_subpages_notion = _with_coroutine(get_subpages_notion, _aget_subpages_notion)
\ No newline at end of file
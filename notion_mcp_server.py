@@ -7,14 +7,20 @@ import os
 import sys
 import json
 from typing import Any
-from notion_client import Client
+from planificadorNotion import obtener_cliente
+from bloquesNotion import LectorBloques, a_markdown, contar_bloques
 
 # Configurar token
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
 if not NOTION_TOKEN:
     raise ValueError("NOTION_TOKEN no está configurado")
 
-notion = Client(auth=NOTION_TOKEN)
+# Cliente compartido con control de ritmo (3 peticiones/s, reintentos ante 429)
+notion = obtener_cliente(NOTION_TOKEN)
+
+# Árbol de bloques completo de las páginas, renderizado a markdown
+lector_bloques = LectorBloques()
+MAX_CARACTERES_PAGINA = int(os.getenv("NOTION_PAGE_MAX_CHARS", "8000"))
 
 class NotionMCPServer:
     """Servidor MCP simple para Notion"""
@@ -56,21 +62,16 @@ class NotionMCPServer:
             page_id_clean = page_id.replace("-", "")
             
             page = notion.pages.retrieve(page_id_clean)
-            blocks = notion.blocks.children.list(page_id_clean)
-            
-            content = []
-            for block in blocks.get("results", []):
-                block_type = block.get("type")
-                content.append({
-                    "type": block_type,
-                    "content": block.get(block_type, {})
-                })
+            blocks, completo = lector_bloques.leer(notion, page_id_clean, page.get("last_edited_time"))
+            content, omitidos = a_markdown(blocks, MAX_CARACTERES_PAGINA)
             
             return {
                 "success": True,
                 "page_id": page_id,
                 "title": page.get("properties", {}).get("title", {}).get("title", [{}])[0].get("plain_text", "Sin título"),
-                "content_blocks": content
+                "content": content,
+                "blocks": contar_bloques(blocks),
+                "truncated": omitidos > 0 or not completo
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -0,0 +1,289 @@
+import os
+import re
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# ===========================================================
+#   VECTORSTORE PARTICIONADO EN VARIAS COLECCIONES DE CHROMA
+# ===========================================================
+#   unico   -> una sola colección "documentos_rag" (comportamiento original)
+#   tipo    -> una colección por tipo de fuente (pdf, tablas, código...)
+#   carpeta -> una colección por subcarpeta de documentos_rag
+#   hash    -> N colecciones repartiendo los archivos por hash de la ruta
+
+ESTRATEGIAS = ("unico", "tipo", "carpeta", "hash")
+COLECCION_BASE = "documentos_rag"
+
+TIPOS_FUENTE = {
+    ".pdf": "pdf",
+    ".csv": "tablas", ".xlsx": "tablas", ".xls": "tablas",
+    ".json": "json",
+    ".py": "codigo", ".js": "codigo", ".html": "codigo", ".css": "codigo",
+    ".txt": "texto", ".md": "texto", ".log": "texto",
+}
+
+
+def _nombre_valido(texto):
+    """Adapta un texto a las reglas de nombres de colección de Chroma"""
+    texto = re.sub(r"[^a-zA-Z0-9_-]", "_", texto).strip("_-")
+    return texto[:60] or "raiz"
+
+
+class AlmacenParticionado:
+    """
+    Reparte los chunks en varias colecciones de Chroma (particiones).
+
+    Cada archivo vive entero en una partición, que se decide por su ruta.
+    Las búsquedas calculan el embedding de la consulta una vez, consultan
+    las particiones en paralelo y fusionan los top-k parciales por
+    distancia. Una partición se puede vaciar y reconstruir sin tocar las
+    demás: vaciarla espera a que terminen las lecturas que la están usando
+    y las nuevas esperan a que exista otra vez.
+    """
+
+    def __init__(self, carpeta_persistencia, embeddings, carpeta_documentos,
+                 estrategia="unico", num_particiones=4, max_hilos=None):
+        """
+        Args:
+            carpeta_persistencia: Carpeta de la base de datos de Chroma
+            embeddings: Modelo de embeddings (para las consultas)
+            carpeta_documentos: Carpeta de documentos (referencia de la estrategia "carpeta")
+            estrategia: Una de ESTRATEGIAS
+            num_particiones: Número de particiones de la estrategia "hash"
+            max_hilos: Hilos para consultar particiones en paralelo
+        """
+        import chromadb
+        from langchain_chroma import Chroma
+
+        if estrategia not in ESTRATEGIAS:
+            raise ValueError(f"Estrategia de particionado no soportada: {estrategia} (opciones: {', '.join(ESTRATEGIAS)})")
+
+        self._Chroma = Chroma
+        self.embeddings = embeddings
+        self.carpeta_documentos = os.path.normpath(os.path.abspath(carpeta_documentos))
+        self.estrategia = estrategia
+        self.num_particiones = num_particiones
+        self.cliente = chromadb.PersistentClient(path=carpeta_persistencia)
+        self._colecciones = {}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._en_uso = {}       # partición -> lecturas en curso
+        self._vaciando = set()
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos or min(8, (os.cpu_count() or 1) + 4),
+                                        thread_name_prefix="rag-particiones")
+
+        # Particiones ya existentes (incluida la colección única de versiones
+        # anteriores): se siguen consultando aunque cambie la estrategia
+        for coleccion in self.cliente.list_collections():
+            nombre = getattr(coleccion, "name", coleccion)
+            if nombre == COLECCION_BASE or nombre.startswith(COLECCION_BASE + "__"):
+                self.coleccion(self._particion_de_nombre(nombre))
+        if estrategia == "unico":
+            self.coleccion("unico")
+
+    # -----------------------------------------------------------
+    #   Asignación de particiones
+    # -----------------------------------------------------------
+    def particion_de(self, ruta):
+        """Partición a la que pertenece un archivo"""
+        if self.estrategia == "unico":
+            return "unico"
+        if self.estrategia == "tipo":
+            return TIPOS_FUENTE.get(os.path.splitext(ruta)[1].lower(), "otros")
+        if self.estrategia == "hash":
+            return f"hash{int(hashlib.sha1(ruta.encode('utf-8')).hexdigest(), 16) % self.num_particiones}"
+        # carpeta: primera subcarpeta dentro de documentos_rag; lo de fuera (subidas) aparte
+        relativa = os.path.relpath(os.path.dirname(ruta), self.carpeta_documentos)
+        if relativa.startswith(".."):
+            return "subidas"
+        return "raiz" if relativa == "." else _nombre_valido(relativa.split(os.sep)[0])
+
+    def particiones_para_tipos(self, extensiones):
+        """
+        Particiones existentes que pueden contener archivos con esas extensiones.
+
+        Con la estrategia "tipo" son las de esos tipos y las de estrategias
+        anteriores (que mezclan tipos); con las demás, None (todas).
+        """
+        if self.estrategia != "tipo":
+            return None
+        buscadas = {TIPOS_FUENTE.get(extension.lower(), "otros") for extension in extensiones}
+        return [
+            nombre for nombre in self.particiones()
+            if nombre in buscadas or nombre not in set(TIPOS_FUENTE.values()) | {"otros"}
+        ]
+
+    @staticmethod
+    def _nombre_coleccion(particion):
+        return COLECCION_BASE if particion == "unico" else f"{COLECCION_BASE}__{particion}"
+
+    @staticmethod
+    def _particion_de_nombre(nombre):
+        return "unico" if nombre == COLECCION_BASE else nombre[len(COLECCION_BASE) + 2:]
+
+    # -----------------------------------------------------------
+    #   Colecciones
+    # -----------------------------------------------------------
+    def coleccion(self, particion):
+        """Vectorstore de una partición (se crea si no existe)"""
+        with self._cond:
+            return self._coleccion(particion)
+
+    def _coleccion(self, particion):
+        # Con el lock tomado; si se está vaciando, espera a que termine
+        while particion in self._vaciando:
+            self._cond.wait()
+        vectorstore = self._colecciones.get(particion)
+        if vectorstore is None:
+            vectorstore = self._Chroma(
+                collection_name=self._nombre_coleccion(particion),
+                embedding_function=self.embeddings,
+                client=self.cliente
+            )
+            self._colecciones[particion] = vectorstore
+        return vectorstore
+
+    @contextmanager
+    def _usando(self, particion):
+        """Vectorstore de una partición que no se vacía mientras se usa"""
+        with self._cond:
+            vectorstore = self._coleccion(particion)
+            self._en_uso[particion] = self._en_uso.get(particion, 0) + 1
+        try:
+            yield vectorstore
+        finally:
+            with self._cond:
+                self._en_uso[particion] -= 1
+                self._cond.notify_all()
+
+    def particiones(self):
+        with self._lock:
+            return list(self._colecciones)
+
+    def _en_paralelo(self, funcion, particiones):
+        """Aplica funcion(vectorstore) a cada partición; en paralelo si hay varias"""
+        def aplicar(particion):
+            with self._usando(particion) as vectorstore:
+                return funcion(vectorstore)
+
+        particiones = [p for p in particiones if p in self._colecciones or p in self._vaciando]
+        if len(particiones) <= 1:
+            return [aplicar(p) for p in particiones]
+        futuros = [self._pool.submit(aplicar, p) for p in particiones]
+        return [futuro.result() for futuro in futuros]
+
+    def vaciar(self, particion):
+        """
+        Borra por completo una partición (las demás no se tocan).
+
+        Espera a que terminen las lecturas en curso sobre ella; las que
+        llegan mientras tanto esperan a la partición vacía.
+        """
+        with self._cond:
+            while particion in self._vaciando:
+                self._cond.wait()
+            self._vaciando.add(particion)
+            while self._en_uso.get(particion):
+                self._cond.wait()
+            self._colecciones.pop(particion, None)
+        try:
+            self.cliente.delete_collection(self._nombre_coleccion(particion))
+        except Exception:
+            pass
+        finally:
+            with self._cond:
+                self._vaciando.discard(particion)
+                self._cond.notify_all()
+        self.coleccion(particion)
+
+    # -----------------------------------------------------------
+    #   Escritura
+    # -----------------------------------------------------------
+    def escribir(self, ids, textos, metadatas, vectores):
+        """Upsert de chunks, agrupados por la partición de su archivo"""
+        grupos = {}
+        for i, metadata in enumerate(metadatas):
+            grupos.setdefault(self.particion_de(metadata.get("ruta") or ""), []).append(i)
+        for particion, indices in grupos.items():
+            self.coleccion(particion)._collection.upsert(
+                ids=[ids[i] for i in indices],
+                embeddings=[vectores[i] for i in indices],
+                documents=[textos[i] for i in indices],
+                metadatas=[metadatas[i] for i in indices]
+            )
+
+    def eliminar(self, ids=None, rutas=()):
+        """Elimina chunks por ID y/o por ruta en todas las particiones"""
+        def eliminar_en(vectorstore):
+            if ids:
+                vectorstore._collection.delete(ids=ids)
+            if rutas:
+                vectorstore._collection.delete(where={"ruta": {"$in": list(rutas)}})
+        self._en_paralelo(eliminar_en, self.particiones())
+
+    # -----------------------------------------------------------
+    #   Lectura
+    # -----------------------------------------------------------
+    def contar(self):
+        """Número total de chunks"""
+        return sum(self._en_paralelo(lambda vs: vs._collection.count(), self.particiones()))
+
+    def estadisticas(self):
+        """Chunks por partición"""
+        particiones = self.particiones()
+        return dict(zip(particiones, self._en_paralelo(lambda vs: vs._collection.count(), particiones)))
+
+    def metrica(self):
+        """Métrica de distancia de las colecciones (todas se crean igual)"""
+        particiones = self.particiones()
+        if not particiones:
+            return "l2"
+        return (self.coleccion(particiones[0])._collection.metadata or {}).get("hnsw:space", "l2")
+
+    def recorrer(self, include, tam_pagina=1000):
+        """Recorre todas las particiones por páginas; produce los dicts de `get`"""
+        for particion in self.particiones():
+            with self._usando(particion) as vectorstore:
+                coleccion = vectorstore._collection
+                total = coleccion.count()
+                for inicio in range(0, total, tam_pagina):
+                    yield coleccion.get(include=include, limit=tam_pagina, offset=inicio)
+
+    def obtener(self, ids):
+        """Recupera chunks por ID de cualquier partición"""
+        ids = list(ids)
+        resultado = {"ids": [], "documents": [], "metadatas": []}
+        for datos in self._en_paralelo(
+            lambda vs: vs._collection.get(ids=ids, include=["documents", "metadatas"]), self.particiones()
+        ):
+            for clave in resultado:
+                resultado[clave].extend(datos[clave])
+        return resultado
+
+    def buscar(self, consulta, k=5, particiones=None, tipos=None):
+        """
+        Busca en las particiones indicadas (todas por defecto) en paralelo.
+
+        Args:
+            tipos: Extensiones a las que limitar los resultados; si no se indican
+                   particiones, solo se consultan las que pueden contenerlas
+
+        Returns:
+            list: [(Document, distancia), ...] fusionando los top-k parciales
+        """
+        filtro = None
+        if tipos:
+            tipos = sorted({"." + tipo.lower().lstrip(".") for tipo in tipos})
+            filtro = {"tipo": {"$in": tipos}}
+            if particiones is None:
+                particiones = self.particiones_para_tipos(tipos)
+        vector = self.embeddings.embed_query(consulta)
+        particiones = self.particiones() if particiones is None else particiones
+        parciales = self._en_paralelo(
+            lambda vs: vs.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=filtro), particiones
+        )
+        fusionados = [par for parcial in parciales for par in parcial]
+        fusionados.sort(key=lambda par: par[1])
+        return fusionados[:k]
@@ -0,0 +1,398 @@
+import os
+import time
+import asyncio
+import weakref
+import heapq
+import random
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import httpx
+from notion_client import AsyncClient, Client
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+# ===========================================================
+#   PLANIFICADOR DE PETICIONES A LA API DE NOTION
+# ===========================================================
+#   Notion admite unas 3 peticiones por segundo por integración. Todas
+#   las llamadas pasan por un token bucket compartido; las interactivas
+#   (herramientas del agente) adelantan en la cola a las masivas
+#   (sincronización del espejo, creación en lote). Los 429 respetan
+#   Retry-After y los errores transitorios se reintentan con backoff.
+
+PRIORIDADES = {"interactiva": 0, "masiva": 1}
+
+# Errores que merece la pena reintentar
+ESTADOS_TRANSITORIOS = {409, 429, 500, 502, 503, 504}
+
+_prioridad_actual = contextvars.ContextVar("prioridad_notion", default="interactiva")
+
+
+@contextmanager
+def prioridad(nombre):
+    """
+    Prioridad de las peticiones a Notion hechas dentro del bloque.
+
+    Ejemplo:
+        with prioridad("masiva"):
+            sincronizar_espejo()
+    """
+    if nombre not in PRIORIDADES:
+        raise ValueError(f"Prioridad no soportada: {nombre} (opciones: {', '.join(PRIORIDADES)})")
+    token = _prioridad_actual.set(nombre)
+    try:
+        yield
+    finally:
+        _prioridad_actual.reset(token)
+
+
+class PlanificadorNotion:
+    """
+    Token bucket con cola de prioridades y reintentos para la API de Notion.
+
+    Es seguro entre hilos. Cada petición espera su turno en orden de
+    prioridad y, dentro de la misma prioridad, de llegada. Las esperas
+    síncronas usan una Condition; las asíncronas, un future de su event
+    loop que se despierta cuando la cola cambia, sin ocupar ningún hilo.
+    """
+
+    def __init__(self, peticiones_por_segundo=3.0, rafaga=3, max_reintentos=5,
+                 espera_base=0.5, espera_maxima=30.0):
+        """
+        Args:
+            peticiones_por_segundo: Ritmo sostenido de peticiones
+            rafaga: Peticiones que pueden salir seguidas tras un rato sin actividad
+            max_reintentos: Reintentos de una petición con error transitorio
+            espera_base: Segundos del primer backoff (se duplica en cada reintento)
+            espera_maxima: Tope del backoff en segundos
+        """
+        self.tasa = peticiones_por_segundo
+        self.rafaga = rafaga
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._fichas = float(rafaga)
+        self._ultima_recarga = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._cola = []  # heap de (prioridad, orden)
+        self._orden = itertools.count()
+        self._cond = threading.Condition()
+        self._esperas_async = {}  # entrada -> (loop, future) de las corrutinas en espera
+        self._metricas = {
+            nombre: {"peticiones": 0, "espera_total_s": 0.0, "espera_max_s": 0.0}
+            for nombre in PRIORIDADES
+        }
+        self.reintentos = 0
+        self.limitadas = 0
+        self.fallidas = 0
+
+    # -----------------------------------------------------------
+    #   Turnos
+    # -----------------------------------------------------------
+    def _recargar(self, ahora):
+        self._fichas = min(self.rafaga, self._fichas + (ahora - self._ultima_recarga) * self.tasa)
+        self._ultima_recarga = ahora
+
+    def _intentar(self, entrada):
+        """
+        Con el lock tomado: si le toca a `entrada` y hay ficha, la consume.
+
+        Returns:
+            0 si ya puede salir; si no, segundos a esperar (None: hasta que cambie la cola)
+        """
+        if self._cola[0] != entrada:
+            return None
+        ahora = time.monotonic()
+        self._recargar(ahora)
+        espera = max(self._pausa_hasta - ahora, (1 - self._fichas) / self.tasa)
+        if espera > 0:
+            return espera
+        self._fichas -= 1
+        heapq.heappop(self._cola)
+        self._notificar()
+        return 0
+
+    def _notificar(self):
+        """Con el lock tomado: despierta a quien esté esperando en cabeza de la cola"""
+        self._cond.notify_all()
+        espera_async = self._esperas_async.get(self._cola[0]) if self._cola else None
+        if espera_async is not None:
+            loop, futuro = espera_async
+            try:
+                loop.call_soon_threadsafe(lambda: futuro.done() or futuro.set_result(None))
+            except RuntimeError:
+                # Su event loop ya está cerrado
+                pass
+
+    def _registrar_espera(self, nombre_prioridad, inicio):
+        esperado = time.monotonic() - inicio
+        metricas = self._metricas[nombre_prioridad]
+        metricas["peticiones"] += 1
+        metricas["espera_total_s"] += esperado
+        metricas["espera_max_s"] = max(metricas["espera_max_s"], esperado)
+        return esperado
+
+    def turno(self, nombre_prioridad=None):
+        """
+        Bloquea hasta que la petición puede salir.
+
+        Returns:
+            float: Segundos esperados en la cola
+        """
+        nombre_prioridad = nombre_prioridad or _prioridad_actual.get()
+        inicio = time.monotonic()
+        with self._cond:
+            entrada = (PRIORIDADES[nombre_prioridad], next(self._orden))
+            heapq.heappush(self._cola, entrada)
+            while True:
+                espera = self._intentar(entrada)
+                if espera == 0:
+                    return self._registrar_espera(nombre_prioridad, inicio)
+                self._cond.wait(espera)
+
+    async def aturno(self, nombre_prioridad=None):
+        """
+        Versión asíncrona de turno: espera sin bloquear el event loop.
+
+        Si la corrutina se cancela mientras espera, su puesto sale de la cola
+        y no consume ficha.
+        """
+        nombre_prioridad = nombre_prioridad or _prioridad_actual.get()
+        loop = asyncio.get_running_loop()
+        inicio = time.monotonic()
+        with self._cond:
+            entrada = (PRIORIDADES[nombre_prioridad], next(self._orden))
+            heapq.heappush(self._cola, entrada)
+        try:
+            while True:
+                with self._cond:
+                    espera = self._intentar(entrada)
+                    if espera == 0:
+                        return self._registrar_espera(nombre_prioridad, inicio)
+                    futuro = loop.create_future()
+                    self._esperas_async[entrada] = (loop, futuro)
+                try:
+                    await asyncio.wait_for(futuro, espera)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._cond:
+                        self._esperas_async.pop(entrada, None)
+        except BaseException:
+            with self._cond:
+                if entrada in self._cola:
+                    self._cola.remove(entrada)
+                    heapq.heapify(self._cola)
+                    self._notificar()
+            raise
+
+    def pausar(self, segundos):
+        """Detiene todas las peticiones durante `segundos` (Retry-After de un 429)"""
+        with self._cond:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+            self._fichas = min(self._fichas, 0.0)
+            self._notificar()
+
+    # -----------------------------------------------------------
+    #   Ejecución con reintentos
+    # -----------------------------------------------------------
+    def _espera_reintento(self, error, intento):
+        """Segundos hasta el siguiente intento: Retry-After si lo hay, si no backoff con jitter"""
+        if isinstance(error, HTTPResponseError) and error.status == 429:
+            try:
+                return float(error.headers.get("retry-after")) + random.uniform(0, self.espera_base)
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** intento))
+
+    @staticmethod
+    def es_transitorio(error, idempotente=True):
+        """
+        Indica si un error merece reintento.
+
+        Las peticiones que modifican datos solo se repiten si Notion no llegó
+        a procesarlas (429 o fallo de conexión); un timeout o un 5xx podría
+        haberlas aplicado ya.
+        """
+        if isinstance(error, HTTPResponseError):
+            if error.status == 429:
+                return True
+            return idempotente and error.status in ESTADOS_TRANSITORIOS
+        if isinstance(error, httpx.ConnectError):
+            return True
+        return idempotente and isinstance(error, (RequestTimeoutError, httpx.TransportError))
+
+    def ejecutar(self, funcion, *args, idempotente=True, nombre_prioridad=None, **kwargs):
+        """
+        Ejecuta una llamada a la API respetando el ritmo y reintentando errores transitorios.
+
+        Args:
+            funcion: Llamada a ejecutar
+            idempotente: Si es seguro repetirla tras un timeout o un 5xx
+            nombre_prioridad: "interactiva" o "masiva" (por defecto la del contexto)
+
+        Returns:
+            Lo que devuelva `funcion`
+        """
+        intento = 0
+        while True:
+            self.turno(nombre_prioridad)
+            try:
+                return funcion(*args, **kwargs)
+            except Exception as e:
+                if not self.es_transitorio(e, idempotente) or intento >= self.max_reintentos:
+                    with self._cond:
+                        self.fallidas += 1
+                    raise
+                espera = self._espera_reintento(e, intento)
+                with self._cond:
+                    self.reintentos += 1
+                    if isinstance(e, HTTPResponseError) and e.status == 429:
+                        self.limitadas += 1
+                if isinstance(e, HTTPResponseError) and e.status == 429:
+                    self.pausar(espera)
+                else:
+                    time.sleep(espera)
+                intento += 1
+
+    async def aejecutar(self, funcion, *args, idempotente=True, nombre_prioridad=None, **kwargs):
+        """
+        Versión asíncrona de ejecutar: `funcion` es una corrutina.
+
+        Comparte cola y ritmo con las peticiones síncronas.
+        """
+        nombre_prioridad = nombre_prioridad or _prioridad_actual.get()
+        intento = 0
+        while True:
+            await self.aturno(nombre_prioridad)
+            try:
+                return await funcion(*args, **kwargs)
+            except Exception as e:
+                if not self.es_transitorio(e, idempotente) or intento >= self.max_reintentos:
+                    with self._cond:
+                        self.fallidas += 1
+                    raise
+                espera = self._espera_reintento(e, intento)
+                with self._cond:
+                    self.reintentos += 1
+                    if isinstance(e, HTTPResponseError) and e.status == 429:
+                        self.limitadas += 1
+                if isinstance(e, HTTPResponseError) and e.status == 429:
+                    self.pausar(espera)
+                else:
+                    await asyncio.sleep(espera)
+                intento += 1
+
+    def metricas(self):
+        """
+        Returns:
+            dict: Peticiones y espera en cola por prioridad, cola actual, reintentos, 429 y fallos
+        """
+        with self._cond:
+            por_prioridad = {}
+            for nombre, datos in self._metricas.items():
+                peticiones = datos["peticiones"]
+                por_prioridad[nombre] = {
+                    "peticiones": peticiones,
+                    "espera_media_s": datos["espera_total_s"] / peticiones if peticiones else 0.0,
+                    "espera_max_s": datos["espera_max_s"],
+                    "en_cola": sum(1 for nivel, _ in self._cola if nivel == PRIORIDADES[nombre])
+                }
+            return {
+                "peticiones_por_segundo": self.tasa,
+                "prioridades": por_prioridad,
+                "en_cola": len(self._cola),
+                "pausado_s": max(0.0, self._pausa_hasta - time.monotonic()),
+                "reintentos": self.reintentos,
+                "limitadas_429": self.limitadas,
+                "fallidas": self.fallidas
+            }
+
+
+def _es_lectura(path, method):
+    """Peticiones que no modifican nada (search y query van por POST)"""
+    return method.upper() == "GET" or path == "search" or path.endswith("/query")
+
+
+class ClienteNotion(Client):
+    """
+    Cliente de notion-client cuyas peticiones pasan por un PlanificadorNotion.
+
+    Se usa igual que `Client`: notion.pages.retrieve(...), notion.search(...)
+    """
+
+    def __init__(self, planificador, **kwargs):
+        super().__init__(**kwargs)
+        self.planificador = planificador
+
+    def request(self, path, method, query=None, body=None, form_data=None, auth=None):
+        return self.planificador.ejecutar(
+            super().request, path, method, query=query, body=body, form_data=form_data, auth=auth,
+            idempotente=_es_lectura(path, method)
+        )
+
+
+class ClienteNotionAsync(AsyncClient):
+    """Igual que ClienteNotion, sobre el AsyncClient de notion-client"""
+
+    def __init__(self, planificador, **kwargs):
+        super().__init__(**kwargs)
+        self.planificador = planificador
+
+    async def request(self, path, method, query=None, body=None, form_data=None, auth=None):
+        return await self.planificador.aejecutar(
+            super().request, path, method, query=query, body=body, form_data=form_data, auth=auth,
+            idempotente=_es_lectura(path, method)
+        )
+
+
+# ===========================================================
+#   INSTANCIAS COMPARTIDAS
+# ===========================================================
+#   Un planificador por proceso: las herramientas de mcpTools y el
+#   servidor MCP comparten ritmo y cola si se ejecutan juntos.
+
+planificador = PlanificadorNotion(
+    peticiones_por_segundo=float(os.getenv("NOTION_RPS", "3")),
+    max_reintentos=int(os.getenv("NOTION_MAX_RETRIES", "5"))
+)
+
+# Conexiones HTTP abiertas por el cliente asíncrono (se reutilizan entre peticiones)
+MAX_CONEXIONES = int(os.getenv("NOTION_MAX_CONNECTIONS", "10"))
+
+_clientes = {}
+_clientes_async = weakref.WeakKeyDictionary()  # event loop -> {token: cliente}
+_lock_clientes = threading.Lock()
+
+
+def obtener_cliente(token):
+    """Cliente de Notion planificado para un token (uno por token y proceso)"""
+    with _lock_clientes:
+        cliente = _clientes.get(token)
+        if cliente is None:
+            cliente = ClienteNotion(planificador, auth=token)
+            _clientes[token] = cliente
+        return cliente
+
+
+def obtener_cliente_async(token):
+    """
+    Cliente asíncrono planificado para un token.
+
+    Hay uno por token y event loop (las conexiones de httpx no se pueden
+    compartir entre loops); todas las herramientas asíncronas lo comparten,
+    así que reutilizan el mismo pool de conexiones.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock_clientes:
+        clientes = _clientes_async.setdefault(loop, {})
+        cliente = clientes.get(token)
+        if cliente is None:
+            sesion = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=MAX_CONEXIONES, max_keepalive_connections=MAX_CONEXIONES)
+            )
+            cliente = ClienteNotionAsync(planificador, client=sesion, auth=token)
+            clientes[token] = cliente
+        return cliente
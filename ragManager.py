@@ -1,23 +1,99 @@
 import os
-from langchain_chroma import Chroma
+import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import functools
+import threading
+import unicodedata
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document 
-from langchain_huggingface import HuggingFaceEmbeddings
-import chromadb
-from chromadb.config import Settings
+import numpy as np
 import cargaArchivos as ca
+from ingestaLotes import PipelineIngesta, hash_archivo
+from cacheEmbeddings import EmbeddingsCacheados
+from backendsEmbeddings import crear_embeddings, EmbeddingsLoteDinamico
+from cacheTTL import CacheTTL
+from indiceLexico import IndiceBM25, es_consulta_exacta
+from contextoRag import ensamblar_contexto
+from vigilanteCarpeta import VigilanteCarpeta
+from particionesChroma import AlmacenParticionado
+
+# ===========================================================
+#   PERFIL DE ARRANQUE (RAG_PERFIL_ARRANQUE=1)
+# ===========================================================
+PERFIL_ARRANQUE = os.getenv("RAG_PERFIL_ARRANQUE", "").lower() in ("1", "true", "si", "sí")
+_fases_arranque = []
+
+
+@contextmanager
+def medir_fase(nombre):
+    """Mide la duración de una fase del arranque si el modo perfil está activo"""
+    if not PERFIL_ARRANQUE:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_fase(nombre, time.perf_counter() - inicio)
+
+
+def registrar_fase(nombre, segundos):
+    """Registra una fase de arranque medida externamente"""
+    if PERFIL_ARRANQUE:
+        _fases_arranque.append((nombre, segundos))
+
+
+def informe_arranque():
+    """
+    Resume en qué se ha ido el tiempo de arranque.
+    
+    Para el detalle por módulo importado, ejecutar con `python -X importtime`.
+    
+    Returns:
+        str: Tabla con la duración de cada fase
+    """
+    if not _fases_arranque:
+        return "Perfil de arranque desactivado (RAG_PERFIL_ARRANQUE=1 para activarlo)"
+    total = sum(segundos for _, segundos in _fases_arranque)
+    lineas = ["⏱️ Perfil de arranque:"]
+    for nombre, segundos in _fases_arranque:
+        lineas.append(f"  {nombre:<40} {segundos:8.3f} s  ({segundos / total:5.1%})")
+    lineas.append(f"  {'TOTAL':<40} {total:8.3f} s")
+    return "\n".join(lineas)
 
 # ===========================================================
 #   AQUI SE ENCUENTRA LA RUTA DE LA CARPETA
 # ===========================================================
 class RAGManager:
-    def __init__(self, carpeta_persistencia="./rag_db", carpeta_documentos="./documentos_rag"):
+    EXTENSIONES_SOPORTADAS = ca.EXTENSIONES_RAG
+    
+    def __init__(self, carpeta_persistencia="./rag_db", carpeta_documentos="./documentos_rag",
+                 max_resultados_cache=1024, ttl_resultados_cache=600,
+                 backend_embeddings=None, hilos_embeddings=None, presupuesto_tokens_contexto=1500,
+                 particionado=None, num_particiones=None, hilos_async=4, timeout_async=30):
         """
         Inicializa el RAG Manager.
         
         Args:
             carpeta_persistencia: Donde se guarda la base de datos vectorial
             carpeta_documentos: Carpeta local con los documentos fuente
+            max_resultados_cache: Entradas máximas del cache de resultados de búsqueda
+            ttl_resultados_cache: Segundos de vida de cada resultado cacheado
+            backend_embeddings: "torch", "torch-int8", "onnx" u "onnx-int8"
+                                (por defecto, RAG_BACKEND_EMBEDDINGS o "torch")
+            hilos_embeddings: Hilos de CPU para el modelo (por defecto, RAG_HILOS_EMBEDDINGS)
+            presupuesto_tokens_contexto: Tokens máximos del contexto de obtener_contexto
+            particionado: "unico", "tipo", "carpeta" o "hash" (por defecto,
+                          RAG_PARTICIONADO o "unico": una sola colección)
+            num_particiones: Particiones de la estrategia "hash" (por defecto, RAG_NUM_PARTICIONES o 4)
+            hilos_async: Hilos del ejecutor de la API asíncrona (abuscar, aobtener_contexto...)
+            timeout_async: Segundos máximos por defecto de cada llamada asíncrona
         """
         self.carpeta_documentos = carpeta_documentos
         self.carpeta_persistencia = carpeta_persistencia
@@ -26,140 +102,905 @@ class RAGManager:
         os.makedirs(carpeta_documentos, exist_ok=True)
         os.makedirs(carpeta_persistencia, exist_ok=True)
         
+        # Dependencias pesadas: se importan al construir, no al importar el módulo
+        with medir_fase("import langchain_huggingface"):
+            import langchain_huggingface
+        with medir_fase("import langchain_chroma"):
+            import langchain_chroma
+        
         # Embeddings (modelo gratuito de HuggingFace)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-            model_kwargs={'device': 'cpu'}
-        )
+        self.nombre_modelo = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+        backend_embeddings = backend_embeddings or os.getenv("RAG_BACKEND_EMBEDDINGS", "torch")
+        hilos_embeddings = hilos_embeddings or int(os.getenv("RAG_HILOS_EMBEDDINGS", "0")) or None
+        with medir_fase("carga del modelo de embeddings"):
+            # El backend real puede ser otro si faltan dependencias (ONNX -> torch)
+            embeddings_base, self.backend_embeddings = crear_embeddings(
+                self.nombre_modelo, backend_embeddings, hilos=hilos_embeddings
+            )
         
-        # Base de datos vectorial Chroma
-        self.vectorstore = Chroma(
-            collection_name="documentos_rag",
-            embedding_function=self.embeddings,
-            persist_directory=carpeta_persistencia
-        )
+        # Las consultas concurrentes se codifican en un mismo lote
+        embeddings_base = EmbeddingsLoteDinamico(embeddings_base)
+        
+        # Cache persistente: un chunk con el mismo texto no se vuelve a calcular.
+        # Cada backend tiene su propio cache (los vectores difieren ligeramente)
+        with medir_fase("apertura del cache de embeddings"):
+            self.embeddings = EmbeddingsCacheados(
+                embeddings_base,
+                nombre_modelo=f"{self.nombre_modelo}@{self.backend_embeddings}",
+                carpeta=os.path.join(carpeta_persistencia, "cache_embeddings")
+            )
+        
+        # Base de datos vectorial Chroma, repartida en una o varias colecciones
+        with medir_fase("apertura de Chroma"):
+            self.almacen = AlmacenParticionado(
+                carpeta_persistencia,
+                self.embeddings,
+                carpeta_documentos,
+                estrategia=particionado or os.getenv("RAG_PARTICIONADO", "unico"),
+                num_particiones=num_particiones or int(os.getenv("RAG_NUM_PARTICIONES", "4"))
+            )
         
         # Splitter para dividir documentos grandes
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
+        self.separadores = ["\n\n", "\n", ". ", " ", ""]
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " ", ""]
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            separators=self.separadores
         )
+        
+        # Procesos para leer en paralelo páginas de PDFs grandes y hojas de Excel
+        self.procesos_lectura = os.cpu_count()
+        
+        # Manifiesto de ingesta: ruta -> tamaño, mtime, hash y chunks indexados
+        self.ruta_manifiesto = os.path.join(carpeta_persistencia, "manifiesto_ingesta.json")
+        self.manifiesto = self._cargar_manifiesto()
+        
+        # Índice léxico BM25 sincronizado con la colección
+        with medir_fase("carga del índice léxico"):
+            self.indice_lexico = IndiceBM25(os.path.join(carpeta_persistencia, "indice_lexico.json"))
+            self._sincronizar_indice_lexico()
+        
+        # Cache de resultados de búsqueda; la generación aumenta con cada
+        # escritura o borrado en la colección y deja obsoletas las entradas
+        self.generacion = 0
+        self._lock_generacion = threading.Lock()
+        self._cache_resultados = CacheTTL(max_entradas=max_resultados_cache, ttl=ttl_resultados_cache)
+        
+        # Contexto para el LLM: presupuesto y tokens ahorrados al deduplicar
+        self.presupuesto_tokens_contexto = presupuesto_tokens_contexto
+        self.ultimas_estadisticas_contexto = None
+        self.tokens_ahorrados_total = 0
+        
+        # Matriz con todos los vectores de la colección para búsquedas por lotes
+        self._matriz = None
+        self._lock_matriz = threading.Lock()
+        
+        # Las ingestas (carga inicial, vigilante, subidas) se serializan;
+        # las búsquedas no toman este lock
+        self._lock_ingesta = threading.RLock()
+        
+        # Ejecutor propio y acotado para la API asíncrona: el trabajo bloqueante
+        # (embeddings, Chroma) no ocupa el event loop ni el ejecutor por defecto
+        self.timeout_async = timeout_async
+        self._ejecutor_async = ThreadPoolExecutor(max_workers=hilos_async, thread_name_prefix="rag-async")
+    
+    # ===========================================================
+    #   MANIFIESTO DE INGESTA
+    # ===========================================================
+    def _cargar_manifiesto(self):
+        """Carga el manifiesto de ingesta desde disco (vacío si no existe)"""
+        try:
+            with open(self.ruta_manifiesto, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def _guardar_manifiesto(self):
+        """Guarda el manifiesto (y el índice léxico, que va a la par) de forma atómica"""
+        temporal = self.ruta_manifiesto + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.manifiesto, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, self.ruta_manifiesto)
+        self.indice_lexico.guardar()
+    
+    def _sincronizar_indice_lexico(self, tam_pagina=1000):
+        """Alinea el índice léxico con los IDs de Chroma: indexa los que faltan y quita los que sobran"""
+        en_chroma = set()
+        for datos in self.almacen.recorrer([], tam_pagina):
+            en_chroma.update(datos["ids"])
+        indexados = self.indice_lexico.ids()
+        if indexados == en_chroma:
+            return
+        self.indice_lexico.eliminar(list(indexados - en_chroma))
+        faltan = list(en_chroma - indexados)
+        for inicio in range(0, len(faltan), tam_pagina):
+            datos = self.almacen.obtener(faltan[inicio:inicio + tam_pagina])
+            self.indice_lexico.agregar(datos["ids"], datos["documents"], datos["metadatas"])
+        self.indice_lexico.guardar()
+    
+    @staticmethod
+    def _clave_ruta(ruta_archivo):
+        """Clave normalizada de una ruta para el manifiesto"""
+        return os.path.normpath(os.path.abspath(ruta_archivo))
+    
+    @staticmethod
+    def _hash_archivo(ruta_archivo):
+        """Calcula el hash SHA-256 del contenido del archivo"""
+        return hash_archivo(ruta_archivo)
     
-    def agregar_archivo(self, ruta_archivo):
+    @staticmethod
+    def _id_chunk(clave, posicion):
+        """ID estable de un chunk: derivado de la ruta y la posición del chunk"""
+        return f"{hashlib.sha1(clave.encode('utf-8')).hexdigest()[:16]}:{posicion}"
+    
+    def _registrar_en_manifiesto(self, clave, firma, ids, guardar=True):
+        """Registra la firma (tamaño, mtime, hash) y los chunks de un archivo"""
+        tamano, mtime, hash_contenido = firma
+        self.manifiesto[clave] = {
+            "tamano": tamano,
+            "mtime": mtime,
+            "hash": hash_contenido,
+            "particion": self.almacen.particion_de(clave),
+            "chunk_ids": ids
+        }
+        if guardar:
+            self._guardar_manifiesto()
+    
+    # ===========================================================
+    #   CACHE DE RESULTADOS
+    # ===========================================================
+    def _nueva_generacion(self):
+        """Marca la colección como modificada e invalida los resultados cacheados"""
+        with self._lock_generacion:
+            self.generacion += 1
+        self._cache_resultados.limpiar()
+    
+    @staticmethod
+    def _normalizar_consulta(consulta):
+        """Normaliza una consulta para que variantes triviales compartan entrada de cache"""
+        consulta = unicodedata.normalize("NFKC", consulta).casefold()
+        consulta = re.sub(r"\s+", " ", consulta).strip()
+        return consulta.rstrip("?!.¿¡ ").lstrip("¿¡ ")
+    
+    def _cacheado(self, tipo, consulta, k, calcular, *extra):
+        """Devuelve el resultado cacheado o lo calcula y lo guarda"""
+        clave = (tipo, self._normalizar_consulta(consulta), k, self.generacion) + extra
+        resultado = self._cache_resultados.obtener(clave)
+        if resultado is None:
+            resultado = calcular()
+            if resultado:
+                self._cache_resultados.guardar(clave, resultado)
+        return resultado
+    
+    def estadisticas_cache(self):
+        """
+        Estadísticas del cache de resultados y del cache de embeddings.
+        
+        Returns:
+            dict: {"resultados": {...}, "embeddings": {...}, "generacion": int}
+        """
+        return {
+            "resultados": self._cache_resultados.estadisticas(),
+            "embeddings": self.embeddings.estadisticas(),
+            "generacion": self.generacion
+        }
+    
+    # ===========================================================
+    #   ESCRITURA EN EL VECTORSTORE
+    # ===========================================================
+    def _eliminar_chunks(self, ids=None, rutas=()):
+        """Elimina chunks por IDs y por ruta (esto último limpia restos de ingestas antiguas sin IDs estables)"""
+        rutas = list(dict.fromkeys(rutas))
+        if ids or rutas:
+            self.almacen.eliminar(ids, rutas)
+        self.indice_lexico.eliminar(ids, rutas)
+        self._nueva_generacion()
+    
+    def _escribir_vectores(self, ids, textos, metadatas, vectores):
+        """Escribe chunks con embeddings ya calculados (upsert por ID estable)"""
+        self.almacen.escribir(ids, textos, metadatas, vectores)
+        self.indice_lexico.agregar(ids, textos, metadatas)
+        self._nueva_generacion()
+    
+    def _indexar_archivo(self, ruta_archivo, firma=None, tam_lote=256, progreso=None):
+        """
+        Lee, divide e indexa un archivo reemplazando sus chunks anteriores.
+        
+        El archivo se consume por partes (los PDF página a página, las tablas
+        en bloques de filas) y los chunks se escriben en lotes, así la memoria
+        no crece con el tamaño del archivo.
+        
+        Los chunks nuevos se escriben encima de los anteriores (los IDs son
+        estables) y al final solo se borran los que sobran: mientras se
+        reindexa, el archivo sigue apareciendo en las búsquedas.
+        
+        Args:
+            ruta_archivo: Ruta del archivo
+            firma: (tamaño, mtime, hash) ya calculados, si se tienen
+            tam_lote: Chunks por lote de embeddings y escritura
+            progreso: Callback opcional progreso(n_chunks) tras escribir cada lote
+                      (los chunks escritos ya aparecen en las búsquedas)
+        
+        Returns:
+            int: Número de chunks indexados, o None si el tipo no está soportado
+        """
+        partes = ca.leerDocumentoPorPartes(ruta_archivo, procesos=self.procesos_lectura, max_caracteres=self.chunk_size)
+        if partes is None:
+            return None
+        
+        clave = self._clave_ruta(ruta_archivo)
+        nombre = os.path.basename(ruta_archivo)
+        base_metadata = {"fuente": nombre, "ruta": clave, "tipo": os.path.splitext(nombre)[1].lower()}
+        
+        anterior = self.manifiesto.get(clave, {})
+        if anterior.get("chunk_ids") is None:
+            # Sin IDs registrados (ingestas antiguas o archivo nuevo): limpiar por ruta
+            self._eliminar_chunks(None, [clave, ruta_archivo])
+        
+        ids, textos, metadatas = [], [], []
+        todos_los_ids = []
+        
+        def escribir_lote():
+            self._escribir_vectores(ids, textos, metadatas, self.embeddings.embed_documents(textos))
+            ids.clear(), textos.clear(), metadatas.clear()
+            if progreso:
+                progreso(len(todos_los_ids))
+        
+        for texto_parte, extra in partes:
+            for texto in self.text_splitter.split_text(texto_parte):
+                id_chunk = self._id_chunk(clave, len(todos_los_ids))
+                ids.append(id_chunk)
+                textos.append(texto)
+                metadatas.append({**base_metadata, **extra, "chunk": len(todos_los_ids)})
+                todos_los_ids.append(id_chunk)
+                if len(ids) >= tam_lote:
+                    escribir_lote()
+        if ids:
+            escribir_lote()
+        
+        # Chunks del final que ya no existen (el archivo ha encogido)
+        sobrantes = set(anterior.get("chunk_ids") or []) - set(todos_los_ids)
+        if sobrantes:
+            self._eliminar_chunks(sorted(sobrantes))
+        
+        if firma is None:
+            stat = os.stat(ruta_archivo)
+            firma = (stat.st_size, stat.st_mtime, self._hash_archivo(ruta_archivo))
+        self._registrar_en_manifiesto(clave, firma, todos_los_ids)
+        return len(todos_los_ids)
+    
+    def agregar_archivo(self, ruta_archivo, progreso=None):
         """
         Agrega un archivo al RAG.
         
+        Si el archivo ya estaba indexado, sus chunks anteriores se reemplazan.
+        
         Args:
             ruta_archivo: Ruta del archivo a agregar
+            progreso: Callback opcional progreso(n_chunks) con los chunks ya escritos
         
         Returns:
             str: Mensaje de éxito o error
         """
-        try:
-            nombre = os.path.basename(ruta_archivo)
-            extension = os.path.splitext(nombre)[1].lower()
-            # Leer contenido según tipo de archivo
-            if extension in [".txt", ".md", ".py", ".log"]:
-                contenido = ca.leerTexto(ruta_archivo)
-            elif extension == ".pdf":
-                contenido = ca.leerPdf(ruta_archivo)
-            elif extension == ".json":
-                contenido = ca.leerJSON(ruta_archivo)
-            elif extension == ".csv":
-                contenido = ca.leerCSV(ruta_archivo)
-            else:
-                return f"Tipo de archivo no soportado para RAG: {extension}"
+        with self._lock_ingesta:
+            try:
+                nombre = os.path.basename(ruta_archivo)
+                n_chunks = self._indexar_archivo(ruta_archivo, progreso=progreso)
+                if n_chunks is None:
+                    extension = os.path.splitext(nombre)[1].lower()
+                    return f"Tipo de archivo no soportado para RAG: {extension}"
+                
+                return f"✅ Archivo '{nombre}' agregado al RAG ({n_chunks} chunks)"
             
-            # Crear documento
-            documento = Document(
-                page_content=contenido,
-                metadata={
-                    "fuente": nombre,
-                    "ruta": ruta_archivo,
-                    "tipo": extension
-                }
-            )
+            except Exception as e:
+                return f"❌ Error al agregar archivo: {str(e)}"
+    
+    def sincronizar_archivo(self, ruta_archivo):
+        """
+        Indexa un archivo solo si ha cambiado desde la última ingesta.
+        
+        Compara tamaño y mtime con el manifiesto; si difieren, compara el
+        hash del contenido antes de volver a indexar.
+        
+        Returns:
+            str: "agregado", "actualizado", "omitido" o "no_soportado"
+        """
+        with self._lock_ingesta:
+            extension = os.path.splitext(ruta_archivo)[1].lower()
+            if extension not in self.EXTENSIONES_SOPORTADAS:
+                return "no_soportado"
             
-            # Dividir en chunks
-            chunks = self.text_splitter.split_documents([documento])
+            clave = self._clave_ruta(ruta_archivo)
+            stat = os.stat(ruta_archivo)
+            anterior = self.manifiesto.get(clave)
             
-            # Agregar a vectorstore
-            self.vectorstore.add_documents(chunks)
+            if anterior and anterior["tamano"] == stat.st_size and anterior["mtime"] == stat.st_mtime:
+                return "omitido"
             
-            return f"✅ Archivo '{nombre}' agregado al RAG ({len(chunks)} chunks)"
+            hash_contenido = self._hash_archivo(ruta_archivo)
+            if anterior and anterior["hash"] == hash_contenido:
+                # Solo ha cambiado el mtime: actualizar firma sin reindexar
+                anterior["tamano"] = stat.st_size
+                anterior["mtime"] = stat.st_mtime
+                self._guardar_manifiesto()
+                return "omitido"
+            
+            n_chunks = self._indexar_archivo(ruta_archivo, (stat.st_size, stat.st_mtime, hash_contenido))
+            if n_chunks is None:
+                return "no_soportado"
+            return "actualizado" if anterior else "agregado"
+    
+    def eliminar_archivo(self, ruta_archivo):
+        """
+        Elimina del RAG los chunks de un archivo y su entrada del manifiesto.
         
-        except Exception as e:
-            return f"❌ Error al agregar archivo: {str(e)}"
+        Returns:
+            bool: True si el archivo estaba indexado
+        """
+        with self._lock_ingesta:
+            clave = self._clave_ruta(ruta_archivo)
+            anterior = self.manifiesto.pop(clave, None)
+            if anterior is None:
+                return False
+            self._eliminar_chunks(anterior.get("chunk_ids"), [clave])
+            self._guardar_manifiesto()
+            return True
     
-    def agregar_carpeta_completa(self):
+    def agregar_archivos_en_lote(self, rutas, procesos=None, tam_lote_embeddings=256, progreso=None):
         """
-        Agrega todos los archivos de la carpeta de documentos al RAG.
+        Ingesta masiva: parsea en paralelo y calcula embeddings en lotes grandes.
+        
+        Args:
+            rutas: Lista de rutas de archivos
+            procesos: Procesos de parseo (por defecto, todos los núcleos)
+            tam_lote_embeddings: Chunks por lote de embeddings
+            progreso: Callback opcional progreso(ruta, estado)
         
         Returns:
-            str: Resumen de archivos agregados
+            dict: Listas de archivos agregados, actualizados, omitidos y con error
         """
-        archivos_procesados = []
+        with self._lock_ingesta:
+            pipeline = PipelineIngesta(self, procesos=procesos, tam_lote_embeddings=tam_lote_embeddings)
+            return pipeline.ejecutar(list(rutas), progreso=progreso)
+    
+    def agregar_carpeta_completa(self, procesos=None):
+        """
+        Sincroniza la carpeta de documentos (y sus subcarpetas) con el RAG de forma incremental.
+        
+        Los archivos sin cambios se omiten, los modificados se reindexan
+        reemplazando sus chunks y los borrados se eliminan del índice.
+        Los archivos a procesar pasan por la ingesta masiva en paralelo.
+        
+        Args:
+            procesos: Procesos de parseo para la ingesta masiva
         
-        for archivo in os.listdir(self.carpeta_documentos):
-            ruta_completa = os.path.join(self.carpeta_documentos, archivo)
+        Returns:
+            dict: Listas de archivos agregados, actualizados, omitidos,
+                  eliminados y con error
+        """
+        with self._lock_ingesta:
+            resumen = {
+                "agregados": [],
+                "actualizados": [],
+                "omitidos": [],
+                "eliminados": [],
+                "errores": []
+            }
+            carpeta = self._clave_ruta(self.carpeta_documentos)
+            presentes = set()
+            pendientes = []
+            
+            for ruta_completa in self._archivos_carpeta():
+                archivo = os.path.relpath(ruta_completa, self.carpeta_documentos)
+                clave = self._clave_ruta(ruta_completa)
+                presentes.add(clave)
+                
+                extension = os.path.splitext(archivo)[1].lower()
+                anterior = self.manifiesto.get(clave)
+                try:
+                    stat = os.stat(ruta_completa)
+                except OSError as e:
+                    resumen["errores"].append(f"{archivo}: {e}")
+                    continue
+                if extension not in self.EXTENSIONES_SOPORTADAS or (
+                    anterior and anterior["tamano"] == stat.st_size and anterior["mtime"] == stat.st_mtime
+                ):
+                    resumen["omitidos"].append(archivo)
+                else:
+                    pendientes.append(ruta_completa)
             
-            if os.path.isfile(ruta_completa):
-                resultado = self.agregar_archivo(ruta_completa)
-                archivos_procesados.append(resultado)
+            if pendientes:
+                resultado = self.agregar_archivos_en_lote(pendientes, procesos=procesos)
+                for categoria, archivos in resultado.items():
+                    resumen[categoria].extend(archivos)
+            
+            # Archivos de la carpeta que ya no existen
+            for clave in list(self.manifiesto):
+                if clave.startswith(carpeta + os.sep) and clave not in presentes:
+                    self.eliminar_archivo(clave)
+                    resumen["eliminados"].append(os.path.relpath(clave, carpeta))
+            
+            return resumen
+    
+    def _archivos_carpeta(self):
+        """Rutas de todos los archivos de la carpeta de documentos, subcarpetas incluidas (sin las ocultas)"""
+        for directorio, subcarpetas, archivos in os.walk(self.carpeta_documentos):
+            subcarpetas[:] = sorted(d for d in subcarpetas if not d.startswith("."))
+            for archivo in sorted(archivos):
+                yield os.path.join(directorio, archivo)
+    
+    def reconstruir_particion(self, particion):
+        """
+        Vacía una partición y vuelve a indexar solo los archivos que contenía.
+        
+        Las demás particiones siguen respondiendo mientras tanto.
         
-        return "\n".join(archivos_procesados)
+        Args:
+            particion: Nombre de la partición (ver estadisticas_particiones)
+        
+        Returns:
+            dict: Listas de archivos reindexados, eliminados (ya no existen) y con error
+        """
+        with self._lock_ingesta:
+            resumen = {"reindexados": [], "eliminados": [], "errores": []}
+            claves = [
+                clave for clave, entrada in self.manifiesto.items()
+                if entrada.get("particion", "unico") == particion
+            ]
+            self.almacen.vaciar(particion)
+            self.indice_lexico.eliminar(rutas=claves)
+            self._nueva_generacion()
+            
+            for clave in claves:
+                nombre = os.path.basename(clave)
+                if not os.path.isfile(clave):
+                    self.manifiesto.pop(clave, None)
+                    resumen["eliminados"].append(nombre)
+                    continue
+                try:
+                    self._indexar_archivo(clave)
+                    resumen["reindexados"].append(nombre)
+                except Exception as e:
+                    resumen["errores"].append(f"{nombre}: {e}")
+            self._guardar_manifiesto()
+            return resumen
     
-    def buscar(self, consulta, k=5):
+    def estadisticas_particiones(self):
+        """
+        Returns:
+            dict: Estrategia de particionado y chunks por partición
+        """
+        return {"estrategia": self.almacen.estrategia, "particiones": self.almacen.estadisticas()}
+    
+    def buscar(self, consulta, k=5, particiones=None, tipos=None):
         """
         Busca documentos relevantes en el RAG.
         
         Args:
             consulta: Texto de búsqueda
             k: Número de resultados a devolver
+            particiones: Particiones donde buscar (por defecto, todas)
+            tipos: Extensiones de archivo a las que limitar la búsqueda (p. ej. [".pdf"]);
+                   con el particionado "tipo" solo se consultan sus particiones
         
         Returns:
             list: Lista de documentos relevantes
         """
+        return [doc for doc, _ in self.buscar_con_scores(consulta, k, particiones, tipos)]
+    
+    def buscar_con_scores(self, consulta, k=5, particiones=None, tipos=None):
+        """
+        Busca con scores de relevancia.
+        
+        Las particiones se consultan en paralelo y se fusionan sus top-k.
+        
+        Returns:
+            list: [(Document, score), ...]
+        """
         try:
-            resultados = self.vectorstore.similarity_search(consulta, k=k)
-            return resultados
+            return self._cacheado(
+                "buscar_con_scores", consulta, k,
+                lambda: self.almacen.buscar(consulta, k=k, particiones=particiones, tipos=tipos),
+                tuple(particiones) if particiones is not None else None,
+                tuple(sorted(tipos)) if tipos else None
+            )
         except Exception as e:
             return []
     
-    def buscar_con_scores(self, consulta, k=5):
+    def _documentos_por_id(self, ids):
+        """Recupera chunks de Chroma por ID (sin calcular embeddings), en el orden pedido"""
+        if not ids:
+            return []
+        datos = self.almacen.obtener(ids)
+        por_id = {
+            id_chunk: Document(page_content=texto, metadata=metadata or {}, id=id_chunk)
+            for id_chunk, texto, metadata in zip(datos["ids"], datos["documents"], datos["metadatas"])
+        }
+        return [por_id[id_chunk] for id_chunk in ids if id_chunk in por_id]
+    
+    def buscar_lexico(self, consulta, k=5):
         """
-        Busca con scores de relevancia.
+        Búsqueda puramente léxica (BM25), sin usar el modelo de embeddings.
         
         Returns:
             list: [(Document, score), ...]
         """
+        resultados = self.indice_lexico.buscar(consulta, k=k)
+        puntuaciones = dict(resultados)
+        documentos = self._documentos_por_id([id_chunk for id_chunk, _ in resultados])
+        return [(doc, puntuaciones[doc.id]) for doc in documentos]
+    
+    def buscar_hibrido(self, consulta, k=5, alfa=0.5):
+        """
+        Busca combinando BM25 y similitud vectorial.
+        
+        Si la consulta parece un identificador exacto (ID de Notion, símbolo de
+        código, nombre de propiedad...) y el índice léxico lo encuentra
+        completo, responde solo con BM25 sin ejecutar el modelo de embeddings.
+        
+        Args:
+            consulta: Texto de búsqueda
+            k: Número de resultados a devolver
+            alfa: Peso de la parte vectorial (0 = solo léxica, 1 = solo vectorial)
+        
+        Returns:
+            list: [(Document, score), ...] con score combinado en [0, 1]
+        """
         try:
-            resultados = self.vectorstore.similarity_search_with_score(consulta, k=k)
-            return resultados
+            return self._cacheado("buscar_hibrido", consulta, k, lambda: self._buscar_hibrido(consulta, k, alfa), alfa)
         except Exception as e:
             return []
     
-    def obtener_contexto(self, consulta, k=5):
+    def _buscar_hibrido(self, consulta, k, alfa):
+        candidatos = max(k * 4, 20)
+        lexicos = self.indice_lexico.buscar(consulta, k=candidatos)
+        
+        # Camino rápido: coincidencia exacta de identificadores
+        if lexicos and es_consulta_exacta(consulta) and self.indice_lexico.cubre_consulta(lexicos[0][0], consulta):
+            exactos = [par for par in lexicos if self.indice_lexico.cubre_consulta(par[0], consulta)][:k]
+            maximo = exactos[0][1]
+            puntuaciones = {id_chunk: puntuacion / maximo for id_chunk, puntuacion in exactos}
+            documentos = self._documentos_por_id([id_chunk for id_chunk, _ in exactos])
+            return [(doc, puntuaciones[doc.id]) for doc in documentos]
+        
+        vectoriales = self.almacen.buscar(consulta, k=candidatos)
+        
+        def normalizar(valores):
+            if not valores:
+                return {}
+            minimo, maximo = min(valores.values()), max(valores.values())
+            if maximo == minimo:
+                return {clave: 1.0 for clave in valores}
+            return {clave: (valor - minimo) / (maximo - minimo) for clave, valor in valores.items()}
+        
+        # La distancia vectorial se invierte: menor distancia = más relevante
+        puntos_lexicos = normalizar(dict(lexicos))
+        puntos_vectoriales = normalizar({doc.id: -distancia for doc, distancia in vectoriales})
+        
+        documentos = {doc.id: doc for doc, _ in vectoriales}
+        faltan = [id_chunk for id_chunk in puntos_lexicos if id_chunk not in documentos]
+        documentos.update({doc.id: doc for doc in self._documentos_por_id(faltan)})
+        
+        combinados = {
+            id_chunk: alfa * puntos_vectoriales.get(id_chunk, 0.0) + (1 - alfa) * puntos_lexicos.get(id_chunk, 0.0)
+            for id_chunk in documentos
+        }
+        mejores = sorted(combinados.items(), key=lambda par: par[1], reverse=True)[:k]
+        return [(documentos[id_chunk], puntuacion) for id_chunk, puntuacion in mejores]
+    
+    def _cargar_matriz(self, tam_pagina=5000):
+        """
+        Carga en memoria todos los vectores de todas las particiones (se
+        reutiliza mientras no cambie la generación).
+        
+        Returns:
+            dict: ids, matriz float32, normas al cuadrado, textos, metadatas y métrica
+        """
+        with self._lock_matriz:
+            if self._matriz is not None and self._matriz["generacion"] == self.generacion:
+                return self._matriz
+            generacion = self.generacion
+            ids, vectores, textos, metadatas = [], [], [], []
+            for datos in self.almacen.recorrer(["embeddings", "documents", "metadatas"], tam_pagina):
+                ids.extend(datos["ids"])
+                vectores.extend(datos["embeddings"])
+                textos.extend(datos["documents"])
+                metadatas.extend(datos["metadatas"])
+            matriz = np.asarray(vectores, dtype=np.float32).reshape(len(ids), -1)
+            metrica = self.almacen.metrica()
+            if metrica == "cosine":
+                normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+                matriz = matriz / np.where(normas == 0, 1, normas)
+            self._matriz = {
+                "generacion": generacion,
+                "ids": ids,
+                "matriz": matriz,
+                "normas2": np.einsum("ij,ij->i", matriz, matriz),
+                "textos": textos,
+                "metadatas": metadatas,
+                "metrica": metrica
+            }
+            return self._matriz
+    
+    def buscar_lote(self, consultas, k=5, con_scores=False):
+        """
+        Busca muchas consultas a la vez.
+        
+        Calcula los embeddings de todas las consultas en un solo lote y
+        obtiene el top-k de cada una con una única multiplicación de matrices
+        sobre todos los vectores de la colección. Mucho más rápido que llamar
+        a buscar() en bucle cuando hay decenas de consultas.
+        
+        Args:
+            consultas: Lista de textos de búsqueda
+            k: Número de resultados por consulta
+            con_scores: Si True, devuelve (Document, distancia) como buscar_con_scores
+        
+        Returns:
+            list: Una lista de resultados por consulta, en el mismo orden
+        """
+        if not consultas:
+            return []
+        if k <= 0:
+            return [[] for _ in consultas]
+        datos = self._cargar_matriz()
+        if not datos["ids"]:
+            return [[] for _ in consultas]
+        
+        q = np.asarray(self.embeddings.embed_consultas(list(consultas)), dtype=np.float32)
+        productos = q @ datos["matriz"].T
+        if datos["metrica"] == "cosine":
+            normas = np.linalg.norm(q, axis=1, keepdims=True)
+            distancias = 1 - productos / np.where(normas == 0, 1, normas)
+        elif datos["metrica"] == "ip":
+            distancias = 1 - productos
+        else:
+            # Distancia L2 al cuadrado (la que usa Chroma por defecto)
+            distancias = np.einsum("ij,ij->i", q, q)[:, None] + datos["normas2"][None, :] - 2 * productos
+        
+        # Sin pasar del número de vectores: argpartition necesita 0 <= k - 1 < n
+        k = min(k, len(datos["ids"]))
+        candidatos = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+        resultados = []
+        for fila, indices in enumerate(candidatos):
+            indices = indices[np.argsort(distancias[fila, indices])]
+            documentos = [
+                Document(page_content=datos["textos"][i], metadata=datos["metadatas"][i] or {}, id=datos["ids"][i])
+                for i in indices
+            ]
+            if con_scores:
+                resultados.append([(doc, float(distancias[fila, i])) for doc, i in zip(documentos, indices)])
+            else:
+                resultados.append(documentos)
+        return resultados
+    
+    def obtener_contexto(self, consulta, k=5, presupuesto_tokens=None):
         """
         Obtiene contexto formateado para el agente.
         
+        Los chunks consecutivos de un mismo archivo se fusionan sin repetir
+        el solapamiento, los casi duplicados se descartan y el resultado se
+        ajusta al presupuesto de tokens. Las estadísticas (incluidos los
+        tokens ahorrados) quedan en `ultimas_estadisticas_contexto`.
+        
+        Args:
+            consulta: Texto de búsqueda
+            k: Número de chunks a recuperar
+            presupuesto_tokens: Tokens máximos (por defecto, presupuesto_tokens_contexto)
+        
         Returns:
             str: Contexto relevante como texto
         """
-        resultados = self.buscar(consulta, k=k)
+        contexto, _ = self.construir_contexto(consulta, k, presupuesto_tokens)
+        return contexto
+    
+    def construir_contexto(self, consulta, k=5, presupuesto_tokens=None):
+        """
+        Como obtener_contexto, pero devuelve también las estadísticas.
         
-        if not resultados:
-            return "No se encontró información relevante en el RAG."
+        Returns:
+            (str, dict): Contexto y estadísticas (tokens originales, finales y ahorrados,
+                         bloques fusionados, duplicados y recortados)
+        """
+        if presupuesto_tokens is None:
+            presupuesto_tokens = self.presupuesto_tokens_contexto
+        contexto, estadisticas = self._cacheado(
+            "obtener_contexto", consulta, k,
+            lambda: ensamblar_contexto(self.buscar(consulta, k=k), presupuesto_tokens),
+            presupuesto_tokens
+        )
+        self.ultimas_estadisticas_contexto = estadisticas
+        self.tokens_ahorrados_total += estadisticas["tokens_ahorrados"]
+        return contexto, estadisticas
+
+
+    # ===========================================================
+    #   API ASÍNCRONA
+    # ===========================================================
+    async def _en_ejecutor(self, funcion, *args, timeout=None, **kwargs):
+        """
+        Ejecuta una función bloqueante en el ejecutor de la API asíncrona.
         
-        contexto = "### Información relevante del RAG:\n\n"
+        Si se cancela la corrutina o se agota el timeout, la tarea se
+        descarta si aún no había empezado; si ya estaba en marcha, termina
+        en segundo plano y su resultado se ignora.
         
-        for i, doc in enumerate(resultados, 1):
-            fuente = doc.metadata.get("fuente", "desconocida")
-            contexto += f"**[{i}] Fuente: {fuente}**\n{doc.page_content}\n\n"
+        Raises:
+            asyncio.TimeoutError: Si no termina en `timeout` segundos
+        """
+        loop = asyncio.get_running_loop()
+        futuro = loop.run_in_executor(self._ejecutor_async, functools.partial(funcion, *args, **kwargs))
+        return await asyncio.wait_for(futuro, self.timeout_async if timeout is None else timeout)
+    
+    async def abuscar(self, consulta, k=5, particiones=None, tipos=None, timeout=None):
+        """Versión asíncrona de buscar()"""
+        return await self._en_ejecutor(self.buscar, consulta, k, particiones, tipos, timeout=timeout)
+    
+    async def abuscar_con_scores(self, consulta, k=5, particiones=None, tipos=None, timeout=None):
+        """Versión asíncrona de buscar_con_scores()"""
+        return await self._en_ejecutor(self.buscar_con_scores, consulta, k, particiones, tipos, timeout=timeout)
+    
+    async def aobtener_contexto(self, consulta, k=5, presupuesto_tokens=None, timeout=None):
+        """Versión asíncrona de obtener_contexto()"""
+        return await self._en_ejecutor(self.obtener_contexto, consulta, k, presupuesto_tokens, timeout=timeout)
+    
+    async def aagregar_archivo(self, ruta_archivo, progreso=None, timeout=None):
+        """
+        Versión asíncrona de agregar_archivo().
         
-        return contexto
+        Ingerir un archivo grande puede tardar; usa un timeout acorde o
+        los trabajos en segundo plano de trabajosIngesta.
+        """
+        return await self._en_ejecutor(self.agregar_archivo, ruta_archivo, progreso, timeout=timeout)
+
+
+# ===========================================================
+#   INICIALIZACIÓN PEREZOSA
+# ===========================================================
+class RAGPerezoso:
+    """
+    Sustituto de RAGManager que lo construye bajo demanda.
+    
+    Importar este módulo no carga el modelo ni abre Chroma. La construcción
+    se lanza con iniciar_en_segundo_plano() o con el primer acceso a un
+    atributo, que espera a que el RAG esté listo (con timeout).
+    """
+    
+    def __init__(self, timeout=120, **kwargs):
+        """
+        Args:
+            timeout: Segundos que espera un acceso antes de lanzar TimeoutError
+            **kwargs: Argumentos para RAGManager
+        """
+        self.timeout = timeout
+        self._kwargs = kwargs
+        self._futuro = None
+        self._lock = threading.Lock()
+        self._estado = "sin iniciar"
+        self._sincronizado = threading.Event()
+        self.resumen_ingesta = None
+        self.vigilante = None
+    
+    def iniciar_en_segundo_plano(self, sincronizar_carpeta=True, vigilar_carpeta=False):
+        """
+        Construye el RAGManager en un hilo aparte.
+        
+        Args:
+            sincronizar_carpeta: Si True, tras construirlo sincroniza la carpeta
+                                 de documentos (las búsquedas ya funcionan mientras)
+            vigilar_carpeta: Si True, al terminar la sincronización arranca un
+                             VigilanteCarpeta que mantiene el índice al día
+        
+        Returns:
+            Future: Se resuelve con el RAGManager listo
+        """
+        with self._lock:
+            if self._futuro is not None:
+                return self._futuro
+            self._futuro = Future()
+            self._futuro.set_running_or_notify_cancel()
+        
+        hilo = threading.Thread(target=self._calentar, args=(sincronizar_carpeta, vigilar_carpeta), daemon=True, name="rag-arranque")
+        hilo.start()
+        return self._futuro
+    
+    def _calentar(self, sincronizar_carpeta, vigilar_carpeta=False):
+        try:
+            self._preparar(sincronizar_carpeta)
+        finally:
+            self._sincronizado.set()
+        if vigilar_carpeta and self.listo():
+            self.vigilante = VigilanteCarpeta(self._futuro.result()).iniciar()
+    
+    def _preparar(self, sincronizar_carpeta):
+        try:
+            self._estado = "cargando modelo y base de datos"
+            manager = RAGManager(**self._kwargs)
+        except Exception as e:
+            self._estado = f"error: {e}"
+            self._futuro.set_exception(e)
+            return
+        
+        # Réplica nueva: cargar un snapshot evita recalcular todos los embeddings
+        ruta_snapshot = os.getenv("RAG_SNAPSHOT")
+        if ruta_snapshot and os.path.isfile(ruta_snapshot) and not manager.manifiesto:
+            try:
+                import snapshotRag
+                self._estado = "importando snapshot"
+                with medir_fase("importación del snapshot"):
+                    snapshotRag.importar_snapshot(manager, ruta_snapshot)
+            except Exception as e:
+                print(f"⚠️ No se pudo importar el snapshot {ruta_snapshot}: {e}", file=sys.stderr)
+        
+        self._estado = "listo (sincronizando documentos)" if sincronizar_carpeta else "listo"
+        self._futuro.set_result(manager)
+        if not sincronizar_carpeta:
+            return
+        
+        try:
+            with medir_fase("sincronización de documentos_rag"):
+                self.resumen_ingesta = manager.agregar_carpeta_completa()
+            self._estado = "listo"
+        except Exception as e:
+            self._estado = f"listo (error sincronizando documentos: {e})"
+        if PERFIL_ARRANQUE:
+            print(informe_arranque(), file=sys.stderr)
+    
+    def obtener(self, timeout=None):
+        """
+        Devuelve el RAGManager, esperando a que esté listo.
+        
+        Args:
+            timeout: Segundos máximos de espera (por defecto, self.timeout)
+        
+        Raises:
+            TimeoutError: Si el RAG no está listo a tiempo
+        """
+        futuro = self.iniciar_en_segundo_plano(sincronizar_carpeta=False)
+        return futuro.result(timeout=self.timeout if timeout is None else timeout)
+    
+    async def aobtener(self, timeout=None):
+        """
+        Versión asíncrona de obtener(): espera sin bloquear el event loop.
+        
+        Raises:
+            TimeoutError: Si el RAG no está listo a tiempo
+        """
+        futuro = asyncio.wrap_future(self.iniciar_en_segundo_plano(sincronizar_carpeta=False))
+        try:
+            # shield: un timeout no debe cancelar la construcción del RAG
+            return await asyncio.wait_for(asyncio.shield(futuro), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"El RAG no está listo ({self._estado})")
+    
+    def esperar_sincronizacion(self, timeout=None):
+        """Espera a que termine el arranque completo (incluida la sincronización de la carpeta)"""
+        return self._sincronizado.wait(timeout)
+    
+    def listo(self):
+        """True si el RAGManager ya está construido"""
+        return self._futuro is not None and self._futuro.done() and self._futuro.exception() is None
+    
+    def estado(self):
+        """Texto con el estado de preparación del RAG"""
+        return self._estado
+    
+    def __getattr__(self, nombre):
+        return getattr(self.obtener(), nombre)
+
+
+# Instancia global (perezosa)
+rag = RAGPerezoso(
+    carpeta_persistencia=os.getenv("RAG_DB_PATH", "./rag_db"),
+    carpeta_documentos=os.getenv("RAG_DOCUMENTS_PATH", "./documentos_rag")
+)
 
 
-# Instancia global
-rag = RAGManager()
+if __name__ == "__main__":
+    # python ragManager.py -> arranque completo con perfil de tiempos
+    PERFIL_ARRANQUE = True
+    rag.iniciar_en_segundo_plano(sincronizar_carpeta=True)
+    rag.esperar_sincronizacion()
+    print(rag.estado())
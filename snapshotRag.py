@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+import numpy as np
+
+# ===========================================================
+#   SNAPSHOTS DEL ÍNDICE (EXPORTAR / IMPORTAR)
+#   python snapshotRag.py exportar rag_snapshot.zip
+#   python snapshotRag.py importar rag_snapshot.zip
+# ===========================================================
+#   Estructura del archivo:
+#     meta.json                       -> versión, modelo, backend, splitter, particiones
+#     manifiesto.json                 -> manifiesto de ingesta (rutas relativas)
+#     indice_lexico.json              -> índice BM25 (rutas relativas)
+#     particiones/<nombre>/<n>.json   -> ids, textos y metadatas de una página de chunks
+#     particiones/<nombre>/<n>.npy    -> embeddings float32 de esa página
+
+FORMATO = 1
+TAM_PAGINA = 5000
+
+
+class SnapshotIncompatible(Exception):
+    """El snapshot no se puede cargar con la configuración actual del RAG"""
+
+
+def _configuracion(rag):
+    """Lo que debe coincidir entre el RAG que exporta y el que importa"""
+    return {
+        "modelo": rag.nombre_modelo,
+        "backend": rag.backend_embeddings,
+        "chunk_size": rag.chunk_size,
+        "chunk_overlap": rag.chunk_overlap,
+        "separadores": list(rag.separadores)
+    }
+
+
+def _relativa(ruta, carpeta):
+    """Ruta relativa a la carpeta de documentos (las de fuera quedan absolutas)"""
+    if not ruta:
+        return ruta
+    relativa = os.path.relpath(ruta, carpeta)
+    return ruta if relativa.startswith("..") else relativa
+
+
+def _absoluta(ruta, carpeta):
+    if not ruta or os.path.isabs(ruta):
+        return ruta
+    return os.path.normpath(os.path.join(carpeta, ruta))
+
+
+def exportar_snapshot(rag, ruta_archivo, tam_pagina=TAM_PAGINA):
+    """
+    Exporta el índice completo (vectores, textos, manifiesto e índice léxico).
+
+    Solo se guardan los chunks vivos, con los embeddings en float32, así el
+    snapshot es más compacto que copiar la carpeta de Chroma.
+
+    Args:
+        rag: RAGManager a exportar
+        ruta_archivo: Archivo .zip de salida
+        tam_pagina: Chunks por página dentro del archivo
+
+    Returns:
+        dict: El meta.json escrito
+    """
+    carpeta = rag._clave_ruta(rag.carpeta_documentos)
+    meta = {
+        "formato": FORMATO,
+        "creado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **_configuracion(rag),
+        "particionado": rag.almacen.estrategia,
+        "metrica": rag.almacen.metrica(),
+        "particiones": {}
+    }
+
+    temporal = ruta_archivo + ".tmp"
+    with rag._lock_ingesta, zipfile.ZipFile(temporal, "w", compression=zipfile.ZIP_DEFLATED) as archivo:
+        for particion in rag.almacen.particiones():
+            coleccion = rag.almacen.coleccion(particion)._collection
+            total = coleccion.count()
+            paginas = 0
+            for inicio in range(0, total, tam_pagina):
+                datos = coleccion.get(include=["embeddings", "documents", "metadatas"], limit=tam_pagina, offset=inicio)
+                metadatas = [
+                    {**(metadata or {}), "ruta": _relativa((metadata or {}).get("ruta"), carpeta)}
+                    for metadata in datos["metadatas"]
+                ]
+                base = f"particiones/{particion}/{paginas:05d}"
+                archivo.writestr(base + ".json", json.dumps(
+                    {"ids": datos["ids"], "documents": datos["documents"], "metadatas": metadatas},
+                    ensure_ascii=False
+                ))
+                # Los vectores apenas se comprimen: se guardan sin deflate
+                entrada = zipfile.ZipInfo(base + ".npy")
+                entrada.compress_type = zipfile.ZIP_STORED
+                with archivo.open(entrada, "w", force_zip64=True) as destino:
+                    np.save(destino, np.asarray(datos["embeddings"], dtype=np.float32))
+                paginas += 1
+            meta["particiones"][particion] = {"chunks": total, "paginas": paginas}
+
+        manifiesto = {_relativa(clave, carpeta): entrada for clave, entrada in rag.manifiesto.items()}
+        archivo.writestr("manifiesto.json", json.dumps(manifiesto, ensure_ascii=False))
+
+        documentos = {
+            id_chunk: [_relativa(ruta, carpeta), terminos]
+            for id_chunk, (ruta, terminos) in rag.indice_lexico.documentos().items()
+        }
+        archivo.writestr("indice_lexico.json", json.dumps({"documentos": documentos}, ensure_ascii=False))
+
+        archivo.writestr("meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
+
+    os.replace(temporal, ruta_archivo)
+    return meta
+
+
+def leer_meta(ruta_archivo):
+    """Lee el meta.json de un snapshot sin cargar nada más"""
+    with zipfile.ZipFile(ruta_archivo) as archivo:
+        return json.loads(archivo.read("meta.json"))
+
+
+def validar_snapshot(rag, meta):
+    """
+    Comprueba que el snapshot es compatible con el RAG actual.
+
+    Raises:
+        SnapshotIncompatible: Si el formato, el modelo, el backend o el splitter no coinciden
+    """
+    if meta.get("formato") != FORMATO:
+        raise SnapshotIncompatible(f"Formato de snapshot {meta.get('formato')} no soportado (se espera {FORMATO})")
+    diferencias = [
+        f"{clave}: snapshot={meta.get(clave)!r}, actual={valor!r}"
+        for clave, valor in _configuracion(rag).items()
+        if meta.get(clave) != valor
+    ]
+    if diferencias:
+        raise SnapshotIncompatible("El snapshot no coincide con la configuración actual: " + "; ".join(diferencias))
+
+
+def importar_snapshot(rag, ruta_archivo, forzar=False):
+    """
+    Carga un snapshot sustituyendo el contenido actual del RAG.
+
+    Los vectores se insertan directamente (sin recalcular embeddings) en
+    lotes del tamaño máximo que admite Chroma. Las rutas se reubican en la
+    carpeta de documentos actual.
+
+    Args:
+        rag: RAGManager destino
+        ruta_archivo: Archivo .zip generado por exportar_snapshot
+        forzar: Si True, carga aunque la configuración no coincida
+
+    Returns:
+        dict: Chunks cargados por partición
+
+    Raises:
+        SnapshotIncompatible: Si el snapshot no es compatible y no se fuerza
+    """
+    carpeta = rag._clave_ruta(rag.carpeta_documentos)
+    cargados = {}
+    with rag._lock_ingesta, zipfile.ZipFile(ruta_archivo) as archivo:
+        meta = json.loads(archivo.read("meta.json"))
+        if not forzar:
+            validar_snapshot(rag, meta)
+
+        for particion in rag.almacen.particiones():
+            rag.almacen.vaciar(particion)
+
+        tam_lote = rag.almacen.cliente.get_max_batch_size()
+        for particion, info in meta["particiones"].items():
+            coleccion = rag.almacen.coleccion(particion)._collection
+            for pagina in range(info["paginas"]):
+                base = f"particiones/{particion}/{pagina:05d}"
+                datos = json.loads(archivo.read(base + ".json"))
+                with archivo.open(base + ".npy") as origen:
+                    vectores = np.load(origen)
+                metadatas = [
+                    {**metadata, "ruta": _absoluta(metadata.get("ruta"), carpeta)}
+                    for metadata in datos["metadatas"]
+                ]
+                for inicio in range(0, len(datos["ids"]), tam_lote):
+                    fin = inicio + tam_lote
+                    coleccion.add(
+                        ids=datos["ids"][inicio:fin],
+                        embeddings=vectores[inicio:fin],
+                        documents=datos["documents"][inicio:fin],
+                        metadatas=metadatas[inicio:fin]
+                    )
+            cargados[particion] = info["chunks"]
+
+        manifiesto = json.loads(archivo.read("manifiesto.json"))
+        rag.manifiesto.clear()
+        rag.manifiesto.update({_absoluta(clave, carpeta): entrada for clave, entrada in manifiesto.items()})
+
+        documentos = json.loads(archivo.read("indice_lexico.json"))["documentos"]
+
+    rag.indice_lexico.reemplazar({
+        id_chunk: (_absoluta(ruta, carpeta), terminos)
+        for id_chunk, (ruta, terminos) in documentos.items()
+    })
+    rag._guardar_manifiesto()
+    rag._nueva_generacion()
+    return cargados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta o importa snapshots del índice del RAG")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    parser_exportar = subparsers.add_parser("exportar", help="Guarda el índice actual en un archivo")
+    parser_exportar.add_argument("archivo")
+    parser_importar = subparsers.add_parser("importar", help="Sustituye el índice actual por un snapshot")
+    parser_importar.add_argument("archivo")
+    parser_importar.add_argument("--forzar", action="store_true", help="Cargar aunque no coincidan modelo o splitter")
+    args = parser.parse_args()
+
+    from ragManager import RAGManager
+    rag = RAGManager(
+        carpeta_persistencia=os.getenv("RAG_DB_PATH", "./rag_db"),
+        carpeta_documentos=os.getenv("RAG_DOCUMENTS_PATH", "./documentos_rag")
+    )
+    inicio = time.perf_counter()
+    try:
+        if args.comando == "exportar":
+            meta = exportar_snapshot(rag, args.archivo)
+            chunks = sum(info["chunks"] for info in meta["particiones"].values())
+            print(f"✅ Snapshot exportado en {args.archivo}: {chunks} chunks en {time.perf_counter() - inicio:.1f} s")
+        else:
+            cargados = importar_snapshot(rag, args.archivo, forzar=args.forzar)
+            print(f"✅ Snapshot importado: {sum(cargados.values())} chunks en {time.perf_counter() - inicio:.1f} s")
+    except SnapshotIncompatible as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
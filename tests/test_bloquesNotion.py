@@ -0,0 +1,136 @@
+import asyncio
+from types import SimpleNamespace
+
+from bloquesNotion import LectorBloques, a_markdown, contar_bloques
+
+
+def texto(t, enlace=None):
+    return [{"plain_text": t, "href": enlace}]
+
+
+def bloque(id_bloque, tipo, contenido="", hijos=None, **datos):
+    return {
+        "object": "block",
+        "id": id_bloque,
+        "type": tipo,
+        tipo: {"rich_text": texto(contenido), **datos},
+        "has_children": bool(hijos),
+        "last_edited_time": "2024-01-01T00:00:00.000Z",
+        "children": hijos or [],
+    }
+
+
+def test_markdown_de_un_arbol_pequeno():
+    bloques = [
+        bloque("h", "heading_2", "Resumen"),
+        bloque("p", "paragraph", "Texto con detalle"),
+        bloque("l1", "bulleted_list_item", "Primero", hijos=[bloque("l2", "bulleted_list_item", "Anidado")]),
+        bloque("n1", "numbered_list_item", "Uno"),
+        bloque("n2", "numbered_list_item", "Dos"),
+        bloque("t", "to_do", "Hecho", checked=True),
+        bloque("c", "code", "print(1)", language="python"),
+        {"id": "s", "type": "child_page", "child_page": {"title": "Anexo"}, "has_children": True},
+    ]
+
+    markdown, omitidos = a_markdown(bloques)
+
+    assert omitidos == 0
+    assert markdown.split("\n") == [
+        "## Resumen",
+        "Texto con detalle",
+        "- Primero",
+        "  - Anidado",
+        "1. Uno",
+        "2. Dos",
+        "- [x] Hecho",
+        "```python",
+        "print(1)",
+        "```",
+        "📄 Subpágina: Anexo (ID: s)",
+    ]
+
+
+def test_markdown_enlaces_y_tablas():
+    fila = {"id": "f", "type": "table_row", "table_row": {"cells": [texto("a"), texto("b")]}}
+    tabla = {"id": "t", "type": "table", "table": {}, "children": [fila]}
+    parrafo = {"id": "p", "type": "paragraph", "paragraph": {"rich_text": texto("web", "https://x.org")}}
+
+    markdown, _ = a_markdown([parrafo, tabla])
+    assert markdown == "[web](https://x.org)\n| a | b |"
+
+
+def test_markdown_se_corta_por_bloques_completos():
+    bloques = [bloque(f"p{i}", "paragraph", f"párrafo número {i}") for i in range(20)]
+    markdown, omitidos = a_markdown(bloques, max_caracteres=60)
+
+    assert omitidos > 0
+    assert markdown.endswith(f"… ({omitidos} bloques más sin mostrar)")
+    assert len(markdown.split("\n")) - 1 + omitidos == 20
+
+
+class ClienteFalso:
+    """blocks.children.list sobre un árbol en memoria, con paginación"""
+
+    def __init__(self, arbol, tam_pagina=2):
+        self.arbol = arbol
+        self.tam_pagina = tam_pagina
+        self.peticiones = []
+        self.blocks = SimpleNamespace(children=SimpleNamespace(list=self._listar))
+
+    def _listar(self, block_id, page_size, start_cursor=None):
+        self.peticiones.append(block_id)
+        # La API no devuelve los hijos anidados
+        hijos = [{k: v for k, v in h.items() if k != "children"} for h in self.arbol.get(block_id, [])]
+        inicio = int(start_cursor or 0)
+        fin = inicio + self.tam_pagina
+        return {"results": hijos[inicio:fin], "has_more": fin < len(hijos), "next_cursor": str(fin)}
+
+
+class ClienteFalsoAsync(ClienteFalso):
+    def __init__(self, arbol, tam_pagina=2):
+        super().__init__(arbol, tam_pagina)
+        listar = self._listar
+
+        async def alistar(**kwargs):
+            await asyncio.sleep(0)
+            return listar(**kwargs)
+
+        self.blocks = SimpleNamespace(children=SimpleNamespace(list=alistar))
+
+
+ARBOL = {
+    "pagina": [
+        bloque("a", "paragraph", "uno"),
+        bloque("b", "toggle", "dos", hijos=[bloque("b1", "paragraph", "dentro")]),
+        bloque("c", "paragraph", "tres"),
+    ],
+    "b": [bloque("b1", "paragraph", "dentro")],
+}
+
+
+def test_lector_recorre_pagina_y_cachea():
+    lector = LectorBloques(concurrencia=2)
+    cliente = ClienteFalso(ARBOL)
+
+    bloques, completo = lector.leer(cliente, "pagina", "T1")
+    assert completo
+    assert contar_bloques(bloques) == 4
+    assert a_markdown(bloques)[0] == "uno\n▸ dos\n  dentro\ntres"
+    assert cliente.peticiones == ["pagina", "pagina", "b"]
+
+    cliente.peticiones.clear()
+    lector.leer(cliente, "pagina", "T1")
+    assert cliente.peticiones == []
+    assert lector.ultima_edicion("pagina") == "T1"
+
+    # Otra edición de la página: los subárboles sin cambios siguen cacheados
+    lector.leer(cliente, "pagina", "T2")
+    assert cliente.peticiones == ["pagina", "pagina"]
+
+
+def test_lector_asincrono_y_limite_de_bloques():
+    lector = LectorBloques(max_bloques=2)
+    bloques, completo = asyncio.run(lector.aleer(ClienteFalsoAsync(ARBOL), "pagina", "T1"))
+    assert not completo
+    assert [b["id"] for b in bloques] == ["a", "b", "c"]
+    assert "children" not in bloques[1]
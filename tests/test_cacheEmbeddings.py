@@ -0,0 +1,65 @@
+from cacheEmbeddings import EmbeddingsCacheados
+
+
+class ModeloFalso:
+    """Embeddings deterministas que cuentan los textos calculados"""
+
+    def __init__(self):
+        self.calculados = []
+
+    def embed_documents(self, textos):
+        self.calculados.extend(textos)
+        return [[float(len(t)), float(sum(map(ord, t)) % 97), 1.0] for t in textos]
+
+    def embed_query(self, texto):
+        return self.embed_documents([texto])[0]
+
+
+def crear_cache(carpeta, modelo, capacidad=3):
+    return EmbeddingsCacheados(modelo, "modelo-falso", str(carpeta), max_entradas=capacidad, intervalo_guardado=3600)
+
+
+def test_desaloja_la_entrada_menos_usada(tmp_path):
+    modelo = ModeloFalso()
+    cache = crear_cache(tmp_path, modelo)
+    cache.embed_documents(["a", "bb", "ccc"])
+    cache.embed_documents(["a"])            # "a" pasa a ser la más reciente
+    cache.embed_documents(["dddd"])         # desaloja "bb"
+    modelo.calculados.clear()
+
+    cache.embed_documents(["a", "ccc", "dddd"])
+    assert modelo.calculados == []
+    cache.embed_documents(["bb"])
+    assert modelo.calculados == ["bb"]
+    assert cache.estadisticas()["desalojos"] == 2
+
+
+def test_recarga_desde_disco(tmp_path):
+    cache = crear_cache(tmp_path, ModeloFalso())
+    esperados = cache.embed_documents(["uno", "dos", "tres"])
+    cache.guardar()
+
+    modelo = ModeloFalso()
+    recargado = crear_cache(tmp_path, modelo)
+    assert recargado.embed_documents(["uno", "dos", "tres"]) == esperados
+    assert modelo.calculados == []
+
+
+def test_indice_desfasado_tras_una_caida(tmp_path):
+    modelo = ModeloFalso()
+    cache = crear_cache(tmp_path, modelo)
+    cache.embed_documents(["uno", "dos", "tres"])
+    cache.guardar()
+    # Desalojos sin guardar el índice, como si el proceso muriera aquí
+    cache.embed_documents(["cuatro", "cinco"])
+    nuevos = dict(zip(["cuatro", "cinco"], modelo.embed_documents(["cuatro", "cinco"])))
+
+    modelo = ModeloFalso()
+    recargado = crear_cache(tmp_path, modelo)
+    vectores = recargado.embed_documents(["uno", "dos", "tres", "cuatro", "cinco"])
+
+    # Las filas reutilizadas no devuelven el vector de otra clave
+    assert vectores == ModeloFalso().embed_documents(["uno", "dos", "tres", "cuatro", "cinco"])
+    assert sorted(modelo.calculados) == ["dos", "uno"]
+    # Las escritas después del último guardado se recuperan
+    assert [recargado.embed_documents([t])[0] for t in nuevos] == list(nuevos.values())
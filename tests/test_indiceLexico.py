@@ -0,0 +1,45 @@
+import os
+
+from indiceLexico import IndiceBM25
+
+
+def test_guardar_solo_escribe_los_cambios_en_el_diario(tmp_path):
+    ruta = str(tmp_path / "indice.json")
+    indice = IndiceBM25(ruta)
+    indice.agregar(["a:0", "a:1"], ["manual de instalación", "guía de uso"], [{"ruta": "a"}] * 2)
+    indice.guardar()
+    assert not os.path.exists(ruta)
+
+    indice.agregar(["b:0"], ["notas de la reunión"], [{"ruta": "b"}])
+    indice.eliminar(rutas=["a"])
+    indice.guardar()
+
+    recargado = IndiceBM25(ruta)
+    assert recargado.ids() == {"b:0"}
+    assert recargado.buscar("reunión")[0][0] == "b:0"
+
+
+def test_el_diario_se_compacta(tmp_path):
+    ruta = str(tmp_path / "indice.json")
+    indice = IndiceBM25(ruta, min_compactar=3)
+    for i in range(5):
+        indice.agregar([f"c:{i}"], [f"texto número {i}"], [{"ruta": "c"}])
+        indice.guardar()
+    assert os.path.exists(ruta)
+    assert indice._en_diario <= 3
+    assert IndiceBM25(ruta).ids() == {f"c:{i}" for i in range(5)}
+
+
+def test_linea_a_medias_del_diario_se_ignora(tmp_path):
+    ruta = str(tmp_path / "indice.json")
+    indice = IndiceBM25(ruta)
+    indice.agregar(["a:0"], ["hola mundo"], [{"ruta": "a"}])
+    indice.guardar()
+    with open(indice.ruta_diario, "a", encoding="utf-8") as f:
+        f.write('["+", "a:1", "a", {"ad')
+    assert IndiceBM25(ruta).ids() == {"a:0"}
+
+    recargado = IndiceBM25(ruta)
+    recargado.agregar(["a:2"], ["adiós"], [{"ruta": "a"}])
+    recargado.guardar()
+    assert IndiceBM25(ruta).ids() == {"a:0", "a:2"}
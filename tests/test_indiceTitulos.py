@@ -0,0 +1,107 @@
+import threading
+
+from indiceTitulos import IndiceTitulos, separar_sufijo_id
+
+
+def pagina(id_pagina, titulo, editada="2024-01-01T00:00:00.000Z", **extra):
+    return {
+        "object": "page",
+        "id": id_pagina,
+        "last_edited_time": editada,
+        "properties": {"title": {"type": "title", "title": [{"plain_text": titulo}]}},
+        **extra,
+    }
+
+
+ID_1 = "2c5a6541-4e2f-80f5-9110-fe1792e9ed80"
+ID_2 = "11111111-2222-3333-4444-555555555555"
+
+
+def test_exacta_normalizada_y_prefijo():
+    indice = IndiceTitulos()
+    indice.agregar([
+        pagina("a", "Reunión semanal"),
+        pagina("b", "reunion semanal"),
+        pagina("c", "Reunión semanal de producto"),
+    ])
+
+    candidatos = indice.buscar("Reunión semanal")
+    assert [(c["id"], c["coincidencia"]) for c in candidatos] == [
+        ("a", "exacta"), ("b", "normalizada"), ("c", "prefijo")
+    ]
+    assert candidatos[2]["puntuacion"] < 0.95
+
+
+def test_aproximada_con_errata():
+    indice = IndiceTitulos()
+    indice.agregar([pagina("a", "Planificación trimestral"), pagina("b", "Lista de la compra")])
+
+    candidatos = indice.buscar("planificacion trimestrl")
+    assert candidatos[0]["id"] == "a"
+    assert candidatos[0]["coincidencia"] == "aproximada"
+
+
+def test_titulo_con_sufijo_de_id_cuenta_como_exacto():
+    indice = IndiceTitulos()
+    indice.agregar([
+        pagina(ID_1, f"Notas del proyecto {ID_1}"),
+        pagina(ID_2, f"Diario {ID_2.replace('-', '')}"),
+    ])
+
+    assert indice.buscar("Notas del proyecto")[0]["id"] == ID_1
+    assert indice.buscar("Notas del proyecto")[0]["puntuacion"] == 1.0
+    assert indice.buscar("diario")[0]["puntuacion"] >= 0.95
+    assert indice.buscar("diario")[0]["id"] == ID_2
+
+
+def test_sufijo_que_no_es_el_id_propio_se_conserva():
+    indice = IndiceTitulos()
+    indice.agregar([pagina("a", f"Copia de {ID_1}")])
+    assert indice.buscar(f"Copia de {ID_1}")[0]["puntuacion"] == 1.0
+    assert indice.buscar("Copia de")[0]["coincidencia"] == "prefijo"
+
+
+def test_busqueda_con_id_prefiere_ese_objeto():
+    indice = IndiceTitulos()
+    indice.agregar([
+        pagina(ID_1, f"Acta {ID_1}", editada="2024-01-01T00:00:00.000Z"),
+        pagina(ID_2, f"Acta {ID_2}", editada="2024-06-01T00:00:00.000Z"),
+    ])
+    assert indice.buscar("Acta")[0]["id"] == ID_2
+    assert indice.buscar(f"Acta {ID_1}")[0]["id"] == ID_1
+
+
+def test_separar_sufijo_id():
+    assert separar_sufijo_id(f"Título {ID_1}") == ("Título", ID_1.replace("-", ""))
+    assert separar_sufijo_id("Título sin id") == ("Título sin id", None)
+
+
+def test_papelera_y_eliminar():
+    indice = IndiceTitulos()
+    indice.agregar([pagina("a", "Borrador"), pagina("b", "Otro")])
+    indice.agregar([pagina("a", "Borrador", in_trash=True)])
+    indice.eliminar("b")
+    assert indice.buscar("Borrador") == []
+    assert len(indice) == 0
+
+
+def test_reemplazar_no_deja_ver_un_indice_vacio():
+    indice = IndiceTitulos()
+    paginas = [pagina(f"p{i}", f"Página {i}") for i in range(2000)]
+    indice.agregar(paginas)
+    fallos = []
+    detener = threading.Event()
+
+    def buscar():
+        while not detener.is_set():
+            if not indice.buscar("Página 1999"):
+                fallos.append(1)
+
+    hilo = threading.Thread(target=buscar)
+    hilo.start()
+    for _ in range(5):
+        indice.reemplazar(paginas)
+    detener.set()
+    hilo.join()
+    assert fallos == []
+    assert len(indice) == 2000
@@ -0,0 +1,178 @@
+import os
+import hashlib
+import threading
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import cargaArchivos as ca
+from ingestaLotes import PipelineIngesta
+
+
+class EmbeddingsFalsos:
+    def __init__(self, fallar=False):
+        self.fallar = fallar
+        self.llamadas = 0
+
+    def embed_documents(self, textos):
+        self.llamadas += 1
+        if self.fallar:
+            raise RuntimeError("modelo caído")
+        return [[float(len(t)), 0.0] for t in textos]
+
+
+class RagFalso:
+    """Lo mínimo de RAGManager que usa el pipeline"""
+
+    def __init__(self, embeddings):
+        self.chunk_size = 50
+        self.chunk_overlap = 0
+        self.separadores = ["\n", " ", ""]
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap, separators=self.separadores
+        )
+        self.procesos_lectura = None
+        self.embeddings = embeddings
+        self.manifiesto = {}
+        self.escritos = {}
+        self.operaciones = []
+
+    @staticmethod
+    def _clave_ruta(ruta):
+        return os.path.normpath(os.path.abspath(ruta))
+
+    @staticmethod
+    def _id_chunk(clave, posicion):
+        return f"{hashlib.sha1(clave.encode('utf-8')).hexdigest()[:16]}:{posicion}"
+
+    def _eliminar_chunks(self, ids=None, rutas=()):
+        self.operaciones.append(("eliminar", list(ids or []), list(rutas)))
+        for id_chunk in ids or []:
+            self.escritos.pop(id_chunk, None)
+        for id_chunk, metadata in list(self.escritos.items()):
+            if metadata["ruta"] in rutas:
+                del self.escritos[id_chunk]
+
+    def _escribir_vectores(self, ids, textos, metadatas, vectores):
+        self.operaciones.append(("escribir", list(ids)))
+        self.escritos.update(zip(ids, metadatas))
+
+    def _registrar_en_manifiesto(self, clave, firma, ids, guardar=True):
+        self.manifiesto[clave] = {"hash": firma[2], "chunk_ids": ids}
+
+    def _guardar_manifiesto(self):
+        pass
+
+
+def crear_archivos(carpeta, n, lineas=20):
+    rutas = []
+    for i in range(n):
+        ruta = carpeta / f"doc{i}.txt"
+        ruta.write_text("\n".join(f"documento {i} línea {j}" for j in range(lineas)), encoding="utf-8")
+        rutas.append(str(ruta))
+    return rutas
+
+
+def ejecutar_con_limite(pipeline, rutas, segundos=30):
+    """Ejecuta el pipeline en un hilo y falla si no termina a tiempo"""
+    resultado = {}
+
+    def objetivo():
+        try:
+            resultado["resumen"] = pipeline.ejecutar(rutas)
+        except Exception as e:
+            resultado["error"] = e
+
+    hilo = threading.Thread(target=objetivo, daemon=True)
+    hilo.start()
+    hilo.join(segundos)
+    assert not hilo.is_alive(), "el pipeline se ha quedado bloqueado"
+    return resultado
+
+
+def test_ingesta_escribe_todos_los_chunks(tmp_path):
+    rag = RagFalso(EmbeddingsFalsos())
+    rutas = crear_archivos(tmp_path, 5)
+    resultado = ejecutar_con_limite(PipelineIngesta(rag, procesos=1, tam_lote_embeddings=7), rutas)
+
+    assert sorted(resultado["resumen"]["agregados"]) == sorted(os.path.basename(r) for r in rutas)
+    ids_manifiesto = {i for entrada in rag.manifiesto.values() for i in entrada["chunk_ids"]}
+    assert ids_manifiesto == set(rag.escritos)
+
+
+def test_reindexar_escribe_antes_de_borrar_los_sobrantes(tmp_path):
+    rag = RagFalso(EmbeddingsFalsos())
+    ruta = crear_archivos(tmp_path, 1, lineas=40)[0]
+    ejecutar_con_limite(PipelineIngesta(rag, procesos=1), [ruta])
+    ids_antes = rag.manifiesto[rag._clave_ruta(ruta)]["chunk_ids"]
+
+    crear_archivos(tmp_path, 1, lineas=10)
+    rag.operaciones.clear()
+    resultado = ejecutar_con_limite(PipelineIngesta(rag, procesos=1), [ruta])
+
+    assert resultado["resumen"]["actualizados"] == ["doc0.txt"]
+    ids_despues = rag.manifiesto[rag._clave_ruta(ruta)]["chunk_ids"]
+    assert len(ids_despues) < len(ids_antes)
+    assert set(rag.escritos) == set(ids_despues)
+    # Nada se borra hasta que los chunks nuevos están escritos, y solo los que sobran
+    assert rag.operaciones == [
+        ("escribir", ids_despues),
+        ("eliminar", sorted(set(ids_antes) - set(ids_despues)), []),
+    ]
+
+
+def test_fallo_de_embeddings_no_bloquea_el_pipeline(tmp_path):
+    embeddings = EmbeddingsFalsos(fallar=True)
+    rag = RagFalso(embeddings)
+    # Más archivos que la capacidad de las colas para forzar el backpressure
+    rutas = crear_archivos(tmp_path, 40)
+    pipeline = PipelineIngesta(rag, procesos=1, tam_lote_embeddings=4, max_cola=1)
+
+    resultado = ejecutar_con_limite(pipeline, rutas)
+
+    assert isinstance(resultado.get("error"), RuntimeError)
+    assert embeddings.llamadas == 1
+    assert rag.escritos == {}
+    assert rag.manifiesto == {}
+
+
+def test_archivos_grandes_se_leen_por_partes(tmp_path):
+    rag = RagFalso(EmbeddingsFalsos())
+    grande = crear_archivos(tmp_path, 1, lineas=200)[0]
+    pipeline = PipelineIngesta(rag, procesos=1, tam_lote_embeddings=16, max_bytes_proceso=1024)
+    resultado = ejecutar_con_limite(pipeline, [grande])
+
+    assert resultado["resumen"]["agregados"] == ["doc0.txt"]
+    chunks = rag.manifiesto[rag._clave_ruta(grande)]["chunk_ids"]
+    assert len(chunks) > 16
+    assert [rag.escritos[i]["chunk"] for i in chunks] == list(range(len(chunks)))
+
+
+def test_fallo_de_lectura_a_medias_no_deja_chunks_huerfanos(tmp_path, monkeypatch):
+    rag = RagFalso(EmbeddingsFalsos())
+    pequenos = crear_archivos(tmp_path, 2, lineas=3)
+    grande = tmp_path / "grande.txt"
+    grande.write_text("x" * 2048, encoding="utf-8")
+
+    leer_original = ca.leerDocumentoPorPartes
+
+    def partes_que_fallan(ruta, **kwargs):
+        if ruta != str(grande):
+            return leer_original(ruta, **kwargs)
+        return generar_y_fallar()
+
+    def generar_y_fallar():
+        for i in range(10):
+            yield "\n".join(f"parte {i} línea {j} del archivo grande" for j in range(5)), {}
+        raise OSError("disco desconectado")
+
+    monkeypatch.setattr(ca, "leerDocumentoPorPartes", partes_que_fallan)
+    pipeline = PipelineIngesta(rag, procesos=1, tam_lote_embeddings=16, max_bytes_proceso=1024)
+    resultado = ejecutar_con_limite(pipeline, [pequenos[0], str(grande), pequenos[1]])
+
+    assert resultado["resumen"]["errores"] == ["grande.txt: disco desconectado"]
+    assert sorted(resultado["resumen"]["agregados"]) == ["doc0.txt", "doc1.txt"]
+    # Parte del archivo grande llegó a escribirse antes del fallo: se ha borrado
+    assert any(op[0] == "eliminar" and str(grande) in op[2] for op in rag.operaciones)
+    ids_manifiesto = {i for entrada in rag.manifiesto.values() for i in entrada["chunk_ids"]}
+    assert ids_manifiesto == set(rag.escritos)
@@ -0,0 +1,129 @@
+import time
+import asyncio
+import threading
+
+import httpx
+import pytest
+from notion_client.errors import HTTPResponseError
+
+from planificadorNotion import PlanificadorNotion, prioridad
+
+
+def error_http(estado, cabeceras=None):
+    respuesta = httpx.Response(estado, headers=cabeceras or {}, request=httpx.Request("GET", "https://api.notion.com"))
+    return HTTPResponseError(respuesta)
+
+
+def test_interactivas_adelantan_a_masivas():
+    planificador = PlanificadorNotion(peticiones_por_segundo=50, rafaga=1)
+    planificador.pausar(0.3)
+    orden = []
+
+    def peticion(nombre, etiqueta):
+        planificador.turno(nombre)
+        orden.append(etiqueta)
+
+    hilos = []
+    for etiqueta, nombre in [("m1", "masiva"), ("m2", "masiva"), ("i1", "interactiva"), ("i2", "interactiva")]:
+        hilo = threading.Thread(target=peticion, args=(nombre, etiqueta))
+        hilo.start()
+        hilos.append(hilo)
+        time.sleep(0.02)
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert orden == ["i1", "i2", "m1", "m2"]
+
+
+def test_orden_de_llegada_y_prioridad_en_corrutinas():
+    planificador = PlanificadorNotion(peticiones_por_segundo=50, rafaga=1)
+    orden = []
+
+    async def peticion(nombre, etiqueta):
+        await planificador.aturno(nombre)
+        orden.append(etiqueta)
+
+    async def principal():
+        planificador.pausar(0.2)
+        tareas = []
+        for etiqueta, nombre in [("m1", "masiva"), ("i1", "interactiva"), ("m2", "masiva"), ("i2", "interactiva")]:
+            tareas.append(asyncio.create_task(peticion(nombre, etiqueta)))
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tareas)
+
+    asyncio.run(principal())
+    assert orden == ["i1", "i2", "m1", "m2"]
+
+
+def test_corrutina_cancelada_sale_de_la_cola():
+    planificador = PlanificadorNotion(peticiones_por_segundo=50, rafaga=2)
+
+    async def principal():
+        planificador.pausar(0.2)
+        tarea = asyncio.create_task(planificador.aturno())
+        await asyncio.sleep(0.05)
+        assert planificador.metricas()["en_cola"] == 1
+        tarea.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarea
+        assert planificador.metricas()["en_cola"] == 0
+        # La siguiente petición no queda detrás de la cancelada
+        await asyncio.wait_for(planificador.aturno(), 2)
+
+    asyncio.run(principal())
+    assert planificador.metricas()["prioridades"]["interactiva"]["peticiones"] == 1
+
+
+def test_reintenta_429_respetando_retry_after():
+    planificador = PlanificadorNotion(peticiones_por_segundo=100, rafaga=5, espera_base=0.01)
+    llamadas = []
+
+    def llamada():
+        llamadas.append(time.monotonic())
+        if len(llamadas) == 1:
+            raise error_http(429, {"retry-after": "0.2"})
+        return "ok"
+
+    assert planificador.ejecutar(llamada) == "ok"
+    assert llamadas[1] - llamadas[0] >= 0.2
+    metricas = planificador.metricas()
+    assert (metricas["limitadas_429"], metricas["reintentos"], metricas["fallidas"]) == (1, 1, 0)
+
+
+def test_reintenta_429_en_corrutinas():
+    planificador = PlanificadorNotion(peticiones_por_segundo=100, rafaga=5, espera_base=0.01)
+    llamadas = []
+
+    async def llamada():
+        llamadas.append(time.monotonic())
+        if len(llamadas) < 3:
+            raise error_http(429, {"retry-after": "0.1"})
+        return "ok"
+
+    assert asyncio.run(planificador.aejecutar(llamada)) == "ok"
+    assert llamadas[2] - llamadas[0] >= 0.2
+    assert planificador.limitadas == 2
+
+
+def test_escrituras_no_se_repiten_tras_un_5xx():
+    planificador = PlanificadorNotion(peticiones_por_segundo=100, espera_base=0.01)
+    llamadas = []
+
+    def escritura():
+        llamadas.append(1)
+        raise error_http(502)
+
+    with pytest.raises(HTTPResponseError):
+        planificador.ejecutar(escritura, idempotente=False)
+    assert len(llamadas) == 1
+    assert planificador.fallidas == 1
+
+
+def test_prioridad_del_contexto():
+    planificador = PlanificadorNotion(peticiones_por_segundo=100)
+    with prioridad("masiva"):
+        planificador.turno()
+    assert planificador.metricas()["prioridades"]["masiva"]["peticiones"] == 1
+    with pytest.raises(ValueError):
+        with prioridad("urgente"):
+            pass
@@ -0,0 +1,163 @@
+import os
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+
+# ===========================================================
+#   TRABAJOS DE INGESTA EN SEGUNDO PLANO
+# ===========================================================
+
+
+class TrabajoIngesta:
+    """Estado de un trabajo de ingesta (uno o varios archivos)"""
+
+    def __init__(self, rutas):
+        self.id = uuid.uuid4().hex[:8]
+        self.rutas = list(rutas)
+        self.estado = "en cola"
+        self.archivo_actual = None
+        self.completados = 0
+        self.chunks = 0
+        self.resultados = []
+        self.creado = time.time()
+        self.iniciado = None
+        self.terminado = None
+
+    def como_dict(self):
+        """
+        Returns:
+            dict: Estado, progreso (archivos y chunks), resultados y tiempos del trabajo
+        """
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "archivos": [os.path.basename(ruta) for ruta in self.rutas],
+            "completados": self.completados,
+            "total": len(self.rutas),
+            "archivo_actual": self.archivo_actual,
+            "chunks": self.chunks,
+            "resultados": list(self.resultados),
+            "espera_s": (self.iniciado or time.time()) - self.creado,
+            "duracion_s": None if self.iniciado is None else (self.terminado or time.time()) - self.iniciado
+        }
+
+    def resumen(self):
+        """Una línea de texto con el progreso del trabajo"""
+        texto = f"[{self.id}] {self.estado}: {self.completados}/{len(self.rutas)} archivos, {self.chunks} chunks"
+        if self.archivo_actual:
+            texto += f" (procesando {self.archivo_actual})"
+        return texto
+
+
+class GestorTrabajos:
+    """
+    Cola de trabajos de ingesta que se procesan en un hilo aparte.
+
+    Quien envía un trabajo recibe su ID al momento y sigue con lo suyo;
+    el progreso se consulta con estado(). Los chunks se escriben por lotes,
+    así que aparecen en las búsquedas antes de que termine el archivo.
+    """
+
+    def __init__(self, rag, max_historial=100, timeout_rag=600):
+        """
+        Args:
+            rag: RAGManager o RAGPerezoso donde se ingieren los archivos
+            max_historial: Trabajos terminados que se recuerdan
+            timeout_rag: Segundos que un trabajo espera a que el RAG esté listo
+        """
+        self.rag = rag
+        self.max_historial = max_historial
+        self.timeout_rag = timeout_rag
+        self._cola = queue.Queue()
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def enviar(self, rutas):
+        """
+        Encola la ingesta de uno o varios archivos.
+
+        Args:
+            rutas: Ruta o lista de rutas
+
+        Returns:
+            str: ID del trabajo
+        """
+        if isinstance(rutas, str):
+            rutas = [rutas]
+        trabajo = TrabajoIngesta(rutas)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            self._podar()
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, daemon=True, name="trabajos-ingesta")
+                self._hilo.start()
+        self._cola.put(trabajo)
+        return trabajo.id
+
+    def estado(self, id_trabajo):
+        """
+        Returns:
+            dict: Estado del trabajo, o None si no existe
+        """
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+        return trabajo.como_dict() if trabajo else None
+
+    def listar(self, n=10):
+        """Los `n` trabajos más recientes, del más nuevo al más antiguo"""
+        with self._lock:
+            trabajos = list(self._trabajos.values())[-n:]
+        return list(reversed(trabajos))
+
+    def pendientes(self):
+        """Número de trabajos en cola o en proceso"""
+        with self._lock:
+            return sum(1 for t in self._trabajos.values() if t.terminado is None)
+
+    def _podar(self):
+        terminados = [id_t for id_t, t in self._trabajos.items() if t.terminado is not None]
+        for id_trabajo in terminados[:max(0, len(terminados) - self.max_historial)]:
+            del self._trabajos[id_trabajo]
+
+    def _bucle(self):
+        while True:
+            trabajo = self._cola.get()
+            try:
+                self._procesar(trabajo)
+            except Exception as e:
+                trabajo.resultados.append(f"❌ Error: {e}")
+                trabajo.estado = "error"
+            finally:
+                trabajo.archivo_actual = None
+                trabajo.terminado = time.time()
+
+    def _procesar(self, trabajo):
+        trabajo.iniciado = time.time()
+        trabajo.estado = "esperando al RAG"
+        obtener = getattr(self.rag, "obtener", None)
+        manager = obtener(timeout=self.timeout_rag) if obtener else self.rag
+
+        trabajo.estado = "procesando"
+        errores = 0
+        for ruta in trabajo.rutas:
+            trabajo.archivo_actual = os.path.basename(ruta)
+            chunks_previos = trabajo.chunks
+
+            def progreso(n_chunks, base=chunks_previos):
+                trabajo.chunks = base + n_chunks
+
+            resultado = manager.agregar_archivo(ruta, progreso=progreso)
+            if not resultado.startswith("✅"):
+                errores += 1
+            trabajo.resultados.append(resultado)
+            trabajo.completados += 1
+
+        if errores == 0:
+            trabajo.estado = "completado"
+        elif errores < len(trabajo.rutas):
+            trabajo.estado = "completado con errores"
+        else:
+            trabajo.estado = "error"
@@ -0,0 +1,234 @@
+import os
+import time
+import queue
+import threading
+
+# ===========================================================
+#   VIGILANCIA DE LA CARPETA DE DOCUMENTOS
+#   detección (inotify o sondeo) -> rebote -> cola -> ingesta
+# ===========================================================
+
+_FIN = object()
+
+
+class VigilanteCarpeta:
+    """
+    Mantiene el RAG sincronizado con la carpeta de documentos en segundo plano.
+
+    Los cambios se detectan con inotify (a través de `watchdog`, si está
+    instalado) y con un sondeo periódico de tamaño y mtime que sirve de
+    respaldo y de reconciliación. Las ráfagas de eventos sobre un mismo
+    archivo se agrupan (rebote) y los archivos resultantes pasan a una cola
+    que consume un único hilo de ingesta, así las búsquedas nunca esperan.
+    """
+
+    def __init__(self, rag, carpeta=None, intervalo=2.0, rebote=1.0, usar_inotify=True):
+        """
+        Args:
+            rag: Instancia de RAGManager a mantener sincronizada
+            carpeta: Carpeta a vigilar (por defecto, la carpeta de documentos del RAG)
+            intervalo: Segundos entre sondeos de la carpeta
+            rebote: Segundos sin eventos que debe esperar un archivo antes de ingerirse
+            usar_inotify: Si True y `watchdog` está disponible, recibe eventos del sistema
+        """
+        self.rag = rag
+        self.carpeta = carpeta or rag.carpeta_documentos
+        self.intervalo = intervalo
+        self.rebote = rebote
+        self.usar_inotify = usar_inotify
+        self.modo = None
+
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._pendientes = {}   # ruta -> (instante del primer evento, del último) (aún en rebote)
+        self._encolados = {}    # ruta -> instante del primer evento (en la cola)
+        self._instantaneas = self._instantanea_manifiesto()
+        self._detener = threading.Event()
+        self._hilos = []
+        self._observador = None
+
+        self.procesados = 0
+        self.errores = []
+        self.ultimo_retraso = None
+        self.ultimo_resultado = None
+
+    # -----------------------------------------------------------
+    #   Arranque y parada
+    # -----------------------------------------------------------
+    def iniciar(self):
+        """Arranca los hilos de detección e ingesta"""
+        if self._hilos:
+            return self
+        self.modo = "sondeo"
+        if self.usar_inotify:
+            self._observador = self._crear_observador()
+            if self._observador is not None:
+                self.modo = "inotify + sondeo"
+
+        self._hilos = [
+            threading.Thread(target=self._bucle_deteccion, daemon=True, name="vigilante-deteccion"),
+            threading.Thread(target=self._bucle_ingesta, daemon=True, name="vigilante-ingesta"),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+        return self
+
+    def detener(self, timeout=5):
+        """Detiene la vigilancia; los archivos ya encolados se terminan de ingerir"""
+        self._detener.set()
+        if self._observador is not None:
+            self._observador.stop()
+            self._observador.join(timeout)
+        self._cola.put(_FIN)
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+
+    def _crear_observador(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print("⚠️ watchdog no está instalado; la carpeta se vigila solo por sondeo")
+            return None
+
+        vigilante = self
+
+        class _Manejador(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                vigilante._marcar(event.src_path)
+                destino = getattr(event, "dest_path", None)
+                if destino:
+                    vigilante._marcar(destino)
+
+        observador = Observer()
+        observador.schedule(_Manejador(), self.carpeta, recursive=True)
+        observador.daemon = True
+        observador.start()
+        return observador
+
+    # -----------------------------------------------------------
+    #   Detección
+    # -----------------------------------------------------------
+    def _instantanea_manifiesto(self):
+        """Estado conocido de la carpeta según el manifiesto del RAG"""
+        carpeta = self.rag._clave_ruta(self.carpeta)
+        return {
+            clave: (entrada["tamano"], entrada["mtime"])
+            for clave, entrada in list(self.rag.manifiesto.items())
+            if clave.startswith(carpeta + os.sep)
+        }
+
+    def _instantanea_carpeta(self):
+        """Tamaño y mtime de los archivos de la carpeta y sus subcarpetas (sin las ocultas)"""
+        instantanea = {}
+        pendientes = [self.carpeta]
+        while pendientes:
+            try:
+                entradas = list(os.scandir(pendientes.pop()))
+            except OSError:
+                continue
+            for entrada in entradas:
+                try:
+                    if entrada.is_dir():
+                        if not entrada.name.startswith("."):
+                            pendientes.append(entrada.path)
+                        continue
+                    if os.path.splitext(entrada.name)[1].lower() not in self.rag.EXTENSIONES_SOPORTADAS:
+                        continue
+                    if entrada.is_file():
+                        stat = entrada.stat()
+                        instantanea[self.rag._clave_ruta(entrada.path)] = (stat.st_size, stat.st_mtime)
+                except OSError:
+                    continue
+        return instantanea
+
+    def _sondear(self):
+        """Compara la carpeta con el último sondeo y marca lo que ha cambiado"""
+        actual = self._instantanea_carpeta()
+        for ruta, firma in actual.items():
+            if self._instantaneas.get(ruta) != firma:
+                self._marcar(ruta)
+        for ruta in self._instantaneas.keys() - actual.keys():
+            self._marcar(ruta)
+        self._instantaneas = actual
+
+    def _marcar(self, ruta):
+        """Registra un evento sobre un archivo (reinicia su rebote)"""
+        ruta = self.rag._clave_ruta(ruta)
+        if os.path.splitext(ruta)[1].lower() not in self.rag.EXTENSIONES_SOPORTADAS:
+            return
+        ahora = time.monotonic()
+        with self._lock:
+            # El primer evento se conserva: el retraso medido incluye el rebote
+            primero, _ = self._pendientes.get(ruta, (ahora, None))
+            self._pendientes[ruta] = (primero, ahora)
+
+    def _bucle_deteccion(self):
+        proximo_sondeo = 0.0
+        while not self._detener.is_set():
+            ahora = time.monotonic()
+            if ahora >= proximo_sondeo:
+                self._sondear()
+                proximo_sondeo = ahora + self.intervalo
+
+            # Encolar los archivos que llevan `rebote` segundos sin eventos
+            with self._lock:
+                listos = [r for r, (_, ultimo) in self._pendientes.items() if ahora - ultimo >= self.rebote]
+                for ruta in listos:
+                    primero, _ = self._pendientes.pop(ruta)
+                    if ruta not in self._encolados:
+                        self._encolados[ruta] = primero
+                        self._cola.put(ruta)
+
+            self._detener.wait(min(self.rebote, self.intervalo) / 2)
+
+    # -----------------------------------------------------------
+    #   Ingesta
+    # -----------------------------------------------------------
+    def _bucle_ingesta(self):
+        while True:
+            ruta = self._cola.get()
+            if ruta is _FIN:
+                break
+            with self._lock:
+                # A partir de aquí, un evento nuevo vuelve a encolar el archivo
+                instante = self._encolados.pop(ruta, time.monotonic())
+            try:
+                if os.path.isfile(ruta):
+                    resultado = self.rag.sincronizar_archivo(ruta)
+                else:
+                    resultado = "eliminado" if self.rag.eliminar_archivo(ruta) else "omitido"
+                self.ultimo_resultado = f"{os.path.basename(ruta)}: {resultado}"
+            except Exception as e:
+                self.errores = (self.errores + [f"{os.path.basename(ruta)}: {e}"])[-20:]
+                self.ultimo_resultado = f"{os.path.basename(ruta)}: error"
+            self.procesados += 1
+            self.ultimo_retraso = time.monotonic() - instante
+
+    # -----------------------------------------------------------
+    #   Métricas
+    # -----------------------------------------------------------
+    def metricas(self):
+        """
+        Returns:
+            dict: Modo de detección, archivos en rebote, profundidad de la cola,
+                  retraso del elemento más antiguo, archivos procesados y errores
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            en_rebote = len(self._pendientes)
+            mas_antiguo = min(self._encolados.values(), default=None)
+        return {
+            "modo": self.modo,
+            "activo": bool(self._hilos) and not self._detener.is_set(),
+            "en_rebote": en_rebote,
+            "profundidad_cola": self._cola.qsize(),
+            "retraso_s": 0.0 if mas_antiguo is None else ahora - mas_antiguo,
+            "ultimo_retraso_s": self.ultimo_retraso,
+            "ultimo_resultado": self.ultimo_resultado,
+            "procesados": self.procesados,
+            "errores": list(self.errores)
+        }